@@ -5,4 +5,14 @@
 - (instancetype)initWithB:(NSArray<NSNumber *> *)b a:(NSArray<NSNumber *> *)a;
 - (NSArray<NSNumber *> *)filterData:(NSArray<NSNumber *> *)data;
 
+// 流式滤波：滤波状态在多次调用之间保持，每个样本只滤波一次
+- (NSArray<NSNumber *> *)processData:(NSArray<NSNumber *> *)data;
+- (double)processSample:(double)sample;
+- (void)processSamples:(const double *)input output:(double *)output count:(NSInteger)count;
+// 清除流式状态；steadyState为YES时以下一个样本的稳态响应作为初始条件
+- (void)reset;
+- (void)resetWithSteadyState:(BOOL)steadyState;
+- (void)setState:(NSArray<NSNumber *> *)state;
+- (NSArray<NSNumber *> *)state;
+
 @end
\ No newline at end of file
@@ -43,4 +43,61 @@
     return result;
 }
 
+- (NSArray<NSNumber *> *)processData:(NSArray<NSNumber *> *)data {
+    std::vector<double> input;
+    input.reserve(data.count);
+    for (NSNumber *num in data) {
+        input.push_back(num.doubleValue);
+    }
+    
+    std::vector<double> output = filter->process(input);
+    
+    NSMutableArray<NSNumber *> *result = [NSMutableArray arrayWithCapacity:output.size()];
+    for (double val : output) {
+        [result addObject:@(val)];
+    }
+    
+    return result;
+}
+
+- (double)processSample:(double)sample {
+    double output = 0.0;
+    filter->process(&sample, 1, &output);
+    return output;
+}
+
+- (void)processSamples:(const double *)input output:(double *)output count:(NSInteger)count {
+    if (count <= 0) return;
+    filter->process(input, static_cast<size_t>(count), output);
+}
+
+- (void)reset {
+    filter->reset(false);
+}
+
+- (void)resetWithSteadyState:(BOOL)steadyState {
+    filter->reset(steadyState);
+}
+
+- (void)setState:(NSArray<NSNumber *> *)state {
+    std::vector<double> z;
+    for (NSNumber *num in state) {
+        z.push_back(num.doubleValue);
+    }
+    try {
+        filter->setState(z);
+    } catch (const std::invalid_argument &e) {
+        NSLog(@"ButterworthFilterBridge setState: %s", e.what());
+    }
+}
+
+- (NSArray<NSNumber *> *)state {
+    std::vector<double> z = filter->getState();
+    NSMutableArray<NSNumber *> *result = [NSMutableArray arrayWithCapacity:z.size()];
+    for (double val : z) {
+        [result addObject:@(val)];
+    }
+    return result;
+}
+
 @end
\ No newline at end of file
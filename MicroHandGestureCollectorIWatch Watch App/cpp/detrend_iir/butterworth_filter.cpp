@@ -1,32 +1,120 @@
 #include "butterworth_filter.hpp"
+#include <type_traits>
 
-ButterworthFilter::ButterworthFilter(const std::vector<double>& b, const std::vector<double>& a) 
-    : b(b), a(a) {}
+namespace {
+
+// 二阶节的稳态初始条件（等价于对单节调用 scipy.signal.lfilter_zi）
+std::array<double, 2> sectionZi(const std::array<double, 6>& s) {
+    double gain = (s[0] + s[1] + s[2]) / (1.0 + s[4] + s[5]);
+    double z1 = s[2] - s[5] * gain;
+    double z0 = s[1] - s[4] * gain + z1;
+    return {z0, z1};
+}
+
+// filter() 复用的工作缓冲区，每个线程一份，实例本身不保存可变的中间结果
+template <typename K>
+struct WorkBuffers {
+    std::vector<K> work;
+    std::vector<K> tmp;
+    std::vector<double> z;
+};
+
+template <typename K>
+WorkBuffers<K>& workBuffers() {
+    thread_local WorkBuffers<K> buffers;
+    return buffers;
+}
+
+}
+
+ButterworthFilter::ButterworthFilter(const std::vector<double>& b, const std::vector<double>& a)
+    : b(b), a(a) {
+    if (this->a.empty() || this->a[0] == 0.0) {
+        throw std::invalid_argument("a[0] must be non-zero");
+    }
+    // 补齐系数长度，保证 b 与 a 一一对应，并按 a[0] 归一化
+    size_t ntaps = std::max(this->a.size(), this->b.size());
+    this->b.resize(ntaps, 0.0);
+    this->a.resize(ntaps, 0.0);
+    double a0 = this->a[0];
+    for (size_t i = 0; i < ntaps; i++) {
+        this->b[i] /= a0;
+        this->a[i] /= a0;
+    }
+    state.assign(ntaps - 1, 0.0);
+    ziUnit = steadyStateZi();
+    // 与 scipy.signal.filtfilt 的默认 padlen 一致
+    padLen = 3 * ntaps;
+}
+
+ButterworthFilter::ButterworthFilter(const std::vector<std::vector<double>>& sosIn) {
+    if (sosIn.empty()) {
+        throw std::invalid_argument("sos must contain at least one section");
+    }
+    size_t zerosB2 = 0, zerosA2 = 0;
+    for (const auto& row : sosIn) {
+        if (row.size() != 6 || row[3] == 0.0) {
+            throw std::invalid_argument("each sos section must be [b0, b1, b2, a0, a1, a2] with a0 != 0");
+        }
+        std::array<double, 6> s;
+        for (size_t i = 0; i < 6; i++) s[i] = row[i] / row[3];
+        sos.push_back(s);
+        if (s[2] == 0.0) zerosB2++;
+        if (s[5] == 0.0) zerosA2++;
+    }
+
+    // 每节输入/输出的稳态增益，用于把稳态初始条件按第一个样本缩放
+    sosScale.assign(sos.size() + 1, 1.0);
+    for (size_t k = 0; k < sos.size(); k++) {
+        const auto& s = sos[k];
+        sosScale[k + 1] = sosScale[k] * (s[0] + s[1] + s[2]) / (1.0 + s[4] + s[5]);
+    }
+
+    state.assign(2 * sos.size(), 0.0);
+    ziUnit = steadyStateZi();
+    // 与 scipy.signal.sosfiltfilt 的默认 padlen 一致
+    padLen = 3 * (2 * sos.size() + 1 - std::min(zerosB2, zerosA2));
+}
+
+bool ButterworthFilter::isSos() const {
+    return !sos.empty();
+}
 
 std::vector<double> ButterworthFilter::detrend(const std::vector<double>& x) {
-    int n = x.size();
-    if (n <= 1) return x;
+    std::vector<double> detrended(x.size());
+    detrendImpl(x.data(), x.size(), detrended.data());
+    return detrended;
+}
+
+void ButterworthFilter::detrend(const double* x, size_t n, double* out) {
+    detrendImpl(x, n, out);
+}
+
+void ButterworthFilter::detrend(const float* x, size_t n, float* out) {
+    detrendImpl(x, n, out);
+}
 
-    // 计算x的索引
-    std::vector<double> x_idx(n);
-    for (int i = 0; i < n; i++) {
-        x_idx[i] = static_cast<double>(i);
+template <typename TIn, typename TOut>
+void ButterworthFilter::detrendImpl(const TIn* x, size_t n, TOut* out) const {
+    if (n <= 1) {
+        // 与 scipy.signal.detrend 一致：单个样本去趋势后为0
+        for (size_t i = 0; i < n; i++) out[i] = 0;
+        return;
     }
 
-    // 计算均值
-    double mean_x = 0.0, mean_y = 0.0;
-    for (int i = 0; i < n; i++) {
-        mean_x += x_idx[i];
-        mean_y += x[i];
+    // 计算均值，索引序列 0..n-1 的均值为 (n-1)/2
+    double mean_x = 0.5 * static_cast<double>(n - 1);
+    double mean_y = 0.0;
+    for (size_t i = 0; i < n; i++) {
+        mean_y += static_cast<double>(x[i]);
     }
-    mean_x /= n;
     mean_y /= n;
 
     // 计算斜率
     double numerator = 0.0, denominator = 0.0;
-    for (int i = 0; i < n; i++) {
-        double dx = x_idx[i] - mean_x;
-        double dy = x[i] - mean_y;
+    for (size_t i = 0; i < n; i++) {
+        double dx = static_cast<double>(i) - mean_x;
+        double dy = static_cast<double>(x[i]) - mean_y;
         numerator += dx * dy;
         denominator += dx * dx;
     }
@@ -34,92 +122,241 @@ std::vector<double> ButterworthFilter::detrend(const std::vector<double>& x) {
     double slope = (denominator != 0.0) ? numerator / denominator : 0.0;
 
     // 移除趋势
-    std::vector<double> detrended(n);
-    for (int i = 0; i < n; i++) {
-        detrended[i] = x[i] - (slope * x_idx[i] + (mean_y - slope * mean_x));
+    for (size_t i = 0; i < n; i++) {
+        out[i] = static_cast<TOut>(static_cast<double>(x[i]) - (slope * static_cast<double>(i) + (mean_y - slope * mean_x)));
     }
+}
 
-    return detrended;
+std::vector<double> ButterworthFilter::filter(const std::vector<double>& x) {
+    std::vector<double> result(x.size());
+    filter(x.data(), x.size(), result.data());
+    return result;
 }
 
-std::pair<int, std::vector<double>> ButterworthFilter::validatePad(const std::vector<double>& x) {
-    int ntaps = std::max(a.size(), b.size());
-    int edge = ntaps * 3;
+void ButterworthFilter::filter(const double* x, size_t n, double* out) {
+    filtfiltImpl<double, double>(x, n, out);
+}
 
-    std::vector<double> ext(x.size() + 2 * edge, 0.0);
-    
-    // 复制主信号
-    for (size_t i = 0; i < x.size(); i++) {
-        ext[i + edge] = x[i];
+void ButterworthFilter::filter(const float* x, size_t n, float* out) {
+    if (isSos()) {
+        filtfiltImpl<float, float>(x, n, out);
+    } else {
+        // 传递函数形式对单精度误差敏感，内部仍以double计算
+        filtfiltImpl<float, double>(x, n, out);
     }
+}
+
+template <typename K>
+void ButterworthFilter::oddExtend(K* ext, size_t n, size_t edge) const {
+    // 与 scipy 的 odd_ext 一致：以端点为中心做奇对称扩展
+    const K* x = ext + edge;
+    K left = 2 * x[0];
+    K right = 2 * x[n - 1];
+    for (size_t i = 0; i < edge; i++) {
+        ext[i] = left - x[edge - i];
+        ext[edge + n + i] = right - x[n - 2 - i];
+    }
+}
+
+template <typename T, typename K>
+void ButterworthFilter::filtfiltImpl(const T* x, size_t n, T* out) const {
+    if (n == 0) return;
+    auto& buffers = workBuffers<K>();
+    auto& work = buffers.work;
+    auto& tmp = buffers.tmp;
 
-    // 奇对称扩展边界
-    for (int i = 0; i < edge; i++) {
-        ext[i] = 2 * x[0] - x[edge - i - 1];
-        ext[ext.size() - 1 - i] = 2 * x[x.size() - 1] - x[x.size() - 2 - i];
+    // 信号过短时缩短边界扩展长度（scipy 在这种情况下直接报错）
+    size_t edge = std::min(padLen, n - 1);
+    size_t len = n + 2 * edge;
+    if (work.size() < len) work.resize(len);
+    K* ext = work.data();
+
+    // 去除信号趋势，直接写入扩展缓冲区的中间部分
+    detrendImpl(x, n, ext + edge);
+
+    // 计算边界扩展
+    oddExtend(ext, n, edge);
+
+    // 正向滤波，初始条件为第一个样本对应的稳态
+    if constexpr (std::is_same_v<K, double>) {
+        if (!isSos()) {
+            lfilterPass(ext, len, ext[0], buffers.z);
+        } else {
+            sosPass(ext, len, ext[0], tmp);
+        }
+    } else {
+        sosPass(ext, len, ext[0], tmp);
     }
 
-    return {edge, ext};
+    // 反向滤波（原地翻转，不再额外分配）
+    std::reverse(ext, ext + len);
+    if constexpr (std::is_same_v<K, double>) {
+        if (!isSos()) {
+            lfilterPass(ext, len, ext[0], buffers.z);
+        } else {
+            sosPass(ext, len, ext[0], tmp);
+        }
+    } else {
+        sosPass(ext, len, ext[0], tmp);
+    }
+    std::reverse(ext, ext + len);
+
+    // 提取有效部分
+    for (size_t i = 0; i < n; i++) {
+        out[i] = static_cast<T>(ext[i + edge]);
+    }
 }
 
-std::vector<double> ButterworthFilter::lfilterZi() {
-    int n = std::max(a.size(), b.size()) - 1;
-    std::vector<double> zi(n, 0.0);
+void ButterworthFilter::lfilterPass(double* buf, size_t len, double x0, std::vector<double>& zBuf) const {
+    // 直接II型转置结构，原地滤波
+    size_t order = b.size() - 1;
+    zBuf.resize(order);
+    double* z = zBuf.data();
+    for (size_t k = 0; k < order; k++) {
+        z[k] = ziUnit[k] * x0;
+    }
+    for (size_t i = 0; i < len; i++) {
+        double xi = buf[i];
+        double yi = b[0] * xi + (order > 0 ? z[0] : 0.0);
+        for (size_t j = 1; j <= order; j++) {
+            z[j - 1] = b[j] * xi - a[j] * yi + (j < order ? z[j] : 0.0);
+        }
+        buf[i] = yi;
+    }
+}
+
+template <typename K>
+void ButterworthFilter::sosPass(K* buf, size_t len, K x0, std::vector<K>& tmp) const {
+    if (tmp.size() < len) tmp.resize(len);
+    K* w = tmp.data();
+
+    for (size_t k = 0; k < sos.size(); k++) {
+        const K b0 = static_cast<K>(sos[k][0]);
+        const K b1 = static_cast<K>(sos[k][1]);
+        const K b2 = static_cast<K>(sos[k][2]);
+        const K a1 = static_cast<K>(sos[k][4]);
+        const K a2 = static_cast<K>(sos[k][5]);
+        // 稳态初始条件：之前的输入恒为 xin、输出恒为 yout
+        const K xin = x0 * static_cast<K>(sosScale[k]);
+        const K yout = x0 * static_cast<K>(sosScale[k + 1]);
+
+        // 前馈部分没有循环依赖，编译器可以自动向量化
+        w[0] = b0 * buf[0] + (b1 + b2) * xin;
+        if (len > 1) w[1] = b0 * buf[1] + b1 * buf[0] + b2 * xin;
+        for (size_t i = 2; i < len; i++) {
+            w[i] = b0 * buf[i] + b1 * buf[i - 1] + b2 * buf[i - 2];
+        }
+
+        // 反馈部分逐样本递推
+        K y1 = yout, y2 = yout;
+        for (size_t i = 0; i < len; i++) {
+            K y = w[i] - a1 * y1 - a2 * y2;
+            buf[i] = y;
+            y2 = y1;
+            y1 = y;
+        }
+    }
+}
+
+std::vector<double> ButterworthFilter::steadyStateZi() const {
+    if (isSos()) {
+        // 等价于 scipy.signal.sosfilt_zi
+        std::vector<double> zi(2 * sos.size(), 0.0);
+        for (size_t k = 0; k < sos.size(); k++) {
+            auto z = sectionZi(sos[k]);
+            zi[2 * k] = sosScale[k] * z[0];
+            zi[2 * k + 1] = sosScale[k] * z[1];
+        }
+        return zi;
+    }
+
+    // 单位阶跃输入下的稳态状态（等价于 scipy.signal.lfilter_zi）：
+    // 稳态输出 g = sum(b) / sum(a)，zi[k] = sum_{j>k} (b[j] - a[j] * g)
+    size_t order = state.size();
+    std::vector<double> zi(order, 0.0);
 
     double sum_b = 0.0, sum_a = 0.0;
     for (const auto& val : b) sum_b += val;
     for (const auto& val : a) sum_a += val;
+    double gain = (std::abs(sum_a) > 1e-12) ? sum_b / sum_a : 0.0;
 
-    if (std::abs(sum_a) > 1e-6) {
-        double gain = sum_b / sum_a;
-        std::fill(zi.begin(), zi.end(), gain);
+    double acc = 0.0;
+    for (size_t k = order; k-- > 0;) {
+        acc += b[k + 1] - a[k + 1] * gain;
+        zi[k] = acc;
     }
-
     return zi;
 }
 
-std::pair<std::vector<double>, std::vector<double>> ButterworthFilter::lfilter(
-    const std::vector<double>& x, 
-    const std::vector<double>& zi
-) {
-    int n = x.size();
-    std::vector<double> y(n, 0.0);
-    std::vector<double> z = zi;
+void ButterworthFilter::reset(bool steadyState) {
+    std::fill(state.begin(), state.end(), 0.0);
+    pendingSteadyState = steadyState;
+}
 
-    for (int i = 0; i < n; i++) {
-        y[i] = b[0] * x[i] + z[0];
-        
-        for (size_t j = 1; j < a.size(); j++) {
-            z[j-1] = b[j] * x[i] - a[j] * y[i] + (j < z.size() ? z[j] : 0.0);
-        }
+void ButterworthFilter::setState(const std::vector<double>& z) {
+    if (z.size() != state.size()) {
+        throw std::invalid_argument("state size must equal the filter order");
     }
+    state = z;
+    pendingSteadyState = false;
+}
 
-    return {y, z};
+std::vector<double> ButterworthFilter::getState() const {
+    return state;
 }
 
-std::vector<double> ButterworthFilter::filter(const std::vector<double>& x) {
-    // 去除信号趋势
-    auto detrended = detrend(x);
+std::vector<double> ButterworthFilter::process(const std::vector<double>& chunk) {
+    std::vector<double> result(chunk.size());
+    processImpl(chunk.data(), chunk.size(), result.data());
+    return result;
+}
 
-    // 计算边界扩展
-    auto [edge, ext] = validatePad(detrended);
+void ButterworthFilter::process(const double* x, size_t n, double* out) {
+    processImpl(x, n, out);
+}
+
+void ButterworthFilter::process(const float* x, size_t n, float* out) {
+    processImpl(x, n, out);
+}
 
-    // 计算初始状态
-    auto zi = lfilterZi();
+template <typename T>
+void ButterworthFilter::processImpl(const T* x, size_t n, T* out) {
+    if (n == 0) return;
 
-    // 正向滤波
-    double x0 = ext[0];
-    auto [y, _] = lfilter(ext, std::vector<double>(zi.begin(), zi.end()));
-    for (auto& val : zi) val *= x0;
+    if (pendingSteadyState) {
+        double x0 = static_cast<double>(x[0]);
+        for (size_t k = 0; k < state.size(); k++) {
+            state[k] = ziUnit[k] * x0;
+        }
+        pendingSteadyState = false;
+    }
 
-    // 反向滤波
-    double y0 = y[y.size() - 1];
-    std::reverse(y.begin(), y.end());
-    auto [y_rev, __] = lfilter(y, std::vector<double>(zi.begin(), zi.end()));
-    for (auto& val : zi) val *= y0;
-    std::reverse(y_rev.begin(), y_rev.end());
+    double* z = state.data();
+    if (isSos()) {
+        // 每节直接II型转置结构，状态与 scipy.signal.sosfilt 的 zi 一致
+        for (size_t i = 0; i < n; i++) {
+            double v = static_cast<double>(x[i]);
+            for (size_t k = 0; k < sos.size(); k++) {
+                const auto& s = sos[k];
+                double* zk = z + 2 * k;
+                double y = s[0] * v + zk[0];
+                zk[0] = s[1] * v - s[4] * y + zk[1];
+                zk[1] = s[2] * v - s[5] * y;
+                v = y;
+            }
+            out[i] = static_cast<T>(v);
+        }
+        return;
+    }
 
-    // 提取有效部分
-    std::vector<double> result(y_rev.begin() + edge, y_rev.end() - edge);
-    return result;
-}
\ No newline at end of file
+    // 直接II型转置结构，逐样本更新状态
+    size_t order = state.size();
+    for (size_t i = 0; i < n; i++) {
+        double xi = static_cast<double>(x[i]);
+        double yi = b[0] * xi + (order > 0 ? z[0] : 0.0);
+        for (size_t j = 1; j <= order; j++) {
+            z[j - 1] = b[j] * xi - a[j] * yi + (j < order ? z[j] : 0.0);
+        }
+        out[i] = static_cast<T>(yi);
+    }
+}
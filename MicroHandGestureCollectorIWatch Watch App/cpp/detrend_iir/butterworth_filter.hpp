@@ -2,25 +2,68 @@
 #define BUTTERWORTH_FILTER_HPP
 
 #include <vector>
+#include <array>
 #include <cmath>
 #include <algorithm>
+#include <stdexcept>
 
+// filter()/detrend() 只读取系数，工作缓冲区是线程局部的，同一个实例可以被多个线程同时调用；
+// process()/reset()/setState() 修改流式状态，同一个实例不能被多个线程同时调用
 class ButterworthFilter {
 public:
+    // 传递函数形式 (b, a)
     ButterworthFilter(const std::vector<double>& b, const std::vector<double>& a);
+    // 二阶节(SOS)级联形式，每节6个系数 [b0, b1, b2, a0, a1, a2]，与 scipy.signal.butter(..., output='sos') 一致
+    explicit ButterworthFilter(const std::vector<std::vector<double>>& sos);
+
+    bool isSos() const;
+
     std::vector<double> filter(const std::vector<double>& x);
     std::vector<double> detrend(const std::vector<double>& x);
 
+    // 基于指针的接口，直接读写调用方的连续内存（numpy数组），避免额外拷贝
+    // SOS模式下float输入使用float32内核，其余情况内部以double计算
+    void filter(const double* x, size_t n, double* out);
+    void filter(const float* x, size_t n, float* out);
+    void detrend(const double* x, size_t n, double* out);
+    void detrend(const float* x, size_t n, float* out);
+
+    // 流式滤波：状态z在多次调用之间保持，长信号可以分块处理，结果与一次性lfilter/sosfilt相同
+    std::vector<double> process(const std::vector<double>& chunk);
+    void process(const double* x, size_t n, double* out);
+    void process(const float* x, size_t n, float* out);
+    // 清除流式状态；steadyState为true时，下一次process以第一个样本的稳态响应作为初始条件
+    void reset(bool steadyState = false);
+    // 显式设置/读取流式状态：传递函数模式长度为阶数，SOS模式为每节2个状态按节依次排列
+    void setState(const std::vector<double>& z);
+    std::vector<double> getState() const;
+
 private:
     std::vector<double> b;
     std::vector<double> a;
-    
-    std::pair<int, std::vector<double>> validatePad(const std::vector<double>& x);
-    std::vector<double> lfilterZi();
-    std::pair<std::vector<double>, std::vector<double>> lfilter(
-        const std::vector<double>& x, 
-        const std::vector<double>& zi
-    );
+    std::vector<std::array<double, 6>> sos;
+    std::vector<double> state;
+    bool pendingSteadyState = false;
+
+    // 单位阶跃输入下的稳态初始条件，构造时计算一次
+    std::vector<double> ziUnit;
+    // SOS模式：第s节输入的稳态增益（sosScale[s]）和输出的稳态增益（sosScale[s + 1]）
+    std::vector<double> sosScale;
+    size_t padLen = 0;
+
+    template <typename TIn, typename TOut>
+    void detrendImpl(const TIn* x, size_t n, TOut* out) const;
+    template <typename T, typename K>
+    void filtfiltImpl(const T* x, size_t n, T* out) const;
+    template <typename K>
+    void oddExtend(K* ext, size_t n, size_t edge) const;
+    template <typename K>
+    void sosPass(K* buf, size_t len, K x0, std::vector<K>& tmp) const;
+    void lfilterPass(double* buf, size_t len, double x0, std::vector<double>& z) const;
+
+    template <typename T>
+    void processImpl(const T* x, size_t n, T* out);
+    std::vector<double> steadyStateZi() const;
 };
 
-#endif 
\ No newline at end of file
+#endif
@@ -0,0 +1,87 @@
+#include "butterworth_filter_bank.hpp"
+#include <stdexcept>
+#include <thread>
+
+ButterworthFilterBank::ButterworthFilterBank(const std::vector<std::vector<double>>& bs,
+                                             const std::vector<std::vector<double>>& as,
+                                             bool includeRaw)
+    : includeRaw(includeRaw) {
+    if (bs.size() != as.size()) {
+        throw std::invalid_argument("number of b and a coefficient sets must match");
+    }
+    for (size_t k = 0; k < bs.size(); k++) {
+        bands.emplace_back(bs[k], as[k]);
+    }
+}
+
+ButterworthFilterBank::ButterworthFilterBank(const std::vector<std::vector<std::vector<double>>>& sosBands,
+                                             bool includeRaw)
+    : includeRaw(includeRaw) {
+    for (const auto& sos : sosBands) {
+        bands.emplace_back(sos);
+    }
+}
+
+size_t ButterworthFilterBank::numBands() const {
+    return bands.size() + (includeRaw ? 1 : 0);
+}
+
+void ButterworthFilterBank::process(const double* x, size_t n, size_t t, size_t c, double* out, int numThreads) const {
+    processImpl(x, n, t, c, out, numThreads);
+}
+
+void ButterworthFilterBank::process(const float* x, size_t n, size_t t, size_t c, float* out, int numThreads) const {
+    processImpl(x, n, t, c, out, numThreads);
+}
+
+template <typename T>
+void ButterworthFilterBank::processRange(const T* x, size_t t, size_t c, T* out, size_t begin, size_t end) const {
+    // 每个线程持有自己的滤波器实例和通道缓冲，互不共享状态
+    std::vector<ButterworthFilter> filters(bands);
+    std::vector<T> channel(t);
+    size_t totalBands = numBands();
+
+    for (size_t job = begin; job < end; job++) {
+        size_t seg = job / c;
+        size_t ch = job % c;
+
+        // 从 (T, C) 布局中取出单个通道
+        const T* src = x + seg * t * c + ch;
+        for (size_t i = 0; i < t; i++) {
+            channel[i] = src[i * c];
+        }
+
+        T* dst = out + (seg * c + ch) * totalBands * t;
+        if (includeRaw) {
+            std::copy(channel.begin(), channel.end(), dst);
+            dst += t;
+        }
+        for (auto& filter : filters) {
+            filter.filter(channel.data(), t, dst);
+            dst += t;
+        }
+    }
+}
+
+template <typename T>
+void ButterworthFilterBank::processImpl(const T* x, size_t n, size_t t, size_t c, T* out, int numThreads) const {
+    size_t jobs = n * c;
+    size_t workers = numThreads > 1 ? std::min(static_cast<size_t>(numThreads), jobs) : 1;
+    if (workers <= 1) {
+        processRange(x, t, c, out, 0, jobs);
+        return;
+    }
+
+    std::vector<std::thread> threads;
+    threads.reserve(workers);
+    size_t chunk = (jobs + workers - 1) / workers;
+    for (size_t w = 0; w < workers; w++) {
+        size_t begin = w * chunk;
+        size_t end = std::min(jobs, begin + chunk);
+        if (begin >= end) break;
+        threads.emplace_back([=]() { processRange(x, t, c, out, begin, end); });
+    }
+    for (auto& th : threads) {
+        th.join();
+    }
+}
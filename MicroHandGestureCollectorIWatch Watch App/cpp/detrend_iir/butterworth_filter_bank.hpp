@@ -0,0 +1,36 @@
+#ifndef BUTTERWORTH_FILTER_BANK_HPP
+#define BUTTERWORTH_FILTER_BANK_HPP
+
+#include <vector>
+#include "butterworth_filter.hpp"
+
+// 多通道、多频带滤波器组
+// 输入为 (N, T, C) 的连续内存（N个片段，每段T个采样，C个通道），
+// 输出直接写入 (N, C, bands, T) 的连续内存；includeRaw为true时第0个band为原始信号
+class ButterworthFilterBank {
+public:
+    ButterworthFilterBank(const std::vector<std::vector<double>>& bs,
+                          const std::vector<std::vector<double>>& as,
+                          bool includeRaw = false);
+    // 每个频带使用一组二阶节(SOS)系数
+    ButterworthFilterBank(const std::vector<std::vector<std::vector<double>>>& sosBands,
+                          bool includeRaw = false);
+
+    size_t numBands() const;
+
+    // numThreads > 1 时按 (片段, 通道) 划分到多个线程并行计算
+    void process(const double* x, size_t n, size_t t, size_t c, double* out, int numThreads = 1) const;
+    void process(const float* x, size_t n, size_t t, size_t c, float* out, int numThreads = 1) const;
+
+private:
+    // 各频带的滤波器原型，每个工作线程复制一份使用
+    std::vector<ButterworthFilter> bands;
+    bool includeRaw;
+
+    template <typename T>
+    void processRange(const T* x, size_t t, size_t c, T* out, size_t begin, size_t end) const;
+    template <typename T>
+    void processImpl(const T* x, size_t n, size_t t, size_t c, T* out, int numThreads) const;
+};
+
+#endif
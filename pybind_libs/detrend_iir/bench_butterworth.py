@@ -0,0 +1,103 @@
+import timeit
+import numpy as np
+from scipy.signal import butter, detrend, sosfiltfilt
+from butterworth_filter import ButterworthFilter, ButterworthFilterBank
+
+
+def bench(func, number):
+    # 取多次重复中的最小值，减少调度抖动的影响
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def bench_list_vs_numpy():
+    """对比 list 接口与 numpy 零拷贝接口的单次调用耗时"""
+    fs = 100.0
+    nyquist = fs / 2.0
+    b, a = butter(N=2, Wn=[0.25 / nyquist, 8.0 / nyquist], btype='bandpass')
+    bwf = ButterworthFilter(b, a)
+
+    print(f"{'length':>8} {'list (us)':>12} {'float64 (us)':>14} {'float32 (us)':>14} {'speedup':>9}")
+    for n in (60, 100, 1000, 10000, 100000):
+        x = np.random.randn(n)
+        x32 = x.astype(np.float32)
+        number = max(10, 200000 // n)
+
+        t_list = bench(lambda: np.asarray(bwf.filter(x.tolist())), number)
+        t_f64 = bench(lambda: bwf.filter(x), number)
+        t_f32 = bench(lambda: bwf.filter(x32), number)
+
+        print(f"{n:>8} {t_list * 1e6:>12.2f} {t_f64 * 1e6:>14.2f} {t_f32 * 1e6:>14.2f} {t_list / t_f64:>8.2f}x")
+
+
+def bench_filter_bank(n_segments=1000, n_threads=4):
+    """对比逐通道 apply_along_axis 与滤波器组单次调用（haili 模型的 (6, 4, 100) 特征）"""
+    fs = 100.0
+    nyquist = fs / 2.0
+    coefs = [
+        butter(N=2, Wn=[0.25 / nyquist, 8.0 / nyquist], btype='bandpass'),
+        butter(N=2, Wn=[8.0 / nyquist, 32.0 / nyquist], btype='bandpass'),
+        butter(N=2, Wn=32.0 / nyquist, btype='highpass'),
+    ]
+    filters = [ButterworthFilter(b, a) for b, a in coefs]
+    bank = ButterworthFilterBank([b for b, _ in coefs], [a for _, a in coefs], include_raw=True)
+
+    segment = np.random.randn(100, 6)
+
+    def per_channel():
+        bands = [segment] + [np.apply_along_axis(f.filter, 0, segment) for f in filters]
+        return np.transpose(np.stack(bands, axis=0), (2, 0, 1))
+
+    np.testing.assert_allclose(per_channel(), bank.filter(segment), atol=1e-12)
+
+    t_loop = bench(per_channel, 200)
+    t_bank = bench(lambda: bank.filter(segment), 200)
+    print(f"single segment: apply_along_axis {t_loop * 1e6:.1f} us, filter bank {t_bank * 1e6:.1f} us, "
+          f"speedup {t_loop / t_bank:.1f}x")
+
+    batch = np.random.randn(n_segments, 100, 6).astype(np.float32)
+    out = np.empty((n_segments, 6, bank.num_bands, 100), dtype=np.float32)
+    t_batch = bench(lambda: bank.filter(batch, out=out), 3)
+    t_threads = bench(lambda: bank.filter(batch, out=out, n_threads=n_threads), 3)
+    print(f"batch of {n_segments}: {t_batch * 1e6 / n_segments:.1f} us/segment, "
+          f"{n_threads} threads {t_threads * 1e6 / n_segments:.1f} us/segment")
+
+
+def bench_sos(hours=1.0):
+    """
+    对比传递函数形式与二阶节(SOS)形式，覆盖 60~100 点的手势窗口和小时级长录音
+    同时检查 SOS 结果与 scipy.signal.sosfiltfilt 的一致性：
+        float64: 最大绝对误差 < 1e-9
+        float32: 最大误差 / 最大输出幅值 < 5e-4
+    """
+    fs = 100.0
+    nyquist = fs / 2.0
+    kw = dict(N=2, Wn=[0.25 / nyquist, 8.0 / nyquist], btype='bandpass')
+    b, a = butter(**kw)
+    sos = butter(**kw, output='sos')
+    bwf_tf = ButterworthFilter(b, a)
+    bwf_sos = ButterworthFilter(sos)
+
+    print(f"{'length':>8} {'tf f64 (us)':>12} {'sos f64 (us)':>13} {'sos f32 (us)':>13} "
+          f"{'ns/sample f32':>14} {'err f64':>9} {'rel err f32':>12}")
+    for n in (60, 100, 1000, int(hours * 3600 * fs)):
+        x = np.cumsum(np.random.randn(n)) * 0.1 + np.random.randn(n)
+        x32 = x.astype(np.float32)
+        ref = sosfiltfilt(sos, detrend(x))
+        err64 = np.abs(bwf_sos.filter(x) - ref).max()
+        err32 = np.abs(bwf_sos.filter(x32) - ref).max() / np.abs(ref).max()
+        assert err64 < 1e-9 and err32 < 5e-4, (n, err64, err32)
+
+        number = max(3, 200000 // n)
+        t_tf = bench(lambda: bwf_tf.filter(x), number)
+        t_sos = bench(lambda: bwf_sos.filter(x), number)
+        t_f32 = bench(lambda: bwf_sos.filter(x32), number)
+        print(f"{n:>8} {t_tf * 1e6:>12.1f} {t_sos * 1e6:>13.1f} {t_f32 * 1e6:>13.1f} "
+              f"{t_f32 * 1e9 / n:>14.2f} {err64:>9.1e} {err32:>12.1e}")
+
+
+if __name__ == "__main__":
+    bench_list_vs_numpy()
+    print()
+    bench_filter_bank()
+    print()
+    bench_sos()
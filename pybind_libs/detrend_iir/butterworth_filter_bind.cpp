@@ -1,12 +1,104 @@
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
 #include "butterworth_filter.hpp"
+#include "butterworth_filter_bank.hpp"
 
 namespace py = pybind11;
 
+// 对一维numpy数组调用基于指针的接口：连续输入直接读取，输出直接写入新数组。
+// filter/detrend 不修改实例，计算期间释放GIL；process 修改流式状态，保持GIL，
+// 避免多个Python线程同时修改同一个实例的状态
+template <typename T, void (ButterworthFilter::*Method)(const T*, size_t, T*), bool ReleaseGil = true>
+py::array_t<T> apply_array(ButterworthFilter& self, py::array_t<T> x) {
+    if (x.ndim() != 1) {
+        throw std::invalid_argument("expected a 1-D array");
+    }
+    auto contiguous = py::array_t<T, py::array::c_style | py::array::forcecast>::ensure(x);
+    py::array_t<T> out(contiguous.size());
+    const T* in_ptr = contiguous.data();
+    T* out_ptr = out.mutable_data();
+    size_t n = static_cast<size_t>(contiguous.size());
+    if (ReleaseGil) {
+        py::gil_scoped_release release;
+        (self.*Method)(in_ptr, n, out_ptr);
+    } else {
+        (self.*Method)(in_ptr, n, out_ptr);
+    }
+    return out;
+}
+
+// (T, C) 或 (N, T, C) 输入 -> (C, bands, T) 或 (N, C, bands, T) 输出，
+// out 不为 None 时直接写入调用方预分配的数组
+template <typename T>
+py::array_t<T> apply_bank(const ButterworthFilterBank& self, py::array_t<T> x, py::object out, int n_threads) {
+    if (x.ndim() != 2 && x.ndim() != 3) {
+        throw std::invalid_argument("expected a (T, C) or (N, T, C) array");
+    }
+    auto contiguous = py::array_t<T, py::array::c_style | py::array::forcecast>::ensure(x);
+    bool batched = contiguous.ndim() == 3;
+    size_t n = batched ? contiguous.shape(0) : 1;
+    size_t t = contiguous.shape(batched ? 1 : 0);
+    size_t c = contiguous.shape(batched ? 2 : 1);
+    size_t bands = self.numBands();
+
+    std::vector<py::ssize_t> shape;
+    if (batched) shape.push_back(static_cast<py::ssize_t>(n));
+    shape.insert(shape.end(), {static_cast<py::ssize_t>(c), static_cast<py::ssize_t>(bands), static_cast<py::ssize_t>(t)});
+
+    py::array_t<T> result;
+    if (out.is_none()) {
+        result = py::array_t<T>(shape);
+    } else {
+        if (!py::array_t<T, py::array::c_style>::check_(out)) {
+            throw std::invalid_argument("out must be a C-contiguous array with the same dtype as x");
+        }
+        result = out.cast<py::array_t<T>>();
+        if (result.ndim() != static_cast<py::ssize_t>(shape.size()) ||
+            !std::equal(shape.begin(), shape.end(), result.shape())) {
+            throw std::invalid_argument("out has the wrong shape");
+        }
+    }
+
+    const T* in_ptr = contiguous.data();
+    T* out_ptr = result.mutable_data();
+    {
+        py::gil_scoped_release release;
+        self.process(in_ptr, n, t, c, out_ptr, n_threads);
+    }
+    return result;
+}
+
 PYBIND11_MODULE(butterworth_filter, m) {
+    using VecMethod = std::vector<double> (ButterworthFilter::*)(const std::vector<double>&);
+
     py::class_<ButterworthFilter>(m, "ButterworthFilter")
-        .def(py::init<const std::vector<double>&, const std::vector<double>&>())
-        .def("filter", &ButterworthFilter::filter)
-        .def("detrend", &ButterworthFilter::detrend);
-} 
\ No newline at end of file
+        .def(py::init<const std::vector<double>&, const std::vector<double>&>(), py::arg("b"), py::arg("a"))
+        // 二阶节形式：sos 为 (n_sections, 6) 数组，与 scipy.signal.butter(..., output='sos') 一致
+        .def(py::init<const std::vector<std::vector<double>>&>(), py::arg("sos"))
+        .def_property_readonly("is_sos", &ButterworthFilter::isSos)
+        // numpy float32 / float64 数组：零拷贝输入，返回numpy数组
+        .def("filter", &apply_array<float, &ButterworthFilter::filter>, py::arg("x").noconvert())
+        .def("filter", &apply_array<double, &ButterworthFilter::filter>, py::arg("x").noconvert())
+        // 其他输入（list等）：保持原来的list接口
+        .def("filter", static_cast<VecMethod>(&ButterworthFilter::filter), py::arg("x"))
+        .def("detrend", &apply_array<float, &ButterworthFilter::detrend>, py::arg("x").noconvert())
+        .def("detrend", &apply_array<double, &ButterworthFilter::detrend>, py::arg("x").noconvert())
+        .def("detrend", static_cast<VecMethod>(&ButterworthFilter::detrend), py::arg("x"))
+        // 流式接口：状态在多次调用之间保持
+        .def("process", &apply_array<float, &ButterworthFilter::process, false>, py::arg("chunk").noconvert())
+        .def("process", &apply_array<double, &ButterworthFilter::process, false>, py::arg("chunk").noconvert())
+        .def("process", static_cast<VecMethod>(&ButterworthFilter::process), py::arg("chunk"))
+        .def("reset", &ButterworthFilter::reset, py::arg("steady_state") = false)
+        .def_property("state", &ButterworthFilter::getState, &ButterworthFilter::setState);
+
+    py::class_<ButterworthFilterBank>(m, "ButterworthFilterBank")
+        .def(py::init<const std::vector<std::vector<double>>&, const std::vector<std::vector<double>>&, bool>(),
+             py::arg("bs"), py::arg("as_"), py::arg("include_raw") = false)
+        .def_static("from_sos", [](const std::vector<std::vector<std::vector<double>>>& sos_bands, bool include_raw) {
+            return ButterworthFilterBank(sos_bands, include_raw);
+        }, py::arg("sos_bands"), py::arg("include_raw") = false)
+        .def_property_readonly("num_bands", &ButterworthFilterBank::numBands)
+        .def("filter", &apply_bank<float>, py::arg("x").noconvert(), py::arg("out") = py::none(), py::arg("n_threads") = 1)
+        .def("filter", &apply_bank<double>, py::arg("x"), py::arg("out") = py::none(), py::arg("n_threads") = 1);
+}
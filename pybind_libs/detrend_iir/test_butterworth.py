@@ -1,24 +1,222 @@
+"""
+ButterworthFilter 与 scipy 的一致性测试和性能基准
+
+对 create_butterworth_filters 中用到的每个频带（传递函数形式和SOS形式）、
+float32/float64、长度 20 ~ 10^6 的信号，比较
+    ButterworthFilter.filter  vs  scipy.signal.filtfilt / sosfiltfilt(detrend(x))
+    ButterworthFilter.detrend vs  scipy.signal.detrend
+并统计最大误差、每个样本耗时(ns)和每次调用在Python侧可见的内存分配。
+另外检查多个Python线程同时对同一个实例调用 filter() 时结果与逐个调用相同 (filter 期间释放GIL)。
+
+结果写入 results/butterworth_parity.json（确定性的误差和分配统计）和
+results/butterworth_bench.json（与机器相关的耗时），提交到仓库后，
+手表端共用的C++代码一旦出现数值或性能回退，就会在diff中体现。
+
+用法:
+    python test_butterworth.py            # 完整测试
+    python test_butterworth.py --quick    # 只测到 10^4 个样本
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import timeit
+import tracemalloc
+
 import numpy as np
+from scipy.signal import butter, detrend, filtfilt, sosfiltfilt
 from butterworth_filter import ButterworthFilter
 
-def test_filter():
-    # 创建一个测试信号
-    t = np.linspace(0, 1, 1000)
-    signal = np.sin(2 * np.pi * 10 * t) + 0.5 * np.sin(2 * np.pi * 50 * t)
-    
-    # Butterworth滤波器系数 (这里使用一个简单的低通滤波器示例)
-    b = [0.0675, 0.1349, 0.0675]
-    a = [1.0, -1.1430, 0.4128]
-    
-    # 创建滤波器实例
-    filter = ButterworthFilter(b, a)
-    
-    # 应用滤波器
-    filtered_signal = filter.filter(signal.tolist())
-    
-    print("原始信号长度:", len(signal))
-    print("滤波后信号长度:", len(filtered_signal))
-    print("滤波后前5个值:", filtered_signal[:5])
+FS = 100.0
+NYQUIST = FS / 2.0
+# 与 run_mlpackage_model.create_butterworth_filter_bank 中的频带一致
+BANDS = {
+    'low': dict(N=2, Wn=[0.25 / NYQUIST, 8.0 / NYQUIST], btype='bandpass'),
+    'mid': dict(N=2, Wn=[8.0 / NYQUIST, 32.0 / NYQUIST], btype='bandpass'),
+    'high': dict(N=2, Wn=32.0 / NYQUIST, btype='highpass'),
+}
+LENGTHS = (20, 60, 100, 1000, 10_000, 100_000, 1_000_000)
+QUICK_LENGTHS = (20, 60, 100, 1000, 10_000)
+
+# 允许的误差：float64 为最大绝对误差，float32 为最大误差相对于参考输出最大幅值
+TOLERANCE = {'float64': 1e-9, 'float32': 5e-4}
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def make_signal(n, seed):
+    """带随机游走趋势的测试信号，种子固定保证结果可复现"""
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.standard_normal(n)) * 0.1 + rng.standard_normal(n)
+
+
+def max_error(y, ref, relative):
+    err = float(np.abs(np.asarray(y, dtype=np.float64) - ref).max())
+    if relative:
+        err /= max(float(np.abs(ref).max()), 1e-12)
+    return err
+
+
+def ns_per_sample(func, n):
+    number = max(1, 200_000 // n)
+    return min(timeit.repeat(func, number=number, repeat=5)) / number / n * 1e9
+
+
+def count_allocations(func):
+    """统计一次调用在Python侧（含numpy数据缓冲）新分配的内存块数和字节数"""
+    func()  # 预热，让内部缓冲区达到稳定大小
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    # 排除 tracemalloc 自身生成快照时的分配
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'filename')
+    blocks = sum(max(s.count_diff, 0) for s in stats)
+    size = sum(max(s.size_diff, 0) for s in stats)
+    return blocks, size
+
+
+def run(lengths, with_bench=True):
+    parity, bench, failures = [], [], []
+
+    for band, kw in BANDS.items():
+        b, a = butter(**kw)
+        sos = butter(**kw, output='sos')
+        filters = {
+            'tf': (ButterworthFilter(b, a), lambda x: filtfilt(b, a, x)),
+            'sos': (ButterworthFilter(sos), lambda x: sosfiltfilt(sos, x)),
+        }
+        for n in lengths:
+            x64 = make_signal(n, seed=n)
+            for dtype in ('float64', 'float32'):
+                x = x64.astype(dtype)
+                # 参考结果统一用float64计算
+                detrended = detrend(x.astype(np.float64))
+                for mode, (bwf, reference) in filters.items():
+                    err = max_error(bwf.filter(x), reference(detrended), relative=dtype == 'float32')
+                    blocks, size = count_allocations(lambda: bwf.filter(x))
+                    ok = err < TOLERANCE[dtype]
+                    parity.append({
+                        'func': 'filter', 'band': band, 'mode': mode, 'dtype': dtype, 'length': n,
+                        'max_error': float(f'{err:.2g}'), 'alloc_blocks': blocks, 'alloc_bytes': size,
+                        'ok': ok,
+                    })
+                    if not ok:
+                        failures.append(parity[-1])
+                    if with_bench:
+                        bench.append({
+                            'func': 'filter', 'band': band, 'mode': mode, 'dtype': dtype, 'length': n,
+                            'ns_per_sample': round(ns_per_sample(lambda: bwf.filter(x), n), 1),
+                        })
+
+    # detrend 与频带无关，只按长度和精度测试
+    bwf = ButterworthFilter(*butter(**BANDS['low']))
+    for n in lengths:
+        x64 = make_signal(n, seed=n)
+        for dtype in ('float64', 'float32'):
+            x = x64.astype(dtype)
+            ref = detrend(x.astype(np.float64))
+            # 去趋势的输出幅值随信号长度增长，统一用相对误差
+            err = max_error(bwf.detrend(x), ref, relative=True)
+            blocks, size = count_allocations(lambda: bwf.detrend(x))
+            ok = err < TOLERANCE[dtype]
+            parity.append({
+                'func': 'detrend', 'band': None, 'mode': None, 'dtype': dtype, 'length': n,
+                'max_error': float(f'{err:.2g}'), 'alloc_blocks': blocks, 'alloc_bytes': size,
+                'ok': ok,
+            })
+            if not ok:
+                failures.append(parity[-1])
+            if with_bench:
+                bench.append({
+                    'func': 'detrend', 'band': None, 'mode': None, 'dtype': dtype, 'length': n,
+                    'ns_per_sample': round(ns_per_sample(lambda: bwf.detrend(x), n), 1),
+                })
+
+    return parity, bench, failures
+
+
+def check_threads(n_threads=4, repeat=50, n=10_000):
+    """多个线程共享同一个实例调用 filter()，返回结果与单线程不一致的次数"""
+    mismatches = 0
+    for kw in BANDS.values():
+        for bwf in (ButterworthFilter(*butter(**kw)), ButterworthFilter(butter(**kw, output='sos'))):
+            # 每个线程使用不同长度的信号，共享缓冲区时会互相覆盖
+            signals = [make_signal(n + 17 * k, seed=k) for k in range(n_threads)]
+            expected = [bwf.filter(x) for x in signals]
+            errors = []
+
+            def worker(k):
+                for _ in range(repeat):
+                    if not np.array_equal(bwf.filter(signals[k]), expected[k]):
+                        errors.append(k)
+
+            threads = [threading.Thread(target=worker, args=(k,)) for k in range(n_threads)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            mismatches += len(errors)
+    return mismatches
+
+
+def dump_results(path, header, rows):
+    """每条结果占一行写入JSON，便于在diff中逐项比较"""
+    with open(path, 'w') as f:
+        f.write('{\n')
+        for key, value in header.items():
+            f.write(f' {json.dumps(key)}: {json.dumps(value)},\n')
+        f.write(' "results": [\n')
+        f.write(',\n'.join(f'  {json.dumps(r)}' for r in rows))
+        f.write('\n ]\n}\n')
+
+
+def print_table(parity, bench):
+    timing = {(r['func'], r['band'], r['mode'], r['dtype'], r['length']): r['ns_per_sample'] for r in bench}
+    print(f"{'func':<8} {'band':<5} {'mode':<4} {'dtype':<8} {'length':>8} {'max err':>9} "
+          f"{'ns/sample':>10} {'allocs':>7} {'bytes':>9}")
+    for r in parity:
+        key = (r['func'], r['band'], r['mode'], r['dtype'], r['length'])
+        ns = timing.get(key)
+        print(f"{r['func']:<8} {r['band'] or '-':<5} {r['mode'] or '-':<4} {r['dtype']:<8} {r['length']:>8} "
+              f"{r['max_error']:>9.1e} {ns if ns is not None else '-':>10} {r['alloc_blocks']:>7} "
+              f"{r['alloc_bytes']:>9}{'' if r['ok'] else '  FAIL'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ButterworthFilter parity and benchmark suite')
+    parser.add_argument('--quick', action='store_true', help='只测到 10^4 个样本，不写结果文件')
+    parser.add_argument('--no-bench', action='store_true', help='只做一致性测试')
+    args = parser.parse_args()
+
+    lengths = QUICK_LENGTHS if args.quick else LENGTHS
+    parity, bench, failures = run(lengths, with_bench=not args.no_bench)
+    print_table(parity, bench)
+    thread_mismatches = check_threads()
+    print(f"\n多线程共享实例: {'通过' if thread_mismatches == 0 else f'{thread_mismatches} 次结果不一致  FAIL'}")
+
+    if not args.quick:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        dump_results(os.path.join(RESULTS_DIR, 'butterworth_parity.json'), {'tolerance': TOLERANCE}, parity)
+        if bench:
+            machine = {
+                'platform': platform.platform(),
+                'processor': platform.processor() or platform.machine(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+            }
+            dump_results(os.path.join(RESULTS_DIR, 'butterworth_bench.json'), {'machine': machine}, bench)
+
+    if failures or thread_mismatches:
+        print(f"\n{len(failures)} 项超出误差范围" if failures else "\n多线程结果不一致")
+        sys.exit(1)
+    print("\n全部通过")
+
 
 if __name__ == "__main__":
-    test_filter()
\ No newline at end of file
+    main()
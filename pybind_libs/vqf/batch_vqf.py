@@ -0,0 +1,156 @@
+"""
+离线VQF姿态解算
+
+对采集得到的会话文件夹（包含 acc.txt、gyro.txt，可选 mag.txt）整段运行VQF，写出
+    quaternion_vqf.txt      timestamp_ns,w,x,y,z （与手表端 quaternion.txt 格式一致）
+    acc_gravity_free.txt    timestamp_ns,acc_x,acc_y,acc_z （世界坐标系下去除重力的加速度，m/s^2）
+多个会话文件夹用进程池并行处理，每个会话在一次原生调用中完成解算。
+
+用法:
+    python batch_vqf.py /path/to/data_root                # 递归查找所有会话文件夹
+    python batch_vqf.py session1 session2 --workers 8
+    python batch_vqf.py data_root --use-timestamps --mag   # 按时间戳计算步长，并使用 mag.txt
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from vqf_filter import offline_vqf
+
+SAMPLE_TIME = 0.01  # 与手表端 SignalProcessor 一致 (100Hz)
+GRAVITY = 9.81      # 手表端总加速度 = (gravity + userAcceleration) * 9.81
+QUAT_FILE = 'quaternion_vqf.txt'
+ACC_FREE_FILE = 'acc_gravity_free.txt'
+
+
+def find_sessions(paths):
+    """返回所有包含 acc.txt 和 gyro.txt 的文件夹"""
+    sessions = []
+    for path in paths:
+        for root, _, files in os.walk(path):
+            if 'acc.txt' in files and 'gyro.txt' in files:
+                sessions.append(root)
+    return sorted(sessions)
+
+
+def load_imu(path):
+    # 纳秒时间戳超出float64的精确整数范围，单独按int64读取
+    ts = np.loadtxt(path, skiprows=1, delimiter=',', usecols=0, dtype=np.int64, ndmin=1)
+    values = np.loadtxt(path, skiprows=1, delimiter=',', usecols=(1, 2, 3), ndmin=2)
+    return ts, values
+
+
+def save_txt(path, header, ts, values):
+    """按手表端的格式 (%llu,%.6f,...) 写出，时间戳保持int64不经过float转换"""
+    columns = [('timestamp_ns', np.int64)] + [(f'c{i}', np.float64) for i in range(values.shape[1])]
+    rows = np.empty(len(ts), dtype=columns)
+    rows['timestamp_ns'] = ts
+    for i in range(values.shape[1]):
+        rows[f'c{i}'] = values[:, i]
+    np.savetxt(path, rows, delimiter=',', fmt=['%d'] + ['%.6f'] * values.shape[1], header=header, comments='')
+
+
+def align_to(ts_ref, ts, values):
+    """把 values 插值到参考时间戳上；时间戳完全一致时直接返回"""
+    if len(ts) == len(ts_ref) and np.array_equal(ts, ts_ref):
+        return values
+    x = (ts - ts_ref[0]).astype(np.float64)
+    x_ref = (ts_ref - ts_ref[0]).astype(np.float64)
+    return np.stack([np.interp(x_ref, x, values[:, i]) for i in range(values.shape[1])], axis=1)
+
+
+def rotate(quat, v):
+    """用四元数 [w, x, y, z] 把传感器坐标系下的向量 v 旋转到世界坐标系，quat: (T, 4), v: (T, 3)"""
+    w = quat[:, :1]
+    u = quat[:, 1:]
+    t = 2.0 * np.cross(u, v)
+    return v + w * t + np.cross(u, t)
+
+
+def gravity_free_acc(quat, acc, g=GRAVITY):
+    acc_earth = rotate(quat, acc)
+    acc_earth[:, 2] -= g
+    return acc_earth
+
+
+def process_session(folder, use_timestamps=False, use_mag=False, overwrite=False):
+    """处理单个会话文件夹，返回 (folder, 样本数, 状态)"""
+    quat_path = os.path.join(folder, QUAT_FILE)
+    acc_free_path = os.path.join(folder, ACC_FREE_FILE)
+    if not overwrite and os.path.exists(quat_path) and os.path.exists(acc_free_path):
+        return folder, 0, 'skipped'
+
+    ts, acc = load_imu(os.path.join(folder, 'acc.txt'))
+    gyro_ts, gyro = load_imu(os.path.join(folder, 'gyro.txt'))
+    if len(ts) < 2 or len(gyro_ts) < 2:
+        return folder, 0, 'empty'
+    gyro = align_to(ts, gyro_ts, gyro)
+
+    mag = None
+    mag_path = os.path.join(folder, 'mag.txt')
+    if use_mag and os.path.exists(mag_path):
+        mag_ts, mag = load_imu(mag_path)
+        mag = align_to(ts, mag_ts, mag)
+
+    dt = None
+    if use_timestamps:
+        # 第一个样本没有前一帧，沿用标称步长；丢帧造成的长间隔截断到10个采样周期
+        dt = np.diff(ts, prepend=ts[0]) * 1e-9
+        dt[0] = SAMPLE_TIME
+        dt = np.clip(dt, 0.1 * SAMPLE_TIME, 10 * SAMPLE_TIME)
+
+    result = offline_vqf(gyro, acc, mag=mag, ts=SAMPLE_TIME, dt=dt)
+    quat = result['quat9D'] if mag is not None else result['quat6D']
+
+    save_txt(quat_path, 'timestamp_ns,w,x,y,z', ts, quat)
+    save_txt(acc_free_path, 'timestamp_ns,acc_x,acc_y,acc_z', ts, gravity_free_acc(quat, acc))
+    return folder, len(ts), 'ok'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline VQF orientation for recorded sessions')
+    parser.add_argument('paths', nargs='+', help='会话文件夹或数据根目录（递归查找）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='进程数，1 表示在当前进程中顺序处理')
+    parser.add_argument('--use-timestamps', action='store_true', help='按时间戳差计算每个样本的步长，默认固定10ms')
+    parser.add_argument('--mag', action='store_true', help='存在 mag.txt 时做9轴解算')
+    parser.add_argument('--overwrite', action='store_true', help='重新计算已有结果的会话')
+    args = parser.parse_args()
+
+    sessions = find_sessions(args.paths)
+    if not sessions:
+        print(f"错误：在 {args.paths} 中找不到包含 acc.txt 和 gyro.txt 的会话文件夹")
+        sys.exit(1)
+
+    kwargs = dict(use_timestamps=args.use_timestamps, use_mag=args.mag, overwrite=args.overwrite)
+    start = time.perf_counter()
+    total, failed = 0, 0
+    if args.workers <= 1:
+        results = (process_session(folder, **kwargs) for folder in sessions)
+        for folder, n, status in results:
+            total += n
+            print(f"[{status}] {folder} ({n} samples)")
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(process_session, folder, **kwargs): folder for folder in sessions}
+            for future in as_completed(futures):
+                try:
+                    folder, n, status = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[error] {futures[future]}: {e}")
+                    continue
+                total += n
+                print(f"[{status}] {folder} ({n} samples)")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(sessions)} 个会话，{total} 个样本，耗时 {elapsed:.2f} s"
+          f"（{total / max(elapsed, 1e-9) / 1e6:.2f} M samples/s），失败 {failed} 个")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
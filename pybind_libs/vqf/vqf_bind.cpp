@@ -0,0 +1,167 @@
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+#include <pybind11/stl.h>
+#include <array>
+#include <vector>
+#include "vqf.hpp"
+
+namespace py = pybind11;
+
+using RealArray = py::array_t<vqf_real_t, py::array::c_style | py::array::forcecast>;
+
+// 检查并转换 (T, 3) 的传感器数组
+static RealArray as_samples(const py::handle& x, const char* name) {
+    RealArray arr = RealArray::ensure(x);
+    if (!arr || arr.ndim() != 2 || arr.shape(1) != 3) {
+        throw std::invalid_argument(std::string(name) + " must be a (T, 3) array");
+    }
+    return arr;
+}
+
+// 在整段 (T, 3) 数据上运行 VQF，一次调用完成全部更新，计算期间释放GIL
+// dt 为 None 时使用构造时的 gyrTs，为标量时固定步长，为 (T,) 数组时逐样本步长
+static py::dict update_batch(VQF& self, const py::object& gyr, const py::object& acc,
+                             const py::object& mag, const py::object& dt) {
+    RealArray gyr_arr = as_samples(gyr, "gyr");
+    RealArray acc_arr = as_samples(acc, "acc");
+    size_t n = static_cast<size_t>(gyr_arr.shape(0));
+    if (static_cast<size_t>(acc_arr.shape(0)) != n) {
+        throw std::invalid_argument("gyr and acc must have the same length");
+    }
+    RealArray mag_arr;
+    bool with_mag = !mag.is_none();
+    if (with_mag) {
+        mag_arr = as_samples(mag, "mag");
+        if (static_cast<size_t>(mag_arr.shape(0)) != n) {
+            throw std::invalid_argument("mag must have the same length as gyr");
+        }
+    }
+
+    std::vector<vqf_real_t> dt_vec;
+    if (dt.is_none() || py::isinstance<py::float_>(dt) || py::isinstance<py::int_>(dt)) {
+        vqf_real_t ts = dt.is_none() ? self.getCoeffs().gyrTs : dt.cast<vqf_real_t>();
+        dt_vec.assign(n, ts);
+    } else {
+        RealArray dt_arr = RealArray::ensure(dt);
+        if (!dt_arr || dt_arr.ndim() != 1 || static_cast<size_t>(dt_arr.shape(0)) != n) {
+            throw std::invalid_argument("dt must be None, a scalar or a (T,) array");
+        }
+        dt_vec.assign(dt_arr.data(), dt_arr.data() + n);
+    }
+
+    py::ssize_t t = static_cast<py::ssize_t>(n);
+    py::array_t<vqf_real_t> quat6d({t, py::ssize_t(4)});
+    py::array_t<vqf_real_t> quat9d = with_mag ? py::array_t<vqf_real_t>({t, py::ssize_t(4)}) : py::array_t<vqf_real_t>();
+    py::array_t<vqf_real_t> delta(t);
+    py::array_t<vqf_real_t> bias({t, py::ssize_t(3)});
+    py::array_t<vqf_real_t> bias_sigma(t);
+    py::array_t<bool> rest(t);
+    py::array_t<bool> mag_dist = with_mag ? py::array_t<bool>(t) : py::array_t<bool>();
+
+    const vqf_real_t* gyr_ptr = gyr_arr.data();
+    const vqf_real_t* acc_ptr = acc_arr.data();
+    const vqf_real_t* mag_ptr = with_mag ? mag_arr.data() : nullptr;
+    vqf_real_t* quat6d_ptr = quat6d.mutable_data();
+    vqf_real_t* quat9d_ptr = with_mag ? quat9d.mutable_data() : nullptr;
+    vqf_real_t* delta_ptr = delta.mutable_data();
+    vqf_real_t* bias_ptr = bias.mutable_data();
+    vqf_real_t* bias_sigma_ptr = bias_sigma.mutable_data();
+    bool* rest_ptr = rest.mutable_data();
+    bool* mag_dist_ptr = with_mag ? mag_dist.mutable_data() : nullptr;
+    {
+        py::gil_scoped_release release;
+        self.updateBatch(dt_vec.data(), gyr_ptr, acc_ptr, mag_ptr, n,
+                         quat6d_ptr, quat9d_ptr, delta_ptr, bias_ptr, bias_sigma_ptr, rest_ptr, mag_dist_ptr);
+    }
+
+    py::dict result;
+    result["quat6D"] = quat6d;
+    if (with_mag) {
+        result["quat9D"] = quat9d;
+        result["magDist"] = mag_dist;
+    }
+    result["delta"] = delta;
+    result["bias"] = bias;
+    result["biasSigma"] = bias_sigma;
+    result["restDetected"] = rest;
+    return result;
+}
+
+static py::array_t<vqf_real_t> quat_array(const VQF& self, void (VQF::*getter)(vqf_real_t*) const) {
+    py::array_t<vqf_real_t> out(4);
+    (self.*getter)(out.mutable_data());
+    return out;
+}
+
+static VQFParams make_params(vqf_real_t tau_acc, vqf_real_t tau_mag, bool motion_bias_est_enabled,
+                             bool rest_bias_est_enabled, bool mag_dist_rejection_enabled) {
+    VQFParams params;
+    params.tauAcc = tau_acc;
+    params.tauMag = tau_mag;
+#ifndef VQF_NO_MOTION_BIAS_ESTIMATION
+    params.motionBiasEstEnabled = motion_bias_est_enabled;
+#endif
+    params.restBiasEstEnabled = rest_bias_est_enabled;
+    params.magDistRejectionEnabled = mag_dist_rejection_enabled;
+    return params;
+}
+
+PYBIND11_MODULE(vqf_filter, m) {
+    const VQFParams defaults;
+
+    py::class_<VQF>(m, "VQF")
+        .def(py::init([](vqf_real_t gyr_ts, vqf_real_t acc_ts, vqf_real_t mag_ts, vqf_real_t tau_acc, vqf_real_t tau_mag,
+                         bool motion_bias_est_enabled, bool rest_bias_est_enabled, bool mag_dist_rejection_enabled) {
+                 VQFParams params = make_params(tau_acc, tau_mag, motion_bias_est_enabled,
+                                                rest_bias_est_enabled, mag_dist_rejection_enabled);
+                 return new VQF(params, gyr_ts, acc_ts, mag_ts);
+             }),
+             py::arg("gyr_ts"), py::arg("acc_ts") = -1.0, py::arg("mag_ts") = -1.0,
+             py::arg("tau_acc") = defaults.tauAcc, py::arg("tau_mag") = defaults.tauMag,
+#ifndef VQF_NO_MOTION_BIAS_ESTIMATION
+             py::arg("motion_bias_est_enabled") = defaults.motionBiasEstEnabled,
+#else
+             py::arg("motion_bias_est_enabled") = false,
+#endif
+             py::arg("rest_bias_est_enabled") = defaults.restBiasEstEnabled,
+             py::arg("mag_dist_rejection_enabled") = defaults.magDistRejectionEnabled)
+        // 单样本更新，与手表端 VQFBridge 的调用方式一致
+        .def("update_gyr", [](VQF& self, vqf_real_t dt, const std::array<vqf_real_t, 3>& gyr) {
+            self.updateGyr(dt, gyr.data());
+        }, py::arg("dt"), py::arg("gyr"))
+        .def("update_acc", [](VQF& self, vqf_real_t dt, const std::array<vqf_real_t, 3>& acc) {
+            self.updateAcc(dt, acc.data());
+        }, py::arg("dt"), py::arg("acc"))
+        .def("update_mag", [](VQF& self, vqf_real_t dt, const std::array<vqf_real_t, 3>& mag) {
+            self.updateMag(dt, mag.data());
+        }, py::arg("dt"), py::arg("mag"))
+        .def("update_batch", &update_batch,
+             py::arg("gyr"), py::arg("acc"), py::arg("mag") = py::none(), py::arg("dt") = py::none())
+        .def("get_quat3D", [](const VQF& self) { return quat_array(self, &VQF::getQuat3D); })
+        .def("get_quat6D", [](const VQF& self) { return quat_array(self, &VQF::getQuat6D); })
+        .def("get_quat9D", [](const VQF& self) { return quat_array(self, &VQF::getQuat9D); })
+        .def("get_delta", &VQF::getDelta)
+        .def("get_bias_estimate", [](const VQF& self) {
+            py::array_t<vqf_real_t> bias(3);
+            vqf_real_t sigma = self.getBiasEstimate(bias.mutable_data());
+            return py::make_tuple(bias, sigma);
+        })
+        .def("get_rest_detected", &VQF::getRestDetected)
+        .def("get_mag_dist_detected", &VQF::getMagDistDetected)
+        .def("reset_state", &VQF::resetState);
+
+    // 一次性离线解算：gyr/acc(/mag) 为 (T, 3) 数组，返回包含 (T, 4) 四元数等结果的 dict
+    m.def("offline_vqf", [](const py::object& gyr, const py::object& acc, const py::object& mag, vqf_real_t ts,
+                            const py::object& dt, vqf_real_t tau_acc, vqf_real_t tau_mag) {
+        VQFParams params = make_params(tau_acc, tau_mag,
+#ifndef VQF_NO_MOTION_BIAS_ESTIMATION
+                                       VQFParams().motionBiasEstEnabled,
+#else
+                                       false,
+#endif
+                                       VQFParams().restBiasEstEnabled, VQFParams().magDistRejectionEnabled);
+        VQF vqf(params, ts);
+        return update_batch(vqf, gyr, acc, mag, dt);
+    }, py::arg("gyr"), py::arg("acc"), py::arg("mag") = py::none(), py::arg("ts") = 0.01, py::arg("dt") = py::none(),
+       py::arg("tau_acc") = defaults.tauAcc, py::arg("tau_mag") = defaults.tauMag);
+}
@@ -0,0 +1,203 @@
+"""
+训练时对整个 batch 做数据增强 (CPU，向量化)
+
+输入为 MHGDataSet / load_all_data 给出的 (B, 6, 1, T)，也接受 (B, 6, T)；通道顺序 acc xyz, gyro xyz。
+每种变换对整个 batch 一次完成，没有逐样本的 Python 循环，不放在 __getitem__ 中，不拖慢数据读取:
+
+    rotate      acc 和 gyro 用同一个随机 3-D 旋转 (随机轴，角度不超过 max_angle 度)，模拟佩戴角度的差异；
+                滤波是逐轴的线性运算，对 filtered 数据旋转与对原始数据旋转后再滤波等价
+    time_warp   以窗口中心 (峰值) 为不动点按随机比例拉伸/压缩时间轴，批量线性插值
+    scale       每个样本的 acc、gyro 各乘一个随机系数
+    jitter      加高斯噪声，标准差为每个通道自身标准差的 jitter 倍
+    shift       峰值位置随机平移不超过 max_shift 个采样点，两端用边界值填充
+
+随机数由 BatchAugment 自己的 torch.Generator 产生，相同 seed 得到相同的增强序列，与全局随机状态无关。
+
+用法:
+    from augment import BatchAugment
+    augment = BatchAugment(seed=0)
+    for x, y in train_loader:
+        x = augment(x)
+
+    python augment.py                     # 各变换的吞吐量，与 GestureModel 训练一步的速度对比
+    python augment.py --batch-size 512 --threads 4
+"""
+import argparse
+import math
+import time
+
+import torch
+
+from gesture_models import MODELS
+
+ACC = slice(0, 3)
+GYRO = slice(3, 6)
+
+
+def random_rotations(batch_size, max_angle, generator):
+    """(B, 3, 3) 旋转矩阵：随机单位旋转轴，角度均匀分布在 [-max_angle, max_angle] 度 (Rodrigues 公式)"""
+    axis = torch.randn(batch_size, 3, generator=generator)
+    axis = axis / axis.norm(dim=1, keepdim=True).clamp_min(1e-12)
+    angle = (torch.rand(batch_size, generator=generator) * 2 - 1) * math.radians(max_angle)
+    kx, ky, kz = axis.unbind(1)
+    zero = torch.zeros_like(kx)
+    K = torch.stack([zero, -kz, ky, kz, zero, -kx, -ky, kx, zero], dim=1).reshape(batch_size, 3, 3)
+    sin, cos = angle.sin()[:, None, None], angle.cos()[:, None, None]
+    return torch.eye(3).expand(batch_size, 3, 3) + sin * K + (1 - cos) * (K @ K)
+
+
+def rotate(x, rotations):
+    """x: (B, 6, T)，acc 和 gyro 左乘同一个旋转矩阵"""
+    return torch.cat([rotations @ x[:, ACC], rotations @ x[:, GYRO]], dim=1)
+
+
+def resample(x, positions):
+    """
+    按浮点位置批量线性插值，越界的位置取边界值
+    Args:
+        x: (B, C, T)
+        positions: (B, T_out)，以采样点为单位
+    """
+    T = x.shape[-1]
+    positions = positions.clamp(0, T - 1)
+    left = positions.floor().long().clamp(max=T - 2) if T > 1 else positions.long()
+    weight = (positions - left).unsqueeze(1)
+    index = left.unsqueeze(1).expand(-1, x.shape[1], -1)
+    x_left = x.gather(2, index)
+    x_right = x.gather(2, (index + 1).clamp(max=T - 1))
+    return x_left + weight * (x_right - x_left)
+
+
+def time_warp(x, stretch, generator, center=None):
+    """以 center (默认窗口中心) 为不动点，每个样本按 U(1 - stretch, 1 + stretch) 的比例缩放时间轴"""
+    B, _, T = x.shape
+    center = (T - 1) / 2 if center is None else center
+    factor = 1 + (torch.rand(B, 1, generator=generator) * 2 - 1) * stretch
+    positions = center + (torch.arange(T, dtype=x.dtype) - center) * factor
+    return resample(x, positions)
+
+
+def shift(x, max_shift, generator):
+    """每个样本整体平移 [-max_shift, max_shift] 个采样点，峰值随之偏离窗口中心"""
+    B, _, T = x.shape
+    offsets = torch.randint(-max_shift, max_shift + 1, (B, 1), generator=generator)
+    index = (torch.arange(T) - offsets).clamp(0, T - 1)
+    return x.gather(2, index.unsqueeze(1).expand(-1, x.shape[1], -1))
+
+
+def scale(x, sigma, generator):
+    """acc、gyro 各自乘以 N(1, sigma) 的系数"""
+    factors = 1 + torch.randn(x.shape[0], 2, 1, 1, generator=generator) * sigma
+    return (x.reshape(x.shape[0], 2, 3, -1) * factors).reshape(x.shape)
+
+
+def jitter(x, sigma, generator):
+    """加高斯噪声，标准差为各通道标准差的 sigma 倍"""
+    return x + torch.randn(x.shape, generator=generator) * sigma * x.std(dim=2, keepdim=True)
+
+
+class BatchAugment:
+    def __init__(self, seed=0, p=0.5, max_angle=15.0, stretch=0.1, scale_sigma=0.1, jitter_sigma=0.03,
+                 max_shift=5, transforms=('rotate', 'time_warp', 'scale', 'jitter', 'shift')):
+        """
+        Args:
+            p: 每种变换作用于每个样本的概率，未选中的样本保持不变
+            max_angle: 旋转角度上限 (度)
+            stretch: 时间轴缩放比例的范围 1 ± stretch
+            scale_sigma: 幅值系数的标准差
+            jitter_sigma: 噪声标准差相对通道标准差的比例
+            max_shift: 峰值平移的最大采样点数
+            transforms: 使用的变换，按顺序执行
+        """
+        unknown = set(transforms) - {'rotate', 'time_warp', 'scale', 'jitter', 'shift'}
+        if unknown:
+            raise ValueError(f"未知的增强方式: {sorted(unknown)}")
+        self.generator = torch.Generator().manual_seed(seed)
+        self.p = p
+        self.transforms = list(transforms)
+        self.params = {'max_angle': max_angle, 'stretch': stretch, 'scale_sigma': scale_sigma,
+                       'jitter_sigma': jitter_sigma, 'max_shift': max_shift}
+
+    def apply(self, name, x):
+        g = self.generator
+        if name == 'rotate':
+            return rotate(x, random_rotations(len(x), self.params['max_angle'], g))
+        if name == 'time_warp':
+            return time_warp(x, self.params['stretch'], g)
+        if name == 'scale':
+            return scale(x, self.params['scale_sigma'], g)
+        if name == 'jitter':
+            return jitter(x, self.params['jitter_sigma'], g)
+        return shift(x, self.params['max_shift'], g)
+
+    @torch.no_grad()
+    def __call__(self, x):
+        """(B, 6, 1, T) 或 (B, 6, T) -> 形状相同的增强结果 (新张量，不修改输入)"""
+        shape = x.shape
+        x = x.reshape(shape[0], 6, shape[-1]).float()
+        for name in self.transforms:
+            # 对整个 batch 计算后按概率选择，避免按样本分支
+            mask = torch.rand(shape[0], 1, 1, generator=self.generator) < self.p
+            x = torch.where(mask, self.apply(name, x), x)
+        return x.reshape(shape)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vectorized batch augmentation against a training step')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--T', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=None, help='torch.set_num_threads')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    x = torch.randn(args.batch_size, 6, 1, args.T, generator=torch.Generator().manual_seed(args.seed))
+
+    # 可复现：相同 seed 的两个实例给出相同结果
+    assert torch.equal(BatchAugment(seed=args.seed)(x), BatchAugment(seed=args.seed)(x))
+    # 旋转不改变 acc/gyro 的模长，p=1 时每个样本都被旋转
+    rotated = BatchAugment(seed=args.seed, p=1.0, transforms=('rotate',))(x)
+    assert torch.allclose(rotated[:, ACC].norm(dim=1), x[:, ACC].norm(dim=1), atol=1e-5)
+    # 不缩放、不平移时时间轴变换是恒等的
+    assert torch.allclose(time_warp(x[:, :, 0], 0.0, torch.Generator()), x[:, :, 0], atol=1e-6)
+    assert torch.equal(shift(x[:, :, 0], 0, torch.Generator()), x[:, :, 0])
+
+    def samples_per_second(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        return args.batch_size * args.repeat / (time.perf_counter() - start)
+
+    results = {}
+    for name in ('rotate', 'time_warp', 'scale', 'jitter', 'shift'):
+        augment = BatchAugment(seed=args.seed, p=1.0, transforms=(name,))
+        results[name] = samples_per_second(lambda: augment(x))
+    augment = BatchAugment(seed=args.seed)
+    results['all (p=0.5)'] = samples_per_second(lambda: augment(x))
+
+    if args.T == MODELS['gesture'][1][-1]:
+        model = MODELS['gesture'][0](9)
+        optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+        criterion = torch.nn.CrossEntropyLoss()
+        y = torch.randint(0, 9, (args.batch_size,))
+
+        def train_step():
+            optimizer.zero_grad()
+            loss = criterion(model(x), y)
+            loss.backward()
+            optimizer.step()
+        results['GestureModel train step'] = samples_per_second(train_step)
+
+    print(f"batch_size={args.batch_size}, T={args.T}, threads={torch.get_num_threads()}")
+    print(f"{'transform':<26} {'samples/s':>12}")
+    for name, value in results.items():
+        print(f"{name:<26} {value:>12.0f}")
+    if 'GestureModel train step' in results:
+        print(f"\n全部增强的吞吐量是训练速度的 {results['all (p=0.5)'] / results['GestureModel train step']:.1f} 倍")
+
+
+if __name__ == "__main__":
+    main()
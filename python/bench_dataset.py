@@ -0,0 +1,134 @@
+"""
+MHGDataSet 读取速度对比 (samples/s)
+
+    per-sample open   每个样本打开一次 h5 文件并转换场景属性 (原来的实现)
+    persistent        每个进程只打开一次 (gesture_dataset.MHGDataSet)
+    consolidated      migrate_h5.py 转换后的合并布局，每个batch一次切片读取
+
+都用 DataLoader(shuffle=True) 读完整个数据集，分别测试 num_workers=0 和 >0。
+另外对比一次性读入整个数据集：get_all_data() 与 load_all_data() 的 .npy 缓存 (首次生成 / 命中)。
+不指定数据文件时生成与 train.h5 布局相同的临时文件。
+
+用法:
+    python bench_dataset.py
+    python bench_dataset.py train.h5 --workers 0 4 --batch-size 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from gesture_dataset import MHGDataSet, load_all_data, y_idx2lbl, y_lbl2onehot
+from migrate_h5 import migrate
+
+
+class PerSampleOpenDataSet(MHGDataSet):
+    """原来的读取方式：每个样本都重新打开文件"""
+
+    def __getitem__(self, idx):
+        which_scene_idx, which_scene = self.get_scene_by_idx(idx)
+        offset = str(idx - self.prefix_sum[which_scene_idx])
+        with h5py.File(self.h5_path, 'r') as h5:
+            data = h5[which_scene][offset]
+            attr = dict(h5[which_scene].attrs)
+            acc_filtered = np.array(data['acc_filtered'], dtype=float)
+            gyro_filtered = np.array(data['gyro_filtered'], dtype=float)
+            x = torch.from_numpy(np.c_[acc_filtered, gyro_filtered])
+            x = x.permute(1, 0)
+            x = x[:, None, :]
+            y = torch.from_numpy(y_lbl2onehot[data.attrs['gt']])
+            return x.float(), y.float()
+
+    def __getitems__(self, indices):
+        # DataLoader 优先调用 __getitems__，不覆盖时会用到 MHGDataSet 的批量读取，对比就失去意义
+        return [self[idx] for idx in indices]
+
+
+def make_synthetic_h5(path, n_scenes=20, per_scene=200, T=100, seed=0):
+    rng = np.random.default_rng(seed)
+    with h5py.File(path, 'w') as h5:
+        for s in range(n_scenes):
+            scene = h5.create_group(f'scene_{s:03d}')
+            scene.attrs.update({'date': '20241201', 'force_level': 'medium', 'handness': 'left',
+                                'note': '', 'scene_kw': 'sit', 'scene_property': 'synthetic'})
+            for i in range(per_scene):
+                group = scene.create_group(str(i))
+                for name in ('acc_rawdata', 'gyro_rawdata', 'acc_filtered', 'gyro_filtered'):
+                    group[name] = rng.standard_normal((T, 3))
+                group.attrs['gt'] = y_idx2lbl[rng.integers(len(y_idx2lbl))]
+
+
+def samples_per_second(dataset, num_workers, batch_size, max_batches=None):
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers,
+                        persistent_workers=False)
+    n = 0
+    start = time.perf_counter()
+    for i, (x, y) in enumerate(loader):
+        n += len(x)
+        if max_batches and i + 1 >= max_batches:
+            break
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MHGDataSet read throughput')
+    parser.add_argument('h5_path', nargs='?', default=None, help='不指定时生成临时数据')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-batches', type=int, default=None, help='每次最多读取的batch数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.h5_path
+        if path is None:
+            path = os.path.join(tmp, 'synthetic.h5')
+            make_synthetic_h5(path)
+        elif not os.path.exists(path):
+            print(f"错误：找不到文件 {path}")
+            sys.exit(1)
+
+        datasets = {'per-sample open': PerSampleOpenDataSet(path), 'persistent': MHGDataSet(path)}
+        if not datasets['persistent'].consolidated:
+            consolidated_path = os.path.join(tmp, 'consolidated.h5')
+            migrate(path, consolidated_path)
+            datasets['consolidated'] = MHGDataSet(consolidated_path)
+        # 各实现读出的数据必须相同 (合并布局存为 float32)
+        for idx in (0, len(datasets['persistent']) - 1):
+            a = datasets['per-sample open'][idx]
+            for dataset in datasets.values():
+                b = dataset[idx]
+                assert torch.allclose(a[0], b[0], atol=1e-6) and torch.equal(a[1], b[1])
+
+        print(f"\n{len(datasets['persistent'])} 个样本, batch_size={args.batch_size}")
+        print(f"{'dataset':<18} {'workers':>8} {'samples/s':>10}")
+        for num_workers in args.workers:
+            results = {}
+            for name, dataset in datasets.items():
+                results[name] = samples_per_second(dataset, num_workers, args.batch_size, args.max_batches)
+                print(f"{name:<18} {num_workers:>8} {results[name]:>10.0f}")
+            for name in list(datasets)[1:]:
+                print(f"{'speedup (' + name + ')':<30} {results[name] / results['per-sample open']:>6.2f}x")
+
+        print(f"\n{'whole dataset':<30} {'seconds':>8}")
+        reference = None
+        for name, load in (
+            ('get_all_data()', lambda: MHGDataSet(path).get_all_data()),
+            ('load_all_data() cold', lambda: load_all_data(path, os.path.join(tmp, 'cache'))),
+            ('load_all_data() warm', lambda: load_all_data(path, os.path.join(tmp, 'cache'))),
+        ):
+            start = time.perf_counter()
+            x, y = load()
+            x.sum()  # 内存映射只有在读取时才真正加载
+            print(f"{name:<30} {time.perf_counter() - start:>8.3f}")
+            reference = (x, y) if reference is None else reference
+            assert torch.equal(x, reference[0]) and torch.equal(y, reference[1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+NumPy推理引擎与PyTorch的一致性检查和性能对比
+
+    1. 一致性：随机权重（BatchNorm的running统计量也随机化）和可选的真实checkpoint，
+       比较 NumPy 与 PyTorch eager 的 logits，float32 下最大误差应 < 1e-4
+    2. 启动：在子进程中从导入到第一次推理完成的耗时和峰值RSS
+    3. 延迟：batch=1 的单窗口延迟和 batch=256 时摊到每个窗口的延迟
+
+用法:
+    python bench_numpy_inference.py
+    python bench_numpy_inference.py --checkpoint valid_epoch=14_accuracy=0.960.pt --arch gesture
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import torch
+
+from gesture_models import MODELS, example_input
+from numpy_inference import export_npz, load_numpy_model
+
+TOLERANCE = 1e-4
+
+# 子进程中执行：导入 -> 加载模型 -> 推理一次，输出耗时(s)和峰值RSS(MB)
+STARTUP_SCRIPT = {
+    'numpy': '''
+import time; start = time.perf_counter()
+import numpy as np
+from numpy_inference import load_numpy_model
+model = load_numpy_model({path!r})
+model.predict(np.zeros((1,) + {shape!r}, dtype=np.float32))
+elapsed = time.perf_counter() - start
+''',
+    'torch': '''
+import time; start = time.perf_counter()
+import torch
+from gesture_models import load_model
+model = load_model({arch!r}, {path!r})
+with torch.inference_mode():
+    model(torch.zeros((1,) + {shape!r}))
+elapsed = time.perf_counter() - start
+''',
+}
+REPORT = '''
+import resource, sys
+if sys.platform.startswith('linux'):
+    # ru_maxrss 在 exec 之后仍保留父进程的峰值，Linux 上改用 VmHWM
+    with open('/proc/self/status') as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+else:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+print(elapsed, rss)
+'''
+
+
+def randomize_bn(model, seed=0):
+    """训练后的BN统计量不是 0/1，随机化后才能检验折叠是否正确"""
+    g = torch.Generator().manual_seed(seed)
+    for m in model.modules():
+        if isinstance(m, torch.nn.BatchNorm1d):
+            n = m.num_features
+            m.running_mean.copy_(torch.randn(n, generator=g) * 0.5)
+            m.running_var.copy_(torch.rand(n, generator=g) + 0.5)
+            m.weight.data.copy_(torch.randn(n, generator=g) * 0.5 + 1.0)
+            m.bias.data.copy_(torch.randn(n, generator=g) * 0.1)
+    return model.eval()
+
+
+def check_parity(arch, checkpoint, npz_path):
+    model = MODELS[arch][0](9)
+    model.load_state_dict(torch.load(checkpoint, map_location='cpu'))
+    model.eval()
+    numpy_model = load_numpy_model(npz_path)
+    errors = []
+    for batch_size in (1, 7, 256):
+        x = example_input(arch, batch_size) * 4 - 2
+        with torch.inference_mode():
+            ref = model(x).numpy()
+        errors.append(float(np.abs(numpy_model.predict(x.numpy()) - ref).max()))
+    return max(errors)
+
+
+def measure_startup(kind, arch, path):
+    shape = MODELS[arch][1]
+    code = STARTUP_SCRIPT[kind].format(arch=arch, path=path, shape=shape) + REPORT
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed, rss = map(float, out.stdout.split()[-2:])
+    return elapsed, rss
+
+
+def measure_latency(predict, x):
+    number = max(1, 2000 // len(x))
+    return min(timeit.repeat(lambda: predict(x), number=number, repeat=5)) / number / len(x)
+
+
+def bench(arch, checkpoint, npz_path):
+    model = MODELS[arch][0](9)
+    model.load_state_dict(torch.load(checkpoint, map_location='cpu'))
+    model.eval()
+    numpy_model = load_numpy_model(npz_path)
+
+    def torch_predict(x):
+        with torch.inference_mode():
+            return model(torch.from_numpy(x)).numpy()
+
+    print(f"\n[{arch}] {'backend':<7} {'startup (s)':>12} {'RSS (MB)':>9} {'batch=1 (us)':>13} {'batch=256 (us/window)':>22}")
+    for kind, predict in (('torch', torch_predict), ('numpy', numpy_model.predict)):
+        startup, rss = measure_startup(kind, arch, checkpoint if kind == 'torch' else npz_path)
+        t1 = measure_latency(predict, example_input(arch, 1).numpy())
+        t256 = measure_latency(predict, example_input(arch, 256).numpy())
+        print(f"[{arch}] {kind:<7} {startup:>12.3f} {rss:>9.1f} {t1 * 1e6:>13.1f} {t256 * 1e6:>22.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NumPy inference engine parity and benchmark')
+    parser.add_argument('--checkpoint', default=None, help='真实checkpoint，不指定时只用随机权重')
+    parser.add_argument('--arch', choices=list(MODELS), default='gesture')
+    parser.add_argument('--no-bench', action='store_true', help='只做一致性检查')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = []
+        for arch in MODELS:
+            checkpoint = os.path.join(tmp, f'{arch}_random.pt')
+            torch.manual_seed(0)
+            torch.save(randomize_bn(MODELS[arch][0](9)).state_dict(), checkpoint)
+            cases.append((arch, checkpoint))
+        if args.checkpoint:
+            cases.append((args.arch, os.path.abspath(args.checkpoint)))
+
+        print(f"{'arch':<8} {'checkpoint':<40} {'max |diff|':>11}")
+        for arch, checkpoint in cases:
+            npz_path = os.path.join(tmp, os.path.splitext(os.path.basename(checkpoint))[0] + '.npz')
+            export_npz(arch, checkpoint, npz_path)
+            err = check_parity(arch, checkpoint, npz_path)
+            failed |= err >= TOLERANCE
+            print(f"{arch:<8} {os.path.basename(checkpoint):<40} {err:>11.2e}{'' if err < TOLERANCE else '  FAIL'}")
+
+        if not args.no_bench:
+            for arch, checkpoint in cases[-2:] if not args.checkpoint else cases[-1:]:
+                npz_path = os.path.join(tmp, os.path.splitext(os.path.basename(checkpoint))[0] + '.npz')
+                bench(arch, checkpoint, npz_path)
+
+    if failed:
+        print(f"\n超出误差范围 ({TOLERANCE})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""
+从手表采集的原始数据文件夹直接生成训练用的 h5 (合并布局，见 gesture_dataset.py)
+
+每个采集文件夹 (名字形如 2025_04_07_14_52_02_Howie_左手_混合_轻_静坐) 包含:
+    acc.txt / gyro.txt     timestamp_ns,x,y,z (加速度 m/s²，角速度 rad/s)
+    result.txt             手表检测到的峰值: timestamp_ns,relative_timestamp_s,gesture,confidence,peak_value,id
+    manual_result.txt      人工校对后的结果，多出 true_gesture,is_deleted,... (可选)
+    info.yaml              采集信息 (可选)
+
+每个文件夹是进程池中的一个任务:
+    解析 acc/gyro -> 峰值时间戳对齐到 acc/gyro 的行号 -> 以峰值为中心截取 2*half_window 长的窗口
+    -> acc/9.81 做 0.1~40Hz 二阶零相位带通 (与 main.ipynb 的预处理相同)，gyro 不滤波
+标签优先用 manual_result.txt 中未删除的 true_gesture，没有该文件时用 result.txt 的 gesture；
+'日常' 记为 '其它'，不在 y_idx2lbl 中的手势跳过并在最后统计。
+
+增量构建: cache_dir/<输出文件名>.manifest.json 记录每个文件夹的内容哈希 (包含处理参数)、文件大小和修改时间。
+再次运行时大小和修改时间都没变的文件夹直接复用，变了的重新计算哈希，哈希相同也不重新处理。
+每个文件夹的结果按哈希存为 cache_dir/sessions/<hash>.npz，最后按文件夹名排序合并写出 h5。
+
+用法:
+    python build_dataset.py ~/Downloads/sessions aw10_data.h5
+    python build_dataset.py ~/Downloads/sessions aw10_data.h5 --workers 8 --half-window 50
+    python build_dataset.py ~/Downloads/sessions aw10_data.h5 --rebuild
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import h5py
+import numpy as np
+
+from gesture_dataset import CONSOLIDATED, y_idx2lbl, y_lbl2idx
+from migrate_h5 import attrs_table
+from preprocess import DEFAULT_FILTERS, apply_filters
+from sensor_io import load_imu
+from timestamp_align import align_imu, align_nearest
+
+SESSION_FILES = ('acc.txt', 'gyro.txt', 'result.txt', 'manual_result.txt', 'info.yaml')
+REQUIRED_FILES = ('acc.txt', 'gyro.txt', 'result.txt')
+BUILD_CACHE_DIR = '.build_cache'
+LABEL_ALIASES = {'日常': '其它'}
+# 修改窗口截取或滤波的实现后需要增加版本号，使已缓存的结果失效
+BUILD_VERSION = 2
+
+
+def build_config(half_window=50, tolerance_ns=5_000_000):
+    return {
+        'half_window': half_window,
+        'tolerance_ns': tolerance_ns,
+        'filters': DEFAULT_FILTERS,
+        'labels': y_idx2lbl,
+        'aliases': LABEL_ALIASES,
+        'version': BUILD_VERSION,
+    }
+
+
+def find_sessions(root):
+    """root 下所有包含 acc.txt/gyro.txt/result.txt 的文件夹 (相对路径，已排序)"""
+    sessions = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        if all(name in files for name in REQUIRED_FILES):
+            sessions.append(os.path.relpath(folder, root))
+    return sorted(sessions)
+
+
+def file_stats(folder):
+    """{文件名: [大小, 修改时间]}，只包含存在的文件"""
+    stats = {}
+    for name in SESSION_FILES:
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stats[name] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+
+def session_hash(folder, config, block_size=1 << 20):
+    sha1 = hashlib.sha1(json.dumps(config, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    for name in SESSION_FILES:
+        path = os.path.join(folder, name)
+        if not os.path.exists(path):
+            continue
+        sha1.update(name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                sha1.update(block)
+    return sha1.hexdigest()
+
+
+def read_peaks(folder):
+    """
+    峰值时间戳和标签名
+    Returns:
+        timestamps: (M,) int64, labels: M 个手势名, deleted: 被人工删除的峰值数
+    """
+    path = os.path.join(folder, 'manual_result.txt')
+    if not os.path.exists(path):
+        path = os.path.join(folder, 'result.txt')
+    timestamps, labels, deleted = [], [], 0
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if row.get('is_deleted') == '1':
+                deleted += 1
+                continue
+            timestamps.append(int(row['timestamp_ns']))
+            labels.append(row.get('true_gesture') or row['gesture'])
+    return np.array(timestamps, dtype=np.int64), labels, deleted
+
+
+def read_info(path):
+    """
+    info.yaml -> {段名: {key: value}}
+    文件由手表端按固定的两层 key: value 格式写出，这里按行解析并把值都保留为字符串
+    (用 yaml 解析时 duration: 00:05:12 这样的值会被当成六十进制整数)
+    """
+    info, section = {}, None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            key, _, value = line.strip().partition(':')
+            if not line[0].isspace():
+                section = info.setdefault(key, {})
+            elif section is not None:
+                section[key] = value.strip()
+    return info
+
+
+def session_attrs(folder, name):
+    """场景属性：从文件夹名 <日期时间>_<姓名>_<手>_<手势>_<力度>_<备注> 和 info.yaml 中取得"""
+    parts = os.path.basename(name).split('_')
+    attrs = {'date': '', 'force_level': '', 'handness': '', 'note': '', 'scene_kw': '', 'scene_property': ''}
+    if len(parts) >= 11:
+        attrs.update({
+            'date': ''.join(parts[:3]),
+            'participant_name': '_'.join(parts[6:-4]),
+            'handness': parts[-4],
+            'scene_property': parts[-3],
+            'force_level': parts[-2],
+            'scene_kw': parts[-1],
+        })
+    info_path = os.path.join(folder, 'info.yaml')
+    if os.path.exists(info_path):
+        info = read_info(info_path)
+        for key, value in info.get('collection', {}).items():
+            attrs[key] = value
+        for key, value in info.get('device', {}).items():
+            attrs[f'device_{key}'] = value
+    return attrs
+
+
+def cut_windows(folder, config):
+    """
+    Returns:
+        rawdata, filtered: (n, T, 6) float32，列顺序 acc xyz, gyro xyz
+        labels: (n,) int16
+        stats: 各类被丢弃的峰值数
+    """
+    half_window = config['half_window']
+    acc_ts, acc = load_imu(os.path.join(folder, 'acc.txt'))
+    gyro_ts, gyro = load_imu(os.path.join(folder, 'gyro.txt'))
+    peak_ts, names, deleted = read_peaks(folder)
+    names = [LABEL_ALIASES.get(n, n) for n in names]
+    stats = {'peaks': len(peak_ts) + deleted, 'deleted': deleted, 'unmatched': 0, 'out_of_range': 0, 'unknown': {}}
+
+    if min(len(acc_ts), len(gyro_ts)) < 2 * half_window or len(peak_ts) == 0:
+        stats['out_of_range'] = len(peak_ts)
+        T = 2 * half_window
+        return np.empty((0, T, 6), np.float32), np.empty((0, T, 6), np.float32), np.empty(0, np.int16), stats
+
+    known = np.array([n in y_lbl2idx for n in names], dtype=bool)
+    for n in np.array(names, dtype=object)[~known]:
+        stats['unknown'][n] = stats['unknown'].get(n, 0) + 1
+
+    # acc 和 gyro 通常逐行同时写出；时间戳不一致 (丢帧) 时先截取为逐行对应的同一时间轴
+    timestamps, acc, gyro, _, _ = align_imu(acc_ts, acc, gyro_ts, gyro, config['tolerance_ns'])
+    rows, _ = align_nearest(timestamps, peak_ts, config['tolerance_ns'])
+    matched = rows >= 0
+    in_range = (rows >= half_window) & (rows < len(timestamps) - half_window)
+    stats['unmatched'] = int((known & ~matched).sum())
+    stats['out_of_range'] = int((known & matched & ~in_range).sum())
+
+    keep = known & matched & in_range
+    window_rows = rows[keep][:, None] + np.arange(-half_window, half_window)
+    acc_windows = acc[window_rows]
+    gyro_windows = gyro[window_rows]
+    rawdata = np.concatenate([acc_windows, gyro_windows], axis=2).astype(np.float32)
+    filtered = apply_filters(rawdata.astype(np.float64), config['filters']).astype(np.float32)
+    labels = np.array([y_lbl2idx[n] for n, k in zip(names, keep) if k], dtype=np.int16)
+    return rawdata, filtered, labels, stats
+
+
+def process_session(folder, name, config, cache_dir, known_sha1=None):
+    """进程池中的任务：计算哈希，内容有变化时截取窗口并写入 cache_dir/sessions/<hash>.npz"""
+    start = time.perf_counter()
+    stats = file_stats(folder)
+    sha1 = session_hash(folder, config)
+    entry = {'sha1': sha1, 'files': stats, 'bytes': sum(size for size, _ in stats.values())}
+    if sha1 == known_sha1:
+        return entry, False
+
+    rawdata, filtered, labels, counts = cut_windows(folder, config)
+    path = session_cache_path(cache_dir, sha1)
+    tmp_path = f'{path[:-4]}.{os.getpid()}.tmp.npz'
+    np.savez(tmp_path, rawdata=rawdata, filtered=filtered, labels=labels)
+    os.replace(tmp_path, path)
+    entry.update(counts)
+    entry.update({'windows': len(labels), 'attrs': session_attrs(folder, name),
+                  'seconds': time.perf_counter() - start})
+    return entry, True
+
+
+def session_cache_path(cache_dir, sha1):
+    return os.path.join(cache_dir, 'sessions', f'{sha1[:16]}.npz')
+
+
+def manifest_path(cache_dir, out_path):
+    return os.path.join(cache_dir, f'{os.path.splitext(os.path.basename(out_path))[0]}.manifest.json')
+
+
+def load_manifest(path, root, config):
+    """上次构建的 {文件夹: 记录}；数据目录或处理参数变化时全部失效"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('root') != os.path.abspath(root) or manifest.get('config') != config:
+        return {}
+    return manifest['sessions']
+
+
+def save_manifest(path, root, config, sessions):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'root': os.path.abspath(root), 'config': config, 'sessions': sessions},
+                  f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def prune_cache(cache_dir):
+    """删除所有清单都不再引用的 sessions/*.npz"""
+    referenced = set()
+    for path in glob.glob(os.path.join(cache_dir, '*.manifest.json')):
+        with open(path, encoding='utf-8') as f:
+            referenced.update(session_cache_path(cache_dir, e['sha1']) for e in json.load(f)['sessions'].values())
+    removed = 0
+    for path in glob.glob(os.path.join(cache_dir, 'sessions', '*.npz')):
+        if path not in referenced:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def write_dataset(out_path, sessions, cache_dir, T, compression='gzip', chunk_size=256, source=''):
+    """按文件夹名顺序把各文件夹的 npz 合并写成合并布局的 h5，先写临时文件再改名"""
+    names = [name for name in sorted(sessions) if sessions[name]['windows'] > 0]
+    n = sum(sessions[name]['windows'] for name in names)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    with h5py.File(tmp_path, 'w') as out:
+        out.attrs['layout'] = CONSOLIDATED
+        out.attrs['source'] = source
+        chunks = (max(1, min(chunk_size, n)), T, 6)
+        datasets = {key: out.create_dataset(key, (n, T, 6), dtype=np.float32, chunks=chunks,
+                                            compression=compression, shuffle=compression is not None)
+                    for key in ('rawdata', 'filtered')}
+        labels = np.empty(n, dtype=np.int16)
+        scene_index = np.empty(n, dtype=np.int32)
+        segment_index = np.empty(n, dtype=np.int32)
+        start = 0
+        for k, name in enumerate(names):
+            with np.load(session_cache_path(cache_dir, sessions[name]['sha1'])) as data:
+                end = start + len(data['labels'])
+                for key in datasets:
+                    datasets[key][start:end] = data[key]
+                labels[start:end] = data['labels']
+            scene_index[start:end] = k
+            segment_index[start:end] = np.arange(end - start)
+            start = end
+        out['labels'] = labels
+        out['scene_index'] = scene_index
+        out['segment_index'] = segment_index
+        out['scenes'] = attrs_table(names, [sessions[name]['attrs'] for name in names])
+    os.replace(tmp_path, out_path)
+    return names, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the training h5 from raw watch session folders')
+    parser.add_argument('root', help='采集数据根目录，递归查找包含 acc.txt/gyro.txt/result.txt 的文件夹')
+    parser.add_argument('out', help='输出 h5，例如 aw10_data.h5')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='进程数')
+    parser.add_argument('--half-window', type=int, default=50, help='窗口半长 (采样点)，haili 模型为 50')
+    parser.add_argument('--tolerance-ms', type=float, default=5.0, help='峰值时间戳与采样时间戳的最大偏差')
+    parser.add_argument('--cache-dir', default=BUILD_CACHE_DIR)
+    parser.add_argument('--compression', choices=['gzip', 'lzf', 'none'], default='gzip')
+    parser.add_argument('--chunk-size', type=int, default=256, help='每个数据块包含的样本数')
+    parser.add_argument('--rebuild', action='store_true', help='忽略清单，全部重新处理')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"错误：找不到目录 {args.root}")
+        sys.exit(1)
+
+    config = build_config(args.half_window, int(args.tolerance_ms * 1e6))
+    os.makedirs(os.path.join(args.cache_dir, 'sessions'), exist_ok=True)
+    manifest = manifest_path(args.cache_dir, args.out)
+    previous = {} if args.rebuild else load_manifest(manifest, args.root, config)
+
+    start = time.perf_counter()
+    names = find_sessions(args.root)
+    if not names:
+        print(f"错误：{args.root} 下没有包含 {', '.join(REQUIRED_FILES)} 的文件夹")
+        sys.exit(1)
+
+    sessions, todo = {}, []
+    for name in names:
+        entry = previous.get(name)
+        folder = os.path.join(args.root, name)
+        if (entry and entry['files'] == file_stats(folder)
+                and os.path.exists(session_cache_path(args.cache_dir, entry['sha1']))):
+            sessions[name] = entry
+        else:
+            todo.append(name)
+
+    reused, unchanged, processed, failed = len(sessions), 0, [], []
+    process_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(todo) or 1))) as pool:
+        futures = {}
+        for name in todo:
+            known = previous.get(name, {}).get('sha1')
+            if known and not os.path.exists(session_cache_path(args.cache_dir, known)):
+                known = None
+            futures[pool.submit(process_session, os.path.join(args.root, name), name, config,
+                                args.cache_dir, known)] = name
+        for i, future in enumerate(as_completed(futures)):
+            name = futures[future]
+            try:
+                entry, changed = future.result()
+            except Exception as e:
+                print(f"警告：处理 {name} 失败，下次运行时重试: {e}")
+                failed.append(name)
+                continue
+            if changed:
+                sessions[name] = entry
+                processed.append(name)
+                print(f"[{i + 1}/{len(todo)}] {name}: {entry['windows']} 个窗口, {entry['seconds']:.2f}s")
+            else:
+                # 只有修改时间变了，沿用上次的结果
+                sessions[name] = dict(previous[name], files=entry['files'])
+                unchanged += 1
+    process_time = time.perf_counter() - process_start
+    save_manifest(manifest, args.root, config, sessions)
+
+    print(f"\n{len(names)} 个文件夹: 复用 {reused}, 内容未变 {unchanged}, 重新处理 {len(processed)}, 失败 {len(failed)}")
+    if processed:
+        n_bytes = sum(sessions[n]['bytes'] for n in processed)
+        n_windows = sum(sessions[n]['windows'] for n in processed)
+        print(f"处理 {len(processed)} 个文件夹 ({n_bytes / 1e6:.1f} MB), 耗时 {process_time:.2f}s, "
+              f"workers={args.workers}: {len(processed) / process_time:.1f} 个文件夹/s, "
+              f"{n_windows / process_time:.0f} 个窗口/s, {n_bytes / 1e6 / process_time:.1f} MB/s")
+
+    totals = {key: sum(e[key] for e in sessions.values()) for key in ('peaks', 'deleted', 'unmatched', 'out_of_range')}
+    unknown = {}
+    for entry in sessions.values():
+        for label, count in entry['unknown'].items():
+            unknown[label] = unknown.get(label, 0) + count
+    print(f"峰值 {totals['peaks']}: 已删除 {totals['deleted']}, 时间戳未对齐 {totals['unmatched']}, "
+          f"窗口越界 {totals['out_of_range']}, 未知手势 {unknown or 0}")
+
+    write_start = time.perf_counter()
+    written, labels = write_dataset(args.out, sessions, args.cache_dir, 2 * args.half_window,
+                                    None if args.compression == 'none' else args.compression,
+                                    args.chunk_size, os.path.basename(os.path.abspath(args.root)))
+    counts = np.bincount(labels, minlength=len(y_idx2lbl))
+    print(f"已写入 {args.out}: {len(written)} 个场景, {len(labels)} 个样本 "
+          f"({' '.join(f'{y_idx2lbl[c]}:{counts[c]}' for c in range(len(y_idx2lbl)))}), "
+          f"写出耗时 {time.perf_counter() - write_start:.2f}s, 总耗时 {time.perf_counter() - start:.2f}s")
+    removed = prune_cache(args.cache_dir)
+    if removed:
+        print(f"清理了 {removed} 个不再使用的缓存文件")
+
+
+if __name__ == "__main__":
+    main()
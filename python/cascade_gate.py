@@ -0,0 +1,273 @@
+"""
+两级级联分类：廉价的门控先过滤明显的非手势窗口，只有不确定的窗口才交给完整模型
+
+日常佩戴时检测到的峰值大多是 "其它/日常"，每个都跑一遍 GestureModel 很浪费。
+门控只用窗口的能量/形状特征 (每通道标准差、峰峰值、一阶差分、加速度/角速度模长等)
+和一个逻辑回归，输出窗口是手势的概率 p：
+    p <  threshold   直接判为 "其它"，不调用模型
+    p >= threshold   交给完整模型分类
+
+threshold 在校准集上选取，使手势样本被门控拒绝的比例不超过 1 - target_recall。
+标准差、峰峰值和中心能量占比都与窗口长度有关，门控记录训练窗口的长度 T，
+对其它长度的窗口调用时报错；给 VanillaCNN 的 60 点窗口使用时需要用 60 点的数据训练。
+
+    --kind linear    全部特征
+    --kind energy    只用加速度/角速度模长的能量特征 (更便宜，通常拒绝得更少)
+
+用法:
+    # 训练并校准门控 (校准集默认从 train.h5 中按 --calib-fraction 划出)
+    python cascade_gate.py train --train train.h5 --out gate.npz --target-recall 0.995
+    # smooth_plot_show_demo.py 的窗口为 60 点 (train60.h5 可由 build_dataset.py --half-window 30 生成)
+    python cascade_gate.py train --train train60.h5 --out gate60.npz
+    # 在测试集上模拟：不同阈值下跳过的推理比例和损失的召回率
+    python cascade_gate.py simulate gate.npz --test test.h5 --checkpoint valid_epoch=14_accuracy=0.960.pt
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+OTHER_CLASS = 8  # gesture_dataset.y_idx2lbl 中的 '其它'
+
+FEATURE_NAMES = ([f'ch{i}_std' for i in range(6)] + [f'ch{i}_ptp' for i in range(6)] + [f'ch{i}_diff' for i in range(6)]
+                 + ['acc_norm_std', 'acc_norm_ptp', 'gyro_norm_std', 'gyro_norm_max', 'acc_center_energy'])
+ENERGY_FEATURES = ['acc_norm_std', 'acc_norm_ptp', 'gyro_norm_std', 'gyro_norm_max']
+
+
+def window_features(x):
+    """
+    x: (N, 6, T) 或 (N, 6, 1, T)，前3个通道为加速度，后3个为角速度
+    Returns:
+        (N, len(FEATURE_NAMES)) float32 特征
+    """
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 4:
+        x = x[:, :, 0]
+    T = x.shape[2]
+    # 6个通道和两个模长一起按 (N, 8, T) 计算，单个窗口也只有几次 numpy 调用
+    norms = np.sqrt(np.stack([np.einsum('nct,nct->nt', x[:, :3], x[:, :3]),
+                              np.einsum('nct,nct->nt', x[:, 3:], x[:, 3:])], axis=1))
+    signals = np.concatenate([x, norms], axis=1)
+    std = signals.std(axis=2)
+    ptp = signals.max(axis=2) - signals.min(axis=2)
+    diff = np.abs(np.diff(x, axis=2)).mean(axis=2)
+    # 能量集中在峰值附近的程度：手势通常是短促的一下，日常动作更平缓
+    acc_dev = (norms[:, 0] - norms[:, 0].mean(axis=1, keepdims=True)) ** 2
+    center = acc_dev[:, T // 3:T - T // 3].sum(axis=1) / (acc_dev.sum(axis=1) + 1e-8)
+
+    # 幅值类特征跨几个数量级，取 log1p 后线性模型更容易分开
+    magnitude = np.concatenate([std[:, :6], ptp[:, :6], diff,
+                                std[:, 6:7], ptp[:, 6:7], std[:, 7:8], signals[:, 7].max(axis=1)[:, None]], axis=1)
+    return np.concatenate([np.log1p(magnitude), center[:, None]], axis=1).astype(np.float32)
+
+
+class CascadeGate:
+    def __init__(self, feature_names, mean, std, weight, bias, threshold, window_length=None):
+        """
+        Args:
+            window_length: 训练窗口的采样点数 T；None (旧版本保存的门控) 时不检查
+        """
+        self.feature_names = list(feature_names)
+        self.columns = [FEATURE_NAMES.index(n) for n in self.feature_names]
+        self.mean = mean
+        self.std = std
+        self.weight = weight
+        self.bias = float(bias)
+        self.threshold = float(threshold)
+        self.window_length = None if window_length is None else int(window_length)
+
+    def check_window_length(self, T):
+        if self.window_length is not None and T != self.window_length:
+            raise ValueError(f"门控在 T={self.window_length} 的窗口上训练和校准，不能用于 T={T} 的窗口")
+
+    def predict_proba(self, x):
+        """窗口是手势 (非 '其它') 的概率"""
+        self.check_window_length(np.shape(x)[-1])
+        features = window_features(x)[:, self.columns]
+        z = ((features - self.mean) / self.std) @ self.weight + self.bias
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def accept(self, x, threshold=None):
+        """True 表示需要交给完整模型"""
+        return self.predict_proba(x) >= (self.threshold if threshold is None else threshold)
+
+    def save(self, path):
+        np.savez(path, feature_names=np.array(self.feature_names), mean=self.mean, std=self.std,
+                 weight=self.weight, bias=self.bias, threshold=self.threshold,
+                 **({} if self.window_length is None else {'window_length': self.window_length}))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([str(n) for n in data['feature_names']], data['mean'], data['std'],
+                       data['weight'], data['bias'], data['threshold'],
+                       data['window_length'] if 'window_length' in data else None)
+
+
+def fit_logistic(features, target, l2=1e-3, lr=0.5, epochs=500):
+    """全batch梯度下降训练逻辑回归，按类别频率加权使两类的权重相同"""
+    mean = features.mean(axis=0)
+    std = features.std(axis=0) + 1e-6
+    z = (features - mean) / std
+    pos = target.mean()
+    sample_weight = np.where(target == 1, 0.5 / pos, 0.5 / (1 - pos)) / len(target)
+    weight = np.zeros(z.shape[1])
+    bias = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(z @ weight + bias)))
+        g = (p - target) * sample_weight
+        weight -= lr * (z.T @ g + l2 * weight)
+        bias -= lr * g.sum()
+    return mean, std, weight, bias
+
+
+def calibrate_threshold(proba, is_gesture, target_recall):
+    """手势样本中至少 target_recall 的比例 p >= threshold 的最大阈值"""
+    gesture_proba = np.sort(proba[is_gesture])
+    k = int(np.floor(len(gesture_proba) * (1 - target_recall)))
+    return float(gesture_proba[k]) if len(gesture_proba) else 0.0
+
+
+def train_gate(x, labels, kind='linear', target_recall=0.995, calib_fraction=0.2, seed=0, calib=None):
+    """
+    Args:
+        x: (N, 6, 1, T) 训练窗口
+        labels: (N,) 类别下标
+        calib: 可选的 (x, labels) 校准集，不指定时从训练集中随机划出 calib_fraction
+    """
+    features, names = window_features(x), FEATURE_NAMES
+    if kind == 'energy':
+        features, names = features[:, [names.index(n) for n in ENERGY_FEATURES]], ENERGY_FEATURES
+    is_gesture = (labels != OTHER_CLASS).astype(np.float64)
+
+    if calib is None:
+        order = np.random.default_rng(seed).permutation(len(x))
+        n_calib = int(len(x) * calib_fraction)
+        calib_idx, fit_idx = order[:n_calib], order[n_calib:]
+    else:
+        fit_idx = np.arange(len(x))
+
+    mean, std, weight, bias = fit_logistic(features[fit_idx].astype(np.float64), is_gesture[fit_idx])
+    gate = CascadeGate(names, mean.astype(np.float32), std.astype(np.float32), weight.astype(np.float32), bias, 0.0,
+                       window_length=x.shape[-1])
+    if calib is None:
+        calib_proba, calib_gesture = gate.predict_proba(x[calib_idx]), is_gesture[calib_idx] == 1
+    else:
+        calib_proba, calib_gesture = gate.predict_proba(calib[0]), calib[1] != OTHER_CLASS
+    gate.threshold = calibrate_threshold(calib_proba, calib_gesture, target_recall)
+    return gate
+
+
+def simulate(gate, x, labels, model_pred=None, thresholds=None):
+    """
+    每个阈值下：跳过推理的比例、手势样本被门控拒绝的比例 (损失的召回率)；
+    给出完整模型的预测时，再算级联后的整体准确率和手势宏平均召回率
+    """
+    proba = gate.predict_proba(x)
+    is_gesture = labels != OTHER_CLASS
+    if thresholds is None:
+        thresholds = sorted({gate.threshold, *np.quantile(proba, [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7])})
+    gesture_classes = [c for c in np.unique(labels) if c != OTHER_CLASS]
+    rows = []
+    for threshold in thresholds:
+        accept = proba >= threshold
+        row = {
+            'threshold': float(threshold),
+            'skipped': float(np.mean(~accept)),
+            'gesture_recall_lost': float(np.mean(~accept[is_gesture])) if is_gesture.any() else 0.0,
+            'other_rejected': float(np.mean(~accept[~is_gesture])) if (~is_gesture).any() else 0.0,
+        }
+        if model_pred is not None:
+            pred = np.where(accept, model_pred, OTHER_CLASS)
+            row['accuracy'] = float(np.mean(pred == labels))
+            row['gesture_macro_recall'] = float(np.mean([np.mean(pred[labels == c] == c) for c in gesture_classes]))
+        rows.append(row)
+    return rows
+
+
+def print_simulation(rows, full=None, calibrated=None):
+    has_model = 'accuracy' in rows[0]
+    header = f"{'threshold':>9} {'skipped':>8} {'recall lost':>12} {'other rejected':>15}"
+    if has_model:
+        header += f" {'accuracy':>9} {'gesture recall':>15}"
+    print(header)
+    if full is not None:
+        print(f"{'(none)':>9} {0:>8.3f} {0:>12.4f} {0:>15.3f} {full['accuracy']:>9.4f} {full['gesture_macro_recall']:>15.4f}")
+    for r in rows:
+        line = f"{r['threshold']:>9.4f} {r['skipped']:>8.3f} {r['gesture_recall_lost']:>12.4f} {r['other_rejected']:>15.3f}"
+        if has_model:
+            line += f" {r['accuracy']:>9.4f} {r['gesture_macro_recall']:>15.4f}"
+        print(line + ('   <- 校准阈值' if calibrated is not None and r['threshold'] == calibrated else ''))
+
+
+def model_predictions(arch, checkpoint, x, batch_size=256):
+    from inference_backend import create_backend
+
+    backend = create_backend('torch', checkpoint, arch=arch)
+    return np.concatenate([backend.predict(x[i:i + batch_size]).argmax(axis=1) for i in range(0, len(x), batch_size)])
+
+
+def load_windows(spec):
+    """(N, 6, 1, T) float32 窗口和类别下标，都是 numpy 数组"""
+    from gesture_dataset import load_all_data
+
+    x, y = load_all_data(spec)
+    return x.numpy(), y.numpy().argmax(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train / calibrate / simulate a cheap gate in front of the gesture model')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('train', help='在 train.h5 上训练门控并校准阈值')
+    p.add_argument('--train', default='train.h5')
+    p.add_argument('--calib', default=None, help='单独的校准集 (例如 valid.h5)，不指定时从训练集划出')
+    p.add_argument('--calib-fraction', type=float, default=0.2)
+    p.add_argument('--kind', choices=['linear', 'energy'], default='linear')
+    p.add_argument('--target-recall', type=float, default=0.995, help='门控放行的手势样本比例下限')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--out', default='gate.npz')
+
+    p = sub.add_parser('simulate', help='在测试集上统计节省的推理次数和损失的召回率')
+    p.add_argument('gate')
+    p.add_argument('--test', default='test.h5')
+    p.add_argument('--checkpoint', default=None, help='完整模型，给出时统计级联后的准确率')
+    p.add_argument('--arch', choices=['gesture', 'vanilla'], default='gesture')
+    p.add_argument('--thresholds', type=float, nargs='*', default=None)
+    args = parser.parse_args()
+
+    from gesture_dataset import dataset_source
+
+    if args.command == 'train':
+        for path in map(dataset_source, filter(None, (args.train, args.calib))):
+            if not os.path.exists(path):
+                print(f"错误：找不到文件 {path}")
+                sys.exit(1)
+        x, labels = load_windows(args.train)
+        calib = load_windows(args.calib) if args.calib else None
+        gate = train_gate(x, labels, args.kind, args.target_recall, args.calib_fraction, args.seed, calib)
+        gate.save(args.out)
+        print(f"门控 ({args.kind}, {len(gate.feature_names)} 个特征, T={gate.window_length}) 已保存到 {args.out}, "
+              f"阈值 {gate.threshold:.4f}")
+        print_simulation(simulate(gate, x, labels, thresholds=[gate.threshold]))
+    else:
+        for path in filter(None, (args.gate, dataset_source(args.test), args.checkpoint)):
+            if not os.path.exists(path):
+                print(f"错误：找不到文件 {path}")
+                sys.exit(1)
+        gate = CascadeGate.load(args.gate)
+        x, labels = load_windows(args.test)
+        model_pred, full = None, None
+        if args.checkpoint:
+            model_pred = model_predictions(args.arch, args.checkpoint, x)
+            full = simulate(gate, x, labels, model_pred, thresholds=[-np.inf])[0]
+        gate_latency = min(timeit.repeat(lambda: gate.accept(x[:1]), number=200, repeat=5)) / 200
+        print(f"测试样本 {len(x)}，其中 '其它' {np.mean(labels == OTHER_CLASS):.1%}，"
+              f"门控单个窗口耗时 {gate_latency * 1e6:.0f} us")
+        print_simulation(simulate(gate, x, labels, model_pred, args.thresholds), full, gate.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+从训练得到的 checkpoint 一次导出 Linux 上可用的推理模型，并对比各后端的精度和速度
+
+导出:
+    <out_dir>/<checkpoint名>.ts.pt    TorchScript (torch.jit.trace)
+    <out_dir>/<checkpoint名>.onnx     ONNX (batch维可变)
+
+用法:
+    python export_model.py valid_epoch=14_accuracy=0.960.pt
+    python export_model.py total_epoch=950_accuracy=0.989.pt --arch vanilla --out-dir exported
+    python export_model.py valid_epoch=14_accuracy=0.960.pt --batch-sizes 1 256 --threads 4
+"""
+import argparse
+import os
+import sys
+import warnings
+
+import numpy as np
+import torch
+
+from gesture_models import load_model, example_input
+from inference_backend import TorchBackend, create_backend, benchmark_backend
+from optimize_model import optimize_model
+
+
+def export_torchscript(model, arch, path):
+    with warnings.catch_warnings():
+        # forward 中用 x.shape 计算reshape尺寸会触发 TracerWarning，trace时已记录为动态尺寸
+        warnings.simplefilter('ignore', torch.jit.TracerWarning)
+        traced_model = torch.jit.trace(model, example_input(arch))
+    traced_model.save(path)
+
+
+def export_onnx(model, arch, path):
+    torch.onnx.export(
+        model,
+        (example_input(arch),),
+        path,
+        input_names=['input'],
+        output_names=['output'],
+        dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}},
+        dynamo=False,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a checkpoint to TorchScript / ONNX and benchmark backends')
+    parser.add_argument('checkpoint', help='训练保存的 state_dict，例如 valid_epoch=14_accuracy=0.960.pt')
+    parser.add_argument('--arch', choices=['gesture', 'vanilla'], default='gesture')
+    parser.add_argument('--num-classes', type=int, default=9)
+    parser.add_argument('--out-dir', default='exported')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 64])
+    parser.add_argument('--threads', type=int, default=None, help='intra-op 线程数，默认由框架决定')
+    parser.add_argument('--no-optimize', action='store_true', help='导出训练时的原始结构，不折叠BN/合并1x1卷积')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        print(f"错误：找不到 checkpoint {args.checkpoint}")
+        sys.exit(1)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(args.checkpoint))[0]
+    model = load_model(args.arch, args.checkpoint, args.num_classes)
+    if not args.no_optimize:
+        model = optimize_model(model)
+
+    artifacts = {}
+    exporters = {
+        'torchscript': (export_torchscript, os.path.join(args.out_dir, f'{stem}.ts.pt')),
+        'onnx': (export_onnx, os.path.join(args.out_dir, f'{stem}.onnx')),
+    }
+    for kind, (exporter, path) in exporters.items():
+        try:
+            exporter(model, args.arch, path)
+            artifacts[kind] = path
+            print(f"导出 {kind}: {path}")
+        except Exception as e:
+            print(f"导出 {kind} 失败: {e}")
+
+    backends = [TorchBackend(model, args.threads)]
+    for kind, path in artifacts.items():
+        try:
+            backends.append(create_backend(kind, path, n_threads=args.threads))
+        except ImportError as e:
+            print(f"跳过 {kind} 后端: {e}")
+
+    # 与未优化的 eager 模型对比输出，确认优化和导出结果等价
+    x = example_input(args.arch, max(args.batch_sizes)).numpy()
+    reference = TorchBackend(load_model(args.arch, args.checkpoint, args.num_classes)).predict(x)
+    print(f"\n{'backend':<12} {'max |diff|':>11}")
+    for backend in backends:
+        print(f"{backend.name:<12} {np.abs(backend.predict(x) - reference).max():>11.2e}")
+
+    print(f"\n{'backend':<12} {'batch':>6} {'latency (ms)':>13} {'p90 (ms)':>9} {'samples/s':>10}")
+    for backend in backends:
+        for batch_size in args.batch_sizes:
+            r = benchmark_backend(backend, x, batch_size)
+            print(f"{r['backend']:<12} {r['batch_size']:>6} {r['latency_ms']:>13.3f} "
+                  f"{r['latency_p90_ms']:>9.3f} {r['throughput']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+训练/评估共用的数据集定义
+
+train.h5 / valid.h5 / test.h5 由 main.ipynb 生成，支持两种布局:
+
+逐段布局 (main.ipynb 原始输出):
+    <scene>/<i>/acc_rawdata, gyro_rawdata, acc_filtered, gyro_filtered   (T, 3)
+    <scene>/<i>.attrs['gt']                                              类别名
+    <scene>.attrs                                                        采集信息 (date, handness, ...)
+
+合并布局 (migrate_h5.py 转换得到，attrs['layout'] == 'consolidated'):
+    rawdata, filtered    (N, T, 6) float32，按样本分块压缩，列顺序为 acc xyz, gyro xyz
+    labels               (N,) int16，y_idx2lbl 中的下标
+    scene_index          (N,) int32，scenes 表中的行号
+    segment_index        (N,) int32，样本在原 <scene>/<i> 中的 i
+    scenes               场景属性表 (复合类型，每列一个属性，第一列为场景名)
+    样本按 (场景名, i) 排序，与逐段布局中 MHGDataSet 的下标一一对应
+
+HDF5 文件在每个进程中第一次读取时打开并一直保持，DataLoader(num_workers > 0) 的
+worker 进程 (fork 或 spawn) 各自打开自己的句柄，不与父进程共用。
+
+整个数据集一次性读入 (评估、全量训练) 时用 load_all_data()：第一次把 (N, 6, 1, T) float32
+和 one-hot 标签写成 .npy 缓存，之后直接 np.load(mmap_mode) 映射，不再逐个样本解析 h5。
+缓存以 h5 文件内容的哈希和预处理配置 (PREPROCESS_CONFIG) 为键，文件或配置变化时自动失效。
+
+训练/验证/测试集可以是独立的 h5 文件，也可以是 make_split.py 生成的划分清单中的一部分，
+写作 'splits/seed0.json:train'：按清单中的下标读取主文件 (例如 aw10_data.h5) 的子集，不复制数据。
+"""
+import bisect
+import hashlib
+import json
+import os
+
+import h5py
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+y_idx2lbl = ['单击', '双击', '左摆', '右摆', '握拳', "摊掌", "转腕", "旋腕", "其它"]
+y_lbl2idx = {l: i for i, l in enumerate(y_idx2lbl)}
+y_lbl2onehot = {l: np.eye(len(y_idx2lbl))[i] for i, l in enumerate(y_idx2lbl)}
+ONEHOT = np.eye(len(y_idx2lbl), dtype=np.float32)
+
+CONSOLIDATED = 'consolidated'
+TENSOR_CACHE_DIR = '.tensor_cache'
+# 缓存内容的定义，修改 get_all_data 的预处理后需要更新这里使旧缓存失效
+PREPROCESS_CONFIG = {
+    'channels': ['acc_filtered', 'gyro_filtered'],
+    'shape': '(N, 6, 1, T)',
+    'dtype': 'float32',
+    'labels': y_idx2lbl,
+    # 2: 逐段布局的样本按数字顺序排列 ('0', '1', '2', ... 而不是 '0', '1', '10', ...)
+    'version': 2,
+}
+# 合并布局随机读取时一个batch会落在很多个压缩块上，加大块缓存避免反复解压 (h5py 默认 1 MB)
+CHUNK_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def is_consolidated(h5):
+    return h5.attrs.get('layout') == CONSOLIDATED
+
+
+def read_scene_table(h5):
+    """合并布局的 scenes 表 -> (场景名列表, 每个场景的属性dict列表)"""
+    table = h5['scenes'][()]
+    columns = table.dtype.names
+    decode = lambda v: v.decode('utf-8') if isinstance(v, bytes) else v
+    names = [decode(row['scene']) for row in table]
+    attrs = [{c: decode(row[c]) for c in columns if c != 'scene'} for row in table]
+    return names, attrs
+
+
+def read_split(manifest_path, split):
+    """划分清单 -> (主文件路径, 下标数组)；主文件路径相对于清单所在目录"""
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if split not in manifest['splits']:
+        raise ValueError(f"{manifest_path} 中没有 {split}，可选: {list(manifest['splits'])}")
+    master = os.path.join(os.path.dirname(os.path.abspath(manifest_path)), manifest['master'])
+    if manifest.get('master_sha1') and file_hash(master) != manifest['master_sha1']:
+        raise ValueError(f"{master} 在生成划分 {manifest_path} 之后被修改过，请重新生成")
+    return master, np.asarray(manifest['splits'][split], dtype=np.int64)
+
+
+def resolve_dataset(spec):
+    """'test.h5' -> ('test.h5', None)；'splits/seed0.json:test' -> (主文件, 下标)"""
+    path, sep, split = spec.rpartition(':')
+    if sep and path.endswith('.json'):
+        return read_split(path, split)
+    return spec, None
+
+
+def dataset_source(spec):
+    """数据集描述对应的磁盘文件 (h5 或划分清单)，用于检查文件是否存在"""
+    path, sep, _ = spec.rpartition(':')
+    return path if sep and path.endswith('.json') else spec
+
+
+class MHGDataSet(Dataset):
+    def __init__(self, h5_path, indices=None):
+        """
+        Args:
+            h5_path: h5 文件，或 'splits/seed0.json:train' 形式的划分
+            indices: 只使用主文件中的这些样本 (下标按完整文件计)
+        """
+        if indices is None:
+            h5_path, indices = resolve_dataset(h5_path)
+        self.h5_path = h5_path
+        self.indices = None if indices is None else np.asarray(indices, dtype=np.int64)
+        self.prefix_sum = [0]
+        self.scenes = []
+        self.scene_attrs = []
+        self.consolidated = False
+        self.labels = None
+        self._h5 = None
+        self._h5_pid = None
+        self._filtered = None
+        self.init()
+        self._all_data = None
+
+    def init(self):
+        with h5py.File(self.h5_path, 'r') as h5:
+            if is_consolidated(h5):
+                self.consolidated = True
+                self.scenes, self.scene_attrs = read_scene_table(h5)
+                # 标签和场景下标都很小，一次读入内存
+                self.labels = h5['labels'][()].astype(np.int64)
+                counts = np.bincount(h5['scene_index'][()], minlength=len(self.scenes))
+                self.prefix_sum = [0] + np.cumsum(counts).tolist()
+            else:
+                for scene in sorted(h5.keys()):
+                    scene_len = len(h5[scene])
+                    self.prefix_sum.append(self.prefix_sum[-1] + scene_len)
+                    self.scenes.append(scene)
+                    # 场景属性在这里一次性转换为dict，读取样本时不再访问
+                    self.scene_attrs.append(dict(h5[scene].attrs))
+        print(self.prefix_sum)
+
+    @property
+    def h5(self):
+        # fork 出来的 worker 会继承父进程的 self._h5，按进程号判断后重新打开；
+        # 继承来的句柄不在子进程中关闭，避免影响父进程
+        if self._h5 is None or self._h5_pid != os.getpid():
+            self._h5 = h5py.File(self.h5_path, 'r', rdcc_nbytes=CHUNK_CACHE_BYTES if self.consolidated else None)
+            self._h5_pid = os.getpid()
+            # 块缓存属于打开的 dataset 对象，每次 self.h5['filtered'] 都会重新打开、缓存随之丢失
+            self._filtered = self._h5['filtered'] if self.consolidated else None
+        return self._h5
+
+    @property
+    def filtered(self):
+        """合并布局的 (N, T, 6) filtered dataset"""
+        self.h5
+        return self._filtered
+
+    def close(self):
+        if self._h5 is not None and self._h5_pid == os.getpid():
+            self._h5.close()
+        self._h5 = None
+        self._h5_pid = None
+        self._filtered = None
+
+    def __getstate__(self):
+        # spawn 方式启动 worker 时 Dataset 会被 pickle，h5py 句柄不能序列化
+        state = self.__dict__.copy()
+        state['_h5'] = None
+        state['_h5_pid'] = None
+        state['_filtered'] = None
+        return state
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __len__(self):
+        return self.prefix_sum[-1] if self.indices is None else len(self.indices)
+
+    def _global(self, idx):
+        """子集中的下标 -> 主文件中的下标"""
+        return int(idx) if self.indices is None else int(self.indices[idx])
+
+    def _to_sample(self, window, label):
+        """(T, 6) 窗口和类别下标 -> ((6, 1, T) float32, one-hot)"""
+        x = torch.from_numpy(np.ascontiguousarray(window, dtype=np.float32).T[:, None, :])
+        y = torch.from_numpy(ONEHOT[label])
+        return x, y
+
+    def __getitem__(self, idx):
+        return self._read(self._global(idx))
+
+    def _read(self, idx):
+        if self.consolidated:
+            return self._to_sample(self.filtered[idx], self.labels[idx])
+
+        which_scene_idx, which_scene = self.get_scene_by_idx(idx)
+        offset = str(idx - self.prefix_sum[which_scene_idx])
+
+        data = self.h5[which_scene][offset]  # 获取具体数据
+        acc_filtered = data['acc_filtered'][()]
+        gyro_filtered = data['gyro_filtered'][()]
+        x = torch.from_numpy(np.c_[acc_filtered, gyro_filtered].astype(np.float32))
+        x = x.permute(1, 0)
+        x = x[:, None, :]
+        y = torch.from_numpy(y_lbl2onehot[data.attrs['gt']])
+        return x, y.float()
+
+    def __getitems__(self, indices):
+        """DataLoader 按batch取样本时调用，省去每个样本查找 dataset 的开销"""
+        if not self.consolidated:
+            # 逐段布局没有批量读取的捷径，经过 __getitem__，子类覆盖的读取方式仍然生效
+            return [self[idx] for idx in indices]
+        indices = [self._global(idx) for idx in indices]
+        # 逐个切片读取比 h5py 的花式索引 (ds[[i, j, ...]]) 快一个数量级，块已在缓存中时只是内存拷贝
+        filtered = self.filtered
+        return [self._to_sample(filtered[idx], self.labels[idx]) for idx in indices]
+
+    def get_all_data(self):
+        dtype = torch.float32
+        if self.consolidated:
+            # 子集也整块读入再取下标，比按下标逐个读取快
+            x_all = self.filtered[()]
+            labels = self.labels
+            if self.indices is not None:
+                x_all, labels = x_all[self.indices], labels[self.indices]
+            x_all = torch.from_numpy(x_all.astype(np.float32))
+            y_all = torch.from_numpy(ONEHOT[labels])
+            return x_all.permute(0, 2, 1)[:, :, None, :].contiguous(), y_all
+        if self.indices is not None:
+            samples = [self._read(idx) for idx in self.indices]
+            return torch.stack([x for x, _ in samples]), torch.stack([y for _, y in samples])
+
+        x_all, y_all = [], []
+        h5 = self.h5
+        for scene in self.scenes:
+            # 与 __getitem__ / get_labels / 合并布局的顺序一致
+            for idx in sorted(h5[scene], key=int):
+                kw = f'{scene}/{idx}'
+                x = torch.tensor(np.c_[
+                    h5[kw]['acc_filtered'][()],
+                    h5[kw]['gyro_filtered'][()]
+                ][:, None, :], dtype=dtype)
+                y = torch.tensor(y_lbl2onehot[h5[kw].attrs['gt']], dtype=dtype)
+                x_all.append(x)
+                y_all.append(y)
+
+        x_all_tensor = torch.stack(x_all).permute(0, 3, 2, 1)
+        y_all_tensor = torch.stack(y_all)
+        return x_all_tensor, y_all_tensor
+
+    def get_scene_by_idx(self, idx):
+        """idx 为主文件中的下标"""
+        which_scene_idx = bisect.bisect_right(self.prefix_sum, idx) - 1
+        which_scene = self.scenes[which_scene_idx]
+        return which_scene_idx, which_scene
+
+    def get_attr_by_idx(self, idx):
+        which_scene_idx, _ = self.get_scene_by_idx(self._global(idx))
+        return dict(self.scene_attrs[which_scene_idx])
+
+    def get_labels(self):
+        """主文件中所有样本的类别下标 (N,)"""
+        if self.consolidated:
+            return self.labels.copy()
+        h5 = self.h5
+        return np.array([y_lbl2idx[h5[scene][str(i)].attrs['gt']]
+                         for scene, n in zip(self.scenes, np.diff(self.prefix_sum)) for i in range(n)], dtype=np.int64)
+
+    def get_scene_ids(self):
+        """主文件中所有样本所属场景的下标 (N,)，对应 self.scenes"""
+        return np.repeat(np.arange(len(self.scenes)), np.diff(self.prefix_sum))
+
+    def visualize_by_idx(self, idx):
+        import matplotlib.pyplot as plt
+
+        plt.close('all')
+        x, y = self[idx]
+        attr = self.get_attr_by_idx(idx)
+        fig, ax = plt.subplots(2, 1, sharex='all')
+        ax[0].plot(x.squeeze().T[:, :3])
+        ax[0].legend(('x', 'y', 'z'))
+        ax[1].plot(x.squeeze().T[:, 3:])
+        ax[1].legend(('x', 'y', 'z'))
+        [a.grid(True) for a in ax]
+        plt.suptitle('_'.join(attr.values()))
+        plt.show()
+
+
+def file_hash(path, cache_dir=TENSOR_CACHE_DIR, block_size=1 << 20):
+    """
+    文件内容的 sha1；结果按 (路径, 大小, 修改时间) 记在 cache_dir/hashes.json 中，
+    文件未变化时不重新读取整个文件
+    """
+    stat = os.stat(path)
+    memo_path = os.path.join(cache_dir, 'hashes.json')
+    memo = {}
+    if os.path.exists(memo_path):
+        with open(memo_path, encoding='utf-8') as f:
+            memo = json.load(f)
+    key = os.path.abspath(path)
+    entry = memo.get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha1']
+
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    memo[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1.hexdigest()}
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{memo_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(memo, f, indent=1)
+    os.replace(tmp_path, memo_path)
+    return memo[key]['sha1']
+
+
+def tensor_cache_paths(h5_path, cache_dir=TENSOR_CACHE_DIR, config=PREPROCESS_CONFIG, indices=None):
+    config_json = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha1((file_hash(h5_path, cache_dir) + config_json).encode('utf-8'))
+    if indices is not None:
+        digest.update(np.ascontiguousarray(indices, dtype=np.int64).tobytes())
+    key = digest.hexdigest()[:16]
+    stem = os.path.join(cache_dir, f'{os.path.splitext(os.path.basename(h5_path))[0]}-{key}')
+    return f'{stem}.x.npy', f'{stem}.y.npy'
+
+
+def load_all_data(h5_path, cache_dir=TENSOR_CACHE_DIR):
+    """
+    与 MHGDataSet(h5_path).get_all_data() 相同的 (x, y)，经过 .npy 缓存
+    Args:
+        h5_path: h5 文件，或 'splits/seed0.json:train' 形式的划分
+        cache_dir: 缓存目录，None 时不使用缓存
+    Returns:
+        x: (N, 6, 1, T) float32, y: (N, num_classes) one-hot，缓存命中时是内存映射 (写时复制)
+    """
+    h5_path, indices = resolve_dataset(h5_path)
+    if cache_dir is None:
+        return MHGDataSet(h5_path, indices).get_all_data()
+    x_path, y_path = tensor_cache_paths(h5_path, cache_dir, indices=indices)
+    if not (os.path.exists(x_path) and os.path.exists(y_path)):
+        x, y = MHGDataSet(h5_path, indices).get_all_data()
+        # 先写临时文件再改名，多个进程同时生成缓存时不会读到写了一半的文件
+        for path, tensor in ((x_path, x), (y_path, y)):
+            tmp_path = f'{path[:-4]}.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, np.ascontiguousarray(tensor.numpy(), dtype=np.float32))
+            os.replace(tmp_path, path)
+    # mmap_mode='c'：只读映射文件，写入时复制到内存，torch.from_numpy 不会提示不可写
+    return torch.from_numpy(np.load(x_path, mmap_mode='c')), torch.from_numpy(np.load(y_path, mmap_mode='c'))
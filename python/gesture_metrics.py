@@ -0,0 +1,151 @@
+"""
+分类评估指标 (只依赖 numpy)
+
+calculate_advanced_metrics 原来在 run_compare_result_of_pytorch_and_mlpackage.py 中，那里导入了
+matplotlib / seaborn / pywayne 和编译好的 butterworth_filter，只为计算指标的脚本 (quantize_model.py 等)
+不需要这些依赖。提供 y_prob 计算 ROC 时才导入 sklearn。
+"""
+from typing import Dict
+
+import numpy as np
+
+
+def calculate_advanced_metrics(confusion_matrix: np.ndarray, 
+                             y_true: np.ndarray = None,
+                             y_pred: np.ndarray = None,
+                             y_prob: np.ndarray = None) -> dict:
+    """
+    计算混淆矩阵的各种高级评估指标，并可选择性地生成ROC曲线。
+    
+    参数:
+        confusion_matrix: numpy.ndarray, 形状为(n, n)的混淆矩阵
+        y_true: 真实标签，形状为(N,)
+        y_pred: 预测的类别，形状为(N,)
+        y_prob: 预测的概率分布，形状为(N, n_classes)，用于ROC曲线
+    """
+    if not isinstance(confusion_matrix, np.ndarray):
+        confusion_matrix = np.array(confusion_matrix)
+    
+    n_classes = confusion_matrix.shape[0]
+    
+    # 1. 基础指标计算
+    tp = np.diag(confusion_matrix)
+    fp = np.sum(confusion_matrix, axis=0) - tp
+    fn = np.sum(confusion_matrix, axis=1) - tp
+    tn = np.sum(confusion_matrix) - (tp + fp + fn)
+    
+    # 2. 计算基础指标
+    precision = np.zeros(n_classes)
+    recall = np.zeros(n_classes)
+    specificity = np.zeros(n_classes)
+    f1_score = np.zeros(n_classes)
+    
+    for i in range(n_classes):
+        precision[i] = tp[i] / (tp[i] + fp[i]) if (tp[i] + fp[i]) > 0 else 0
+        recall[i] = tp[i] / (tp[i] + fn[i]) if (tp[i] + fn[i]) > 0 else 0
+        specificity[i] = tn[i] / (tn[i] + fp[i]) if (tn[i] + fp[i]) > 0 else 0
+        f1_score[i] = 2 * (precision[i] * recall[i]) / (precision[i] + recall[i]) if (precision[i] + recall[i]) > 0 else 0
+    
+    # 3. 计算高级指标
+    # Cohen's Kappa
+    total = np.sum(confusion_matrix)
+    observed_accuracy = np.sum(tp) / total
+    expected_accuracy = sum(np.sum(confusion_matrix, axis=0) * np.sum(confusion_matrix, axis=1)) / (total * total)
+    kappa = (observed_accuracy - expected_accuracy) / (1 - expected_accuracy)
+    
+    # Balanced Accuracy
+    balanced_accuracy = np.mean(recall)
+    
+    # Matthews Correlation Coefficient (MCC)
+    def multiclass_mcc(confusion_matrix):
+        t_sum = confusion_matrix.sum()
+        s = (confusion_matrix / t_sum).sum()
+        r = np.sum(confusion_matrix, axis=1)
+        c = np.sum(confusion_matrix, axis=0)
+        t = np.trace(confusion_matrix)
+        n = t_sum * t - np.sum(r * c)
+        d = np.sqrt((t_sum**2 - np.sum(c * c)) * (t_sum**2 - np.sum(r * r)))
+        return n / d if d != 0 else 0
+    
+    mcc = multiclass_mcc(confusion_matrix)
+    
+    # 4. 如果提供了预测概率，计算ROC曲线相关指标
+    roc_data = None
+    if y_true is not None and y_prob is not None:
+        roc_data = calculate_multiclass_roc(y_true, y_prob, n_classes)
+    
+    return {
+        'basic_metrics': {
+            'precision': {
+                'per_class': precision.tolist(),
+                'macro_avg': float(np.mean(precision))
+            },
+            'recall': {
+                'per_class': recall.tolist(),
+                'macro_avg': float(np.mean(recall))
+            },
+            'f1_score': {
+                'per_class': f1_score.tolist(),
+                'macro_avg': float(np.mean(f1_score))
+            },
+            'accuracy': float(observed_accuracy)
+        },
+        'advanced_metrics': {
+            'specificity': {
+                'per_class': specificity.tolist(),
+                'macro_avg': float(np.mean(specificity))
+            },
+            'balanced_accuracy': float(balanced_accuracy),
+            'cohen_kappa': float(kappa),
+            'matthews_correlation_coefficient': float(mcc)
+        },
+        'roc_data': roc_data
+    }
+
+
+def calculate_multiclass_roc(y_true: np.ndarray, y_prob: np.ndarray, n_classes: int) -> Dict:
+    """
+    计算多分类ROC曲线（one-vs-rest方式）
+    
+    参数:
+        y_true: 真实标签，形状为(N,)
+        y_prob: 预测概率，形状为(N, n_classes)
+        n_classes: 类别数量
+    """
+
+    from sklearn.metrics import auc, roc_curve
+    from sklearn.preprocessing import label_binarize
+
+    y_true = y_true.astype(int)
+    
+    # 获取实际出现的类别
+    unique_classes = np.unique(y_true)
+    
+    # 将标签进行二值化处理，确保使用正确的类别范围
+    y_true_bin = label_binarize(y_true, classes=range(n_classes))
+    
+    # 验证维度
+    assert y_true_bin.shape[1] == y_prob.shape[1], f"标签形状不匹配: {y_true_bin.shape} vs {y_prob.shape}"
+
+
+    # 将标签进行二值化处理
+    # y_true_bin = label_binarize(y_true, classes=range(n_classes))
+    
+    # 计算每个类别的ROC曲线和AUC
+    fpr = {}
+    tpr = {}
+    roc_auc = {}
+    
+    for i in range(n_classes):
+        fpr[i], tpr[i], _ = roc_curve(y_true_bin[:, i], y_prob[:, i])
+        roc_auc[i] = auc(fpr[i], tpr[i])
+    
+    # 计算微平均ROC曲线
+    fpr["micro"], tpr["micro"], _ = roc_curve(y_true_bin.ravel(), y_prob.ravel())
+    roc_auc["micro"] = auc(fpr["micro"], tpr["micro"])
+    
+    return {
+        'fpr': fpr,
+        'tpr': tpr,
+        'roc_auc': roc_auc
+    }
@@ -0,0 +1,153 @@
+"""
+可替换的推理后端
+
+所有后端提供相同的接口：
+    predict(x) -> np.ndarray, x 为带batch维的 float32 数组，返回 (batch, num_classes) 的logits
+
+    torch        PyTorch eager，加载训练得到的 .pt checkpoint 并做推理优化 (optimize_model.py)
+    torchscript  export_model.py 导出的 TorchScript (.ts.pt)
+    onnx         export_model.py 导出的 ONNX，使用 ONNX Runtime (CPU)
+    coreml       .mlpackage，依赖 coremltools，只能在 macOS 上运行
+    numpy        numpy_inference.py 导出的 .npz（BN已折叠），不依赖torch
+
+除 coreml 外都可以在 Linux 服务器上无界面运行。
+torch 只在创建 torch / torchscript 后端时导入，numpy 后端不需要安装 torch。
+"""
+import abc
+import os
+import sys
+import time
+
+import numpy as np
+
+
+class InferenceBackend(abc.ABC):
+    name = 'base'
+
+    @abc.abstractmethod
+    def predict(self, input_data):
+        """(batch, ...) float32 -> (batch, num_classes) logits"""
+
+    def preprocess(self, input_data):
+        # 确保数据类型和内存布局正确
+        return np.ascontiguousarray(input_data, dtype=np.float32)
+
+
+class TorchBackend(InferenceBackend):
+    name = 'torch'
+
+    def __init__(self, model, n_threads=None):
+        import torch
+
+        if n_threads:
+            torch.set_num_threads(n_threads)
+        self.torch = torch
+        self.model = model.eval()
+
+    def predict(self, input_data):
+        x = self.torch.from_numpy(self.preprocess(input_data))
+        with self.torch.inference_mode():
+            return self.model(x).numpy()
+
+
+class TorchScriptBackend(TorchBackend):
+    name = 'torchscript'
+
+    def __init__(self, model_path, n_threads=None):
+        import torch
+
+        super().__init__(torch.jit.load(model_path, map_location='cpu'), n_threads)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    name = 'onnx'
+
+    def __init__(self, model_path, n_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if n_threads:
+            options.intra_op_num_threads = n_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, input_data):
+        return self.session.run(None, {self.input_name: self.preprocess(input_data)})[0]
+
+
+class CoreMLBackend(InferenceBackend):
+    name = 'coreml'
+
+    def __init__(self, model_path):
+        import coremltools as ct
+
+        self.model = ct.models.MLModel(model_path)
+        self.input_desc = self.model.input_description
+        self.output_desc = self.model.output_description
+
+    def predict(self, input_data):
+        processed_data = self.preprocess(input_data)
+        # 转换时输入形状固定为batch=1，逐个样本调用
+        outputs = [self.model.predict({"input": sample[None]})["output"].reshape(-1) for sample in processed_data]
+        return np.stack(outputs)
+
+
+BACKENDS = ('torch', 'torchscript', 'onnx', 'coreml', 'numpy')
+
+
+def create_backend(kind, model_path, arch='gesture', num_classes=9, n_threads=None):
+    """
+    创建推理后端
+    Args:
+        kind: 'torch' / 'torchscript' / 'onnx' / 'coreml' / 'numpy'
+        model_path: torch 为训练保存的 state_dict，其余为对应的导出文件
+        arch: torch 后端需要的模型结构，'gesture' 或 'vanilla'
+    """
+    if not os.path.exists(model_path):
+        print(f"错误：找不到模型文件 {model_path}")
+        sys.exit(1)
+    if kind == 'torch':
+        from gesture_models import load_model
+        from optimize_model import optimize_model
+
+        return TorchBackend(optimize_model(load_model(arch, model_path, num_classes)), n_threads)
+    if kind == 'torchscript':
+        return TorchScriptBackend(model_path, n_threads)
+    if kind == 'onnx':
+        return OnnxRuntimeBackend(model_path, n_threads)
+    if kind == 'coreml':
+        return CoreMLBackend(model_path)
+    if kind == 'numpy':
+        from numpy_inference import NumpyBackend
+        return NumpyBackend(model_path)
+    raise ValueError(f"未知的推理后端: {kind}，可选: {BACKENDS}")
+
+
+def benchmark_backend(backend, x, batch_size=1, repeat=50, warmup=5):
+    """
+    统计每个batch的推理延迟和吞吐量
+    Args:
+        x: (N, ...) 输入数据，按 batch_size 循环取batch
+    Returns:
+        dict: 延迟中位数/P90 (ms) 和吞吐量 (samples/s)
+    """
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    batches = [x[i:i + batch_size] for i in range(0, len(x) - batch_size + 1, batch_size)] or [x]
+    for i in range(warmup):
+        backend.predict(batches[i % len(batches)])
+
+    latencies = []
+    for i in range(repeat):
+        batch = batches[i % len(batches)]
+        start = time.perf_counter()
+        backend.predict(batch)
+        latencies.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies)
+    return {
+        'backend': backend.name,
+        'batch_size': len(batches[0]),
+        'latency_ms': float(np.median(latencies) * 1e3),
+        'latency_p90_ms': float(np.percentile(latencies, 90) * 1e3),
+        'throughput': float(len(batches[0]) / np.median(latencies)),
+    }
@@ -0,0 +1,169 @@
+"""
+后台推理线程
+
+实时识别时峰值可能成簇到达，在绘图/数据接收线程里同步调用模型会阻塞渲染。
+InferenceWorker 在独立线程中运行：
+    submit()   把一个窗口放进请求队列，立即返回
+    worker     取到第一个请求后最多再等待 deadline 秒，把这段时间内到达的请求
+               合成一个batch（不超过 max_batch_size）做一次前向推理
+    results    每个请求的预测结果（带峰值时间戳）放进结果队列，由调用方在主线程中取出；
+               某个batch推理出错时打印错误，该batch的每个请求得到一个 error 不为 None 的结果，
+               线程继续处理后面的请求
+
+同时统计排队等待时间、batch大小和模型耗时，用于调整 deadline。
+"""
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+import numpy as np
+
+
+class InferenceWorker:
+    def __init__(self, backend, deadline=0.02, max_batch_size=16, stats_interval=50, history_size=1000):
+        """
+        Args:
+            backend: 提供 predict(batch) -> (batch, num_classes) logits 的对象，见 inference_backend.py
+            deadline: 第一个请求到达后等待更多请求的最长时间(s)
+            max_batch_size: 每次推理的最大样本数
+            stats_interval: 每推理多少个batch打印一次统计，0 表示不打印
+        """
+        self.backend = backend
+        self.deadline = deadline
+        self.max_batch_size = max_batch_size
+        self.stats_interval = stats_interval
+
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self._thread = None
+        self._stop = threading.Event()
+
+        # 统计信息
+        self.queue_wait = deque(maxlen=history_size)
+        self.batch_sizes = deque(maxlen=history_size)
+        self.model_latency = deque(maxlen=history_size)
+        self.num_batches = 0
+        self.num_errors = 0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, x, timestamp):
+        """提交一个不带batch维的输入窗口，timestamp 随结果一起返回"""
+        self.requests.put((time.perf_counter(), timestamp, np.asarray(x, dtype=np.float32)))
+
+    def get_results(self):
+        """取出目前已完成的所有结果（非阻塞）"""
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def _collect_batch(self):
+        try:
+            first = self.requests.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        end_time = first[0] + self.deadline
+        while len(batch) < self.max_batch_size:
+            remaining = end_time - time.perf_counter()
+            try:
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                logits = self.backend.predict(np.stack([x for _, _, x in batch]))
+                # softmax
+                logits = logits - logits.max(axis=1, keepdims=True)
+                probabilities = np.exp(logits)
+                probabilities /= probabilities.sum(axis=1, keepdims=True)
+            except Exception as e:
+                print(f"[inference] batch of {len(batch)} failed: {e!r}")
+                traceback.print_exc()
+                self._put_errors(batch, start, repr(e))
+                continue
+            done = time.perf_counter()
+
+            latency = done - start
+            self.batch_sizes.append(len(batch))
+            self.model_latency.append(latency)
+            for (submit_time, timestamp, _), prob in zip(batch, probabilities):
+                wait = start - submit_time
+                self.queue_wait.append(wait)
+                predicted_class = int(np.argmax(prob))
+                self.results.put({
+                    'timestamp': timestamp,
+                    'predicted_class': predicted_class,
+                    'confidence': float(prob[predicted_class]),
+                    'probabilities': prob,
+                    'queue_wait': wait,
+                    'batch_size': len(batch),
+                    'model_latency': latency,
+                    'error': None,
+                })
+
+            self.num_batches += 1
+            if self.stats_interval and self.num_batches % self.stats_interval == 0:
+                self.print_stats()
+
+    def _put_errors(self, batch, start, error):
+        latency = time.perf_counter() - start
+        self.num_errors += len(batch)
+        for submit_time, timestamp, _ in batch:
+            self.results.put({
+                'timestamp': timestamp,
+                'predicted_class': None,
+                'confidence': None,
+                'probabilities': None,
+                'queue_wait': start - submit_time,
+                'batch_size': len(batch),
+                'model_latency': latency,
+                'error': error,
+            })
+
+    def stats(self):
+        if not self.batch_sizes:
+            return {}
+        queue_wait = np.array(self.queue_wait) * 1e3
+        latency = np.array(self.model_latency) * 1e3
+        return {
+            'num_batches': self.num_batches,
+            'num_errors': self.num_errors,
+            'mean_batch_size': float(np.mean(self.batch_sizes)),
+            'max_batch_size': int(np.max(self.batch_sizes)),
+            'queue_wait_ms': float(np.median(queue_wait)),
+            'queue_wait_p90_ms': float(np.percentile(queue_wait, 90)),
+            'model_latency_ms': float(np.median(latency)),
+            'model_latency_p90_ms': float(np.percentile(latency, 90)),
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        if not s:
+            return
+        print(f"[inference] batches={s['num_batches']} errors={s['num_errors']} batch size mean={s['mean_batch_size']:.1f} max={s['max_batch_size']}, "
+              f"queue wait median={s['queue_wait_ms']:.1f} ms p90={s['queue_wait_p90_ms']:.1f} ms, "
+              f"model median={s['model_latency_ms']:.2f} ms p90={s['model_latency_p90_ms']:.2f} ms "
+              f"(deadline={self.deadline * 1e3:.0f} ms)")
@@ -0,0 +1,114 @@
+"""
+生成 train/valid/test 划分清单（只记录下标，不复制数据）
+
+main.ipynb 中的划分会把主文件 aw10_data.h5 的每个样本再写一遍到 train.h5 / valid.h5 / test.h5。
+这里改为在清单 (JSON) 中记录每个集合在主文件中的下标，MHGDataSet 按下标读取子集：
+
+    {
+        "master": "aw10_data.h5",            相对于清单所在目录
+        "master_sha1": "...",                主文件被修改后清单失效
+        "seed": 0, "ratios": [0.6, 0.2, 0.2], "stratify": "scene",
+        "splits": {"train": [...], "valid": [...], "test": [...]}
+    }
+
+分层方式:
+    scene         每个场景内按比例划分 (与 main.ipynb 相同)
+    label         每个类别内按比例划分
+    scene+label   每个 (场景, 类别) 组合内按比例划分
+
+用法:
+    python make_split.py aw10_data.h5 --out splits/seed0.json
+    python make_split.py aw10_data.h5 --out splits/label_seed1.json --seed 1 --stratify label --ratios 0.7 0.15 0.15
+    # 之后在需要数据集路径的地方使用 'splits/seed0.json:train'
+    python quantize_model.py valid_epoch=14_accuracy=0.960.pt --train splits/seed0.json:train --test splits/seed0.json:test
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from gesture_dataset import MHGDataSet, file_hash, y_idx2lbl
+
+SPLIT_NAMES = ('train', 'valid', 'test')
+
+
+def split_indices(groups, ratios, seed):
+    """
+    每组内随机打乱后按比例切分，前两份取整，剩余的都归最后一份 (与 main.ipynb 一致)
+    Args:
+        groups: (N,) 每个样本的分组编号
+    Returns:
+        与 ratios 等长的下标数组列表，每个数组已排序
+    """
+    rng = np.random.default_rng(seed)
+    parts = [[] for _ in ratios]
+    for group in np.unique(groups):
+        members = rng.permutation(np.flatnonzero(groups == group))
+        sizes = [int(r * len(members)) for r in ratios[:-1]]
+        bounds = np.cumsum([0] + sizes + [len(members) - sum(sizes)])
+        for k in range(len(ratios)):
+            parts[k].append(members[bounds[k]:bounds[k + 1]])
+    return [np.sort(np.concatenate(p)) for p in parts]
+
+
+def make_split(master, seed=0, ratios=(0.6, 0.2, 0.2), stratify='scene', manifest_dir='.'):
+    dataset = MHGDataSet(master)
+    labels = dataset.get_labels()
+    scene_ids = dataset.get_scene_ids()
+    if stratify == 'scene':
+        groups = scene_ids
+    elif stratify == 'label':
+        groups = labels
+    elif stratify == 'scene+label':
+        groups = scene_ids * len(y_idx2lbl) + labels
+    else:
+        raise ValueError(f"未知的分层方式: {stratify}")
+
+    parts = split_indices(groups, list(ratios), seed)
+    return {
+        'master': os.path.relpath(os.path.abspath(master), os.path.abspath(manifest_dir)),
+        'master_sha1': file_hash(master),
+        'seed': seed,
+        'ratios': list(ratios),
+        'stratify': stratify,
+        'counts': {name: {y_idx2lbl[c]: int(n) for c, n in enumerate(np.bincount(labels[p], minlength=len(y_idx2lbl)))}
+                   for name, p in zip(SPLIT_NAMES, parts)},
+        'splits': {name: p.tolist() for name, p in zip(SPLIT_NAMES, parts)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a seeded, stratified index split manifest')
+    parser.add_argument('master', help='主数据文件，例如 aw10_data.h5 (逐段布局或合并布局)')
+    parser.add_argument('--out', required=True, help='清单路径，例如 splits/seed0.json')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ratios', type=float, nargs=3, default=[0.6, 0.2, 0.2], metavar=('TRAIN', 'VALID', 'TEST'))
+    parser.add_argument('--stratify', choices=['scene', 'label', 'scene+label'], default='scene')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.master):
+        print(f"错误：找不到文件 {args.master}")
+        sys.exit(1)
+    if abs(sum(args.ratios) - 1) > 1e-6:
+        print(f"错误：比例之和应为1，当前为 {sum(args.ratios)}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    out_dir = os.path.dirname(os.path.abspath(args.out))
+    manifest = make_split(args.master, args.seed, args.ratios, args.stratify, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    elapsed = time.perf_counter() - start
+
+    for name in SPLIT_NAMES:
+        counts = manifest['counts'][name]
+        print(f"{name:<6} {sum(counts.values()):>6}  " + ' '.join(f"{k}:{v}" for k, v in counts.items()))
+    print(f"已写入 {args.out} ({os.path.getsize(args.out) / 1024:.1f} KB)，耗时 {elapsed * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+把 main.ipynb 生成的逐段布局 h5 (<scene>/<i>/acc_filtered ...) 转换为合并布局
+
+逐段布局中每个样本是一个 group 加4个很小的 dataset，几万个样本就是十几万个 HDF5 对象，
+打开文件和按名字查找都很慢。合并布局把同类数组合成一个 (N, T, 6) 的分块压缩 dataset，
+标签/场景下标/场景属性各是一个小表，布局说明见 gesture_dataset.py。
+
+用法:
+    python migrate_h5.py train.h5 train_consolidated.h5
+    python migrate_h5.py aw10_data.h5 aw10_data_consolidated.h5 --compression lzf --chunk-size 128
+    python migrate_h5.py test.h5 test_consolidated.h5 --verify
+"""
+import argparse
+import os
+import sys
+import time
+
+import h5py
+import numpy as np
+
+from gesture_dataset import CONSOLIDATED, MHGDataSet, y_lbl2idx
+
+ARRAYS = {
+    'rawdata': ('acc_rawdata', 'gyro_rawdata'),
+    'filtered': ('acc_filtered', 'gyro_filtered'),
+}
+SCENE_ATTRS = ('date', 'force_level', 'handness', 'note', 'scene_kw', 'scene_property')
+
+
+def attrs_table(scenes, attrs):
+    """场景属性 -> 复合类型数组，列为 scene + 所有场景中出现过的属性 (缺失的为空字符串)"""
+    keys = list(SCENE_ATTRS) + sorted({k for a in attrs for k in a} - set(SCENE_ATTRS))
+    keys = [k for k in keys if any(k in a for a in attrs)]
+    string = h5py.string_dtype('utf-8')
+    table = np.empty(len(scenes), dtype=[('scene', string)] + [(k, string) for k in keys])
+    for i, (scene, a) in enumerate(zip(scenes, attrs)):
+        table[i] = (scene, *[str(a[k]) if k in a else '' for k in keys])
+    return table
+
+
+def scene_table(h5, scenes):
+    return attrs_table(scenes, [dict(h5[s].attrs) for s in scenes])
+
+
+def migrate(src, dst, compression='gzip', chunk_size=256, filtered=None):
+    """
+    Args:
+        filtered: {场景名: (n, T, 6)}，给出时 filtered 使用这里的数据而不读取 src 中的
+                  acc_filtered / gyro_filtered (见 preprocess.py)
+    """
+    with h5py.File(src, 'r') as h5:
+        if h5.attrs.get('layout') == CONSOLIDATED:
+            raise ValueError(f"{src} 已经是合并布局")
+        scenes = sorted(h5.keys())
+        # 与 MHGDataSet 的下标顺序一致：场景按名字排序，场景内按 i 从小到大
+        segments = [(s, i) for s in scenes for i in sorted(h5[s], key=int)]
+        # 样本在场景内的序号，对应 filtered[场景名] 的第几行
+        positions = {(s, i): k for s in scenes for k, i in enumerate(sorted(h5[s], key=int))}
+        n = len(segments)
+        lengths = {h5[f'{s}/{i}/acc_rawdata'].shape[0] for s, i in segments}
+        if len(lengths) != 1:
+            raise ValueError(f"样本长度不一致: {sorted(lengths)}，无法合并为 (N, T, 6)")
+        T = lengths.pop()
+
+        with h5py.File(dst, 'w') as out:
+            out.attrs['layout'] = CONSOLIDATED
+            out.attrs['source'] = os.path.basename(src)
+            chunks = (min(chunk_size, n), T, 6)
+            datasets = {name: out.create_dataset(name, (n, T, 6), dtype=np.float32, chunks=chunks,
+                                                 compression=compression, shuffle=compression is not None)
+                        for name in ARRAYS}
+            labels = np.empty(n, dtype=np.int16)
+            scene_index = np.empty(n, dtype=np.int32)
+            segment_index = np.empty(n, dtype=np.int32)
+            scene_ids = {s: k for k, s in enumerate(scenes)}
+
+            # 按块写入，每个块只做一次 HDF5 写操作
+            for start in range(0, n, chunks[0]):
+                block = segments[start:start + chunks[0]]
+                buffers = {name: np.empty((len(block), T, 6), dtype=np.float32) for name in ARRAYS}
+                for j, (s, i) in enumerate(block):
+                    group = h5[f'{s}/{i}']
+                    for name, (acc, gyro) in ARRAYS.items():
+                        if name == 'filtered' and filtered is not None:
+                            buffers[name][j] = filtered[s][positions[s, i]]
+                            continue
+                        buffers[name][j, :, :3] = group[acc][()]
+                        buffers[name][j, :, 3:] = group[gyro][()]
+                    labels[start + j] = y_lbl2idx[group.attrs['gt']]
+                    scene_index[start + j] = scene_ids[s]
+                    segment_index[start + j] = int(i)
+                for name in ARRAYS:
+                    datasets[name][start:start + len(block)] = buffers[name]
+
+            out['labels'] = labels
+            out['scene_index'] = scene_index
+            out['segment_index'] = segment_index
+            out['scenes'] = scene_table(h5, scenes)
+    return n, T
+
+
+def verify(src, dst):
+    """逐个样本比较两种布局读出的数据，返回最大误差"""
+    a, b = MHGDataSet(src), MHGDataSet(dst)
+    if len(a) != len(b) or a.scenes != b.scenes:
+        raise ValueError("样本数或场景不一致")
+    err = 0.0
+    for idx in range(len(a)):
+        (xa, ya), (xb, yb) = a[idx], b[idx]
+        attr_a, attr_b = a.get_attr_by_idx(idx), b.get_attr_by_idx(idx)
+        if not np.array_equal(ya.numpy(), yb.numpy()) or any(str(v) != attr_b.get(k) for k, v in attr_a.items()):
+            raise ValueError(f"第 {idx} 个样本的标签或场景属性不一致")
+        err = max(err, float((xa - xb).abs().max()))
+    return err
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert per-segment h5 files to the consolidated chunked layout')
+    parser.add_argument('src')
+    parser.add_argument('dst')
+    parser.add_argument('--compression', choices=['gzip', 'lzf', 'none'], default='gzip')
+    parser.add_argument('--chunk-size', type=int, default=256, help='每个数据块包含的样本数')
+    parser.add_argument('--verify', action='store_true', help='转换后逐个样本对比')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.src):
+        print(f"错误：找不到文件 {args.src}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    try:
+        n, T = migrate(args.src, args.dst, None if args.compression == 'none' else args.compression, args.chunk_size)
+    except ValueError as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+    print(f"{args.src} -> {args.dst}: {n} 个样本, T={T}, 耗时 {time.perf_counter() - start:.1f}s, "
+          f"{os.path.getsize(args.src) / 1e6:.1f} MB -> {os.path.getsize(args.dst) / 1e6:.1f} MB")
+
+    if args.verify:
+        try:
+            err = verify(args.src, args.dst)
+        except ValueError as e:
+            print(f"校验失败：{e}")
+            sys.exit(1)
+        print(f"校验通过，最大误差 {err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
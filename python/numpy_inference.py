@@ -0,0 +1,219 @@
+"""
+纯NumPy推理引擎
+
+VanillaCNN 和 GestureModel 都是很小的一维CNN，为了前向推理导入 torch 会占用大部分启动时间和内存。
+这里把权重（BatchNorm已折叠进卷积）导出为 .npz，推理时只依赖 numpy：
+
+    导出（需要torch）:
+        python numpy_inference.py valid_epoch=14_accuracy=0.960.pt --arch gesture
+    推理（不需要torch）:
+        from numpy_inference import load_numpy_model
+        model = load_numpy_model('valid_epoch=14_accuracy=0.960.npz')
+        logits = model.predict(x)   # x: (batch, 6, 1, 100) 或 (batch, 6, 60)
+
+与PyTorch的一致性检查和启动时间/内存/延迟的对比见 bench_numpy_inference.py。
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+BN_EPS = 1e-5  # nn.BatchNorm1d 的默认 eps
+
+
+def conv1d(x, w, b=None, stride=1, padding=0, groups=1):
+    """
+    与 nn.Conv1d 相同的一维卷积
+    Args:
+        x: (B, C_in, L)
+        w: (C_out, C_in / groups, K)
+        groups: 只支持 1 和 depthwise (groups == C_in == C_out)
+    """
+    c_out, _, k = w.shape
+    if padding:
+        x = np.pad(x, ((0, 0), (0, 0), (padding, padding)))
+    l_out = (x.shape[2] - k) // stride + 1
+    if groups == 1:
+        # im2col：(B * L_out, C_in * K) @ (C_in * K, C_out)，整个batch只做一次矩阵乘
+        taps = [x[:, :, i:i + (l_out - 1) * stride + 1:stride] for i in range(k)]
+        cols = np.stack(taps, axis=3).transpose(0, 2, 1, 3).reshape(-1, w.shape[1] * k)
+        out = (cols @ w.reshape(c_out, -1).T).reshape(x.shape[0], l_out, c_out).transpose(0, 2, 1)
+    elif groups == x.shape[1] == c_out:
+        # depthwise：(B, C, L_out, K) 的滑动窗口视图与每个通道的卷积核做批量矩阵乘
+        windows = np.lib.stride_tricks.sliding_window_view(x, k, axis=2)[:, :, ::stride]
+        out = np.matmul(windows, w[:, 0, :, None])[..., 0]
+    else:
+        raise ValueError(f"不支持的分组卷积: groups={groups}, C_in={x.shape[1]}, C_out={c_out}")
+    if b is not None:
+        out += b[:, None]
+    return out
+
+
+def max_pool1d(x, k):
+    """nn.MaxPool1d(k)，stride 等于 k，丢弃末尾不足一个窗口的部分"""
+    length = x.shape[2] // k * k
+    return x[:, :, :length].reshape(x.shape[0], x.shape[1], -1, k).max(axis=3)
+
+
+def relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def silu(x):
+    # x * sigmoid(x)，用tanh形式避免 exp 溢出，中间结果原地计算
+    y = np.multiply(x, 0.5)
+    np.tanh(y, out=y)
+    y *= 0.5
+    y += 0.5
+    y *= x
+    return y
+
+
+def linear(x, w, b):
+    return x @ w.T + b
+
+
+class NumpyVanillaCNN:
+    arch = 'vanilla'
+
+    def __init__(self, weights):
+        self.w = weights
+
+    def predict(self, x):
+        w = self.w
+        x = np.asarray(x, dtype=np.float32)
+        x = max_pool1d(relu(conv1d(x, w['conv1.weight'], w['conv1.bias'], padding=1)), 2)
+        x = max_pool1d(relu(conv1d(x, w['conv2.weight'], w['conv2.bias'], padding=1)), 4)
+        x = relu(conv1d(x, w['conv3.weight'], w['conv3.bias'], padding=1))
+        x = x.reshape(x.shape[0], -1)
+        return linear(x, w['fc.weight'], w['fc.bias'])
+
+
+class NumpyGestureModel:
+    arch = 'gesture'
+
+    def __init__(self, weights):
+        self.w = weights
+
+    def _mbconv(self, x, name, stride, kernel_size, use_residual):
+        w = self.w
+        identity = x
+        if f'{name}.expand_conv.weight' in w:
+            x = silu(conv1d(x, w[f'{name}.expand_conv.weight'], w[f'{name}.expand_conv.bias']))
+        dw = w[f'{name}.depthwise_conv.weight']
+        x = silu(conv1d(x, dw, w[f'{name}.depthwise_conv.bias'], stride=stride,
+                        padding=kernel_size // 2, groups=dw.shape[0]))
+        x = conv1d(x, w[f'{name}.project_conv.weight'], w[f'{name}.project_conv.bias'])
+        if use_residual:
+            x = x + identity
+        return x
+
+    def predict(self, x):
+        w = self.w
+        x = np.asarray(x, dtype=np.float32)
+        B, C, F, _ = x.shape
+        x = x.reshape(B * C, F, -1)
+
+        # MBConv(1, 16, 1, 1, 9), MBConv(16, 24, 6, 2, 9)
+        x = self._mbconv(x, 'conv1', stride=1, kernel_size=9, use_residual=False)
+        x = self._mbconv(x, 'conv2', stride=2, kernel_size=9, use_residual=False)
+        L = x.shape[2]
+
+        x = x.reshape(B, -1, L)
+        # SeparableConv(144, 24, 9)
+        dw = w['conv3.depthwise.weight']
+        x = relu(conv1d(x, dw, w['conv3.depthwise.bias'], groups=dw.shape[0]))
+        x = relu(conv1d(x, w['conv3.pointwise.weight'], w['conv3.pointwise.bias']))
+        x = max_pool1d(x, 8)
+        x = x.reshape(B, -1)
+
+        x = relu(linear(x, w['dense1.weight'], w['dense1.bias']))
+        x = relu(linear(x, w['dense2.weight'], w['dense2.bias']))
+        x = relu(linear(x, w['dense3.weight'], w['dense3.bias']))
+        return linear(x, w['dense4.weight'], w['dense4.bias'])
+
+
+class NumpyBackend:
+    """与 inference_backend 中的后端接口一致：predict(x) -> (batch, num_classes) logits"""
+    name = 'numpy'
+
+    def __init__(self, model_path):
+        self.model = load_numpy_model(model_path)
+
+    def predict(self, input_data):
+        return self.model.predict(input_data)
+
+
+NUMPY_MODELS = {
+    'vanilla': NumpyVanillaCNN,
+    'gesture': NumpyGestureModel,
+}
+
+
+def load_numpy_model(path):
+    with np.load(path) as data:
+        arch = str(data['arch'])
+        weights = {k: data[k] for k in data.files if k != 'arch'}
+    return NUMPY_MODELS[arch](weights)
+
+
+def fold_bn(state_dict, conv, bn):
+    """把 BatchNorm 折叠进前面的卷积，返回 (weight, bias)"""
+    w = state_dict[f'{conv}.weight']
+    b = state_dict.get(f'{conv}.bias', np.zeros(w.shape[0], dtype=w.dtype))
+    scale = state_dict[f'{bn}.weight'] / np.sqrt(state_dict[f'{bn}.running_var'] + BN_EPS)
+    return w * scale[:, None, None], (b - state_dict[f'{bn}.running_mean']) * scale + state_dict[f'{bn}.bias']
+
+
+def fold_weights(arch, state_dict):
+    """state_dict (numpy数组) -> 折叠BN后推理所需的权重"""
+    weights = {}
+    if arch == 'vanilla':
+        for i in (1, 2, 3):
+            weights[f'conv{i}.weight'], weights[f'conv{i}.bias'] = fold_bn(state_dict, f'conv{i}', f'bn{i}')
+        layers = ['fc']
+    elif arch == 'gesture':
+        for name in ('conv1', 'conv2'):
+            for conv, bn in (('expand_conv', 'expand_bn'), ('depthwise_conv', 'depthwise_bn'), ('project_conv', 'project_bn')):
+                if f'{name}.{conv}.weight' in state_dict:
+                    weights[f'{name}.{conv}.weight'], weights[f'{name}.{conv}.bias'] = \
+                        fold_bn(state_dict, f'{name}.{conv}', f'{name}.{bn}')
+        layers = ['conv3.depthwise', 'conv3.pointwise', 'dense1', 'dense2', 'dense3', 'dense4']
+    else:
+        raise ValueError(f"未知的模型类型: {arch}")
+    for layer in layers:
+        weights[f'{layer}.weight'] = state_dict[f'{layer}.weight']
+        weights[f'{layer}.bias'] = state_dict[f'{layer}.bias']
+    return {k: v.astype(np.float32) for k, v in weights.items()}
+
+
+def export_npz(arch, checkpoint, path):
+    """从训练保存的 state_dict 导出 .npz（此函数需要torch）"""
+    import torch
+
+    state_dict = torch.load(checkpoint, map_location='cpu')
+    state_dict = {k: v.double().numpy() for k, v in state_dict.items() if v.is_floating_point()}
+    weights = fold_weights(arch, state_dict)
+    np.savez(path, arch=np.array(arch), **weights)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a checkpoint to a BN-folded .npz for the NumPy runtime')
+    parser.add_argument('checkpoint', help='训练保存的 state_dict，例如 valid_epoch=14_accuracy=0.960.pt')
+    parser.add_argument('--arch', choices=list(NUMPY_MODELS), default='gesture')
+    parser.add_argument('--out', default=None, help='输出路径，默认与checkpoint同名的 .npz')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.checkpoint):
+        print(f"错误：找不到 checkpoint {args.checkpoint}")
+        sys.exit(1)
+    out = args.out or os.path.splitext(args.checkpoint)[0] + '.npz'
+    weights = export_npz(args.arch, args.checkpoint, out)
+    n_params = sum(v.size for v in weights.values())
+    print(f"导出 {out}: {len(weights)} 个数组, {n_params} 个参数, {os.path.getsize(out)} 字节")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+推理前的模型优化
+
+训练时的结构里 Conv1d 和 BatchNorm1d 是分开的算子，推理时可以合并：
+    1. 把每个 BatchNorm 折叠进它前面的卷积
+    2. 相邻、中间没有非线性的 1x1 卷积合并为一个
+       (GestureModel: conv1.project 1->16 和 conv2.expand 16->96 合并为 1->96)
+    3. 去掉推理时不起作用的层 (Dropout / 未使用的残差分支) 和多余的 reshape
+
+optimize_model() 返回与原模型输出等价的新模块，convert_to_coreml.py 在 trace 之前、
+Python 推理后端在加载之后都使用它。
+
+用法（对比优化前后每层的耗时并检查输出是否一致）:
+    python optimize_model.py valid_epoch=14_accuracy=0.960.pt --arch gesture
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+from collections import defaultdict
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from gesture_models import MODELS, GestureModel, VanillaCNN, example_input, load_model
+
+TOLERANCE = 1e-4
+
+
+def merge_pointwise(first, second):
+    """两个相邻的 1x1 卷积 (中间无激活) 合并为一个: y = W2 (W1 x + b1) + b2"""
+    w1 = first.weight[:, :, 0]
+    w2 = second.weight[:, :, 0]
+    b1 = first.bias if first.bias is not None else torch.zeros(w1.shape[0])
+    b2 = second.bias if second.bias is not None else torch.zeros(w2.shape[0])
+    merged = nn.Conv1d(w1.shape[1], w2.shape[0], kernel_size=1)
+    with torch.no_grad():
+        merged.weight.copy_((w2 @ w1)[:, :, None])
+        merged.bias.copy_(w2 @ b1 + b2)
+    return merged
+
+
+class FusedVanillaCNN(nn.Module):
+    def __init__(self, model: VanillaCNN):
+        super(FusedVanillaCNN, self).__init__()
+        self.conv1 = fuse_conv_bn_eval(model.conv1, model.bn1)
+        self.maxpool1 = model.maxpool1
+        self.conv2 = fuse_conv_bn_eval(model.conv2, model.bn2)
+        self.maxpool2 = model.maxpool2
+        self.conv3 = fuse_conv_bn_eval(model.conv3, model.bn3)
+        self.relu = nn.ReLU()
+        self.fc = model.fc
+
+    def forward(self, x):
+        xx = self.maxpool1(self.relu(self.conv1(x)))
+        xx = self.maxpool2(self.relu(self.conv2(xx)))
+        xx = self.relu(self.conv3(xx))
+        xx = torch.flatten(xx, start_dim=1)
+        return self.fc(xx)
+
+
+class FusedGestureModel(nn.Module):
+    def __init__(self, model: GestureModel):
+        super(FusedGestureModel, self).__init__()
+        conv1, conv2 = model.conv1, model.conv2
+        # 合并 conv1.project 与 conv2.expand 的前提：conv1 没有扩展层和残差，conv2 有扩展层
+        if conv1.expand_conv is not None or conv1.use_residual or conv2.expand_conv is None or conv2.use_residual:
+            raise ValueError("GestureModel 的结构与预期不符，无法合并 1x1 卷积")
+
+        self.conv1_depthwise = fuse_conv_bn_eval(conv1.depthwise_conv, conv1.depthwise_bn)
+        self.pointwise = merge_pointwise(
+            fuse_conv_bn_eval(conv1.project_conv, conv1.project_bn),
+            fuse_conv_bn_eval(conv2.expand_conv, conv2.expand_bn),
+        )
+        self.conv2_depthwise = fuse_conv_bn_eval(conv2.depthwise_conv, conv2.depthwise_bn)
+        self.conv2_project = fuse_conv_bn_eval(conv2.project_conv, conv2.project_bn)
+        self.conv3_depthwise = model.conv3.depthwise
+        self.conv3_pointwise = model.conv3.pointwise
+        self.pool1 = model.pool1
+        self.silu = nn.SiLU()
+        self.dense1 = model.dense1
+        self.dense2 = model.dense2
+        self.dense3 = model.dense3
+        self.dense4 = model.dense4
+
+    def forward(self, input):
+        B, C, F, T = input.shape
+        x = input.reshape(B * C, F, T)
+
+        x = self.silu(self.conv1_depthwise(x))
+        x = self.silu(self.pointwise(x))
+        x = self.silu(self.conv2_depthwise(x))
+        x = self.conv2_project(x)
+
+        x = x.reshape(B, -1, x.shape[-1])
+        x = torch.relu(self.conv3_depthwise(x))
+        x = torch.relu(self.conv3_pointwise(x))
+        x = self.pool1(x)
+        x = torch.flatten(x, start_dim=1)
+
+        x = torch.relu(self.dense1(x))
+        x = torch.relu(self.dense2(x))
+        x = torch.relu(self.dense3(x))
+        return self.dense4(x)
+
+
+def optimize_model(model):
+    """返回折叠BN、合并1x1卷积后的等价推理模型（eval模式），原模型不受影响"""
+    model = copy.deepcopy(model).eval()
+    if isinstance(model, GestureModel):
+        fused = FusedGestureModel(model)
+    elif isinstance(model, VanillaCNN):
+        fused = FusedVanillaCNN(model)
+    else:
+        raise ValueError(f"不支持的模型类型: {type(model).__name__}")
+    return fused.eval()
+
+
+def layer_latency(model, x, repeat=20):
+    """用forward hook统计每个叶子模块的平均耗时(us)，以及整次前向的耗时"""
+    timings = defaultdict(float)
+    starts = {}
+    handles = []
+    for name, module in model.named_modules():
+        if len(list(module.children())) == 0 and not isinstance(module, (nn.Dropout, nn.Identity)):
+            handles.append(module.register_forward_pre_hook(
+                lambda m, inp, name=name: starts.__setitem__(name, time.perf_counter())))
+            handles.append(module.register_forward_hook(
+                lambda m, inp, out, name=name: timings.__setitem__(
+                    name, timings[name] + time.perf_counter() - starts[name])))
+    with torch.inference_mode():
+        model(x)
+        timings.clear()
+        for _ in range(repeat):
+            model(x)
+    for h in handles:
+        h.remove()
+
+    with torch.inference_mode():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            model(x)
+        total = (time.perf_counter() - start) / repeat
+    return {k: v / repeat * 1e6 for k, v in timings.items()}, total * 1e6
+
+
+def print_latency_table(model, fused, x):
+    before, total_before = layer_latency(model, x)
+    after, total_after = layer_latency(fused, x)
+    print(f"\nbatch={len(x)}")
+    print(f"{'original layer':<28} {'us':>9}    {'optimized layer':<20} {'us':>9}")
+    rows = max(len(before), len(after))
+    b_items, a_items = list(before.items()), list(after.items())
+    for i in range(rows):
+        left = f"{b_items[i][0]:<28} {b_items[i][1]:>9.1f}" if i < len(b_items) else ' ' * 38
+        right = f"{a_items[i][0]:<20} {a_items[i][1]:>9.1f}" if i < len(a_items) else ''
+        print(f"{left}    {right}")
+    print(f"{'total (forward)':<28} {total_before:>9.1f}    {'total (forward)':<20} {total_after:>9.1f}"
+          f"    ({total_before / total_after:.2f}x)")
+
+
+def check_equivalence(model, fused, arch):
+    err = 0.0
+    for batch_size in (1, 7, 256):
+        x = example_input(arch, batch_size) * 4 - 2
+        with torch.inference_mode():
+            err = max(err, float((model(x) - fused(x)).abs().max()))
+    return err
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuse Conv+BN / pointwise layers and compare per-layer latency')
+    parser.add_argument('checkpoint', nargs='?', default=None, help='训练保存的 state_dict；不指定时使用随机权重')
+    parser.add_argument('--arch', choices=list(MODELS), default='gesture')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 256])
+    args = parser.parse_args()
+
+    if args.checkpoint:
+        if not os.path.exists(args.checkpoint):
+            print(f"错误：找不到 checkpoint {args.checkpoint}")
+            sys.exit(1)
+        model = load_model(args.arch, args.checkpoint)
+    else:
+        torch.manual_seed(0)
+        model = MODELS[args.arch][0](9)
+        # 随机化BN统计量，否则折叠相当于恒等变换
+        for m in model.modules():
+            if isinstance(m, nn.BatchNorm1d):
+                m.running_mean.uniform_(-0.5, 0.5)
+                m.running_var.uniform_(0.5, 1.5)
+        model.eval()
+
+    fused = optimize_model(model)
+    n_params = lambda m: sum(p.numel() for p in m.parameters())
+    print(f"参数量: {n_params(model)} -> {n_params(fused)}")
+
+    err = check_equivalence(model, fused, args.arch)
+    print(f"输出最大误差: {err:.2e}{'' if err < TOLERANCE else '  FAIL'}")
+
+    for batch_size in args.batch_sizes:
+        print_latency_table(model, fused, example_input(args.arch, batch_size))
+
+    if err >= TOLERANCE:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
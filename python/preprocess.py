@@ -0,0 +1,232 @@
+"""
+计算 filtered 通道 (acc_filtered / gyro_filtered)，结果按内容缓存，不改写主数据文件
+
+main.ipynb 的数据集预处理一节以 r+ 打开 aw10_data.h5，逐个样本滤波后删除再重写 acc_filtered / gyro_filtered。
+这里只读主文件，按 (场景, acc/gyro) 分组在进程池中滤波，输出为新的合并布局 h5 (布局见 gesture_dataset.py)，
+rawdata、标签和场景属性从主文件复制。
+
+每组结果存为 cache_dir/<原始数据哈希>-<滤波参数哈希>.npy:
+    修改 acc 的滤波参数只重新计算 acc，gyro 全部命中缓存
+    主文件中只有某个场景的数据变化时只重新计算该场景
+不滤波的通道 (参数为 None) 直接使用原始数据，不进缓存。
+
+主文件可以是逐段布局 (只需要 acc_rawdata / gyro_rawdata) 或合并布局 (使用 rawdata)。
+
+用法:
+    python preprocess.py aw10_data.h5 aw10_filtered.h5
+    python preprocess.py aw10_data.h5 aw10_filtered.h5 --acc-band 0.1 20 --gyro-band 0.1 40 --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+from scipy.signal import butter, filtfilt
+
+from gesture_dataset import is_consolidated, read_scene_table
+from migrate_h5 import migrate
+
+PREPROCESS_CACHE_DIR = '.preprocess_cache'
+CHANNELS = {'acc': slice(0, 3), 'gyro': slice(3, 6)}
+# 与 main.ipynb 相同: butter_bandpass_filter(acc / 9.81, order=2, lo=0.1, hi=40, fs=100.0, btype='bandpass', realtime=False)，
+# gyro_filtered = gyro
+DEFAULT_FILTERS = {
+    'acc': {'scale': 1 / 9.81, 'order': 2, 'lo': 0.1, 'hi': 40.0, 'fs': 100.0, 'btype': 'bandpass'},
+    'gyro': None,
+}
+
+
+def apply_filter(raw, params):
+    """
+    (n, T, 3) -> (n, T, 3)，沿时间轴零相位滤波 (filtfilt，即 realtime=False)
+    params 为 None 时原样返回
+    """
+    if params is None:
+        return raw
+    btype = params['btype']
+    if btype in ('bandpass', 'bandstop'):
+        cutoff = [params['lo'], params['hi']]
+    else:
+        cutoff = params['hi'] if btype == 'lowpass' else params['lo']
+    b, a = butter(params['order'], cutoff, btype=btype, fs=params['fs'])
+    return filtfilt(b, a, raw * params.get('scale', 1.0), axis=1)
+
+
+def apply_filters(raw, filters=DEFAULT_FILTERS):
+    """(n, T, 6) 原始数据 -> (n, T, 6) filtered，列顺序 acc xyz, gyro xyz"""
+    return np.concatenate([apply_filter(raw[..., CHANNELS[name]], filters[name]) for name in CHANNELS], axis=-1)
+
+
+def params_hash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def raw_hash(raw):
+    sha1 = hashlib.sha1(f'{raw.dtype.str}{raw.shape}'.encode('utf-8'))
+    sha1.update(np.ascontiguousarray(raw).tobytes())
+    return sha1.hexdigest()
+
+
+def cache_path(cache_dir, raw, params):
+    return os.path.join(cache_dir, f'{raw_hash(raw)[:16]}-{params_hash(params)[:12]}.npy')
+
+
+def filter_to_cache(raw, params, path):
+    """进程池中的任务：滤波并写入缓存 (先写临时文件再改名)"""
+    filtered = apply_filter(raw, params).astype(np.float32)
+    tmp_path = f'{path[:-4]}.{os.getpid()}.tmp.npy'
+    np.save(tmp_path, filtered)
+    os.replace(tmp_path, path)
+    return len(filtered)
+
+
+def read_raw_groups(h5):
+    """
+    主文件的原始数据按场景分组
+    Returns:
+        场景名列表, 每个场景的 (n, T, 6) float64 原始数据 (场景内按 MHGDataSet 的顺序)
+    """
+    if is_consolidated(h5):
+        scenes, _ = read_scene_table(h5)
+        rawdata = h5['rawdata'][()].astype(np.float64)
+        scene_index = h5['scene_index'][()]
+        return scenes, [rawdata[scene_index == k] for k in range(len(scenes))]
+    scenes = sorted(h5.keys())
+    groups = []
+    for scene in scenes:
+        segments = [h5[scene][i] for i in sorted(h5[scene], key=int)]
+        groups.append(np.stack([np.c_[s['acc_rawdata'][()], s['gyro_rawdata'][()]] for s in segments])
+                      if segments else np.empty((0, 0, 6)))
+    return scenes, groups
+
+
+def preprocess(master, filters=DEFAULT_FILTERS, cache_dir=PREPROCESS_CACHE_DIR, workers=None):
+    """
+    Returns:
+        filtered: {场景名: (n, T, 6) float32}
+        stats: 缓存命中/计算的组数和样本数
+    """
+    with h5py.File(master, 'r') as h5:
+        scenes, groups = read_raw_groups(h5)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    stats = {'groups': 0, 'hits': 0, 'computed': 0, 'segments_computed': 0}
+    tasks = {}
+    parts = {}
+    for scene, raw in zip(scenes, groups):
+        for name, channels in CHANNELS.items():
+            params = filters[name]
+            if params is None or len(raw) == 0:
+                parts[scene, name] = raw[..., channels].astype(np.float32)
+                continue
+            channel_raw = np.ascontiguousarray(raw[..., channels])
+            path = cache_path(cache_dir, channel_raw, params)
+            stats['groups'] += 1
+            parts[scene, name] = path
+            if os.path.exists(path):
+                stats['hits'] += 1
+            elif path not in tasks:
+                tasks[path] = (channel_raw, params)
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=max(1, min(workers or os.cpu_count(), len(tasks)))) as pool:
+            futures = [pool.submit(filter_to_cache, raw, params, path) for path, (raw, params) in tasks.items()]
+            for future in futures:
+                stats['segments_computed'] += future.result()
+        stats['computed'] = len(tasks)
+
+    filtered = {}
+    for scene in scenes:
+        filtered[scene] = np.concatenate([
+            np.load(parts[scene, name]) if isinstance(parts[scene, name], str) else parts[scene, name]
+            for name in CHANNELS], axis=-1)
+    return filtered, stats
+
+
+def write_output(master, dst, filtered, filters, compression='gzip', chunk_size=256):
+    """主文件 + 新的 filtered -> 合并布局的 dst (先写临时文件再改名)"""
+    tmp_path = f'{dst}.{os.getpid()}.tmp'
+    with h5py.File(master, 'r') as h5:
+        consolidated = is_consolidated(h5)
+    if consolidated:
+        with h5py.File(master, 'r') as h5, h5py.File(tmp_path, 'w') as out:
+            out.attrs.update(dict(h5.attrs))
+            for key in h5:
+                if key != 'filtered':
+                    h5.copy(h5[key], out, name=key)
+            scenes, _ = read_scene_table(h5)
+            scene_index = h5['scene_index'][()]
+            data = np.empty(h5['rawdata'].shape, dtype=np.float32)
+            for k, scene in enumerate(scenes):
+                data[scene_index == k] = filtered[scene]
+            out.create_dataset('filtered', data=data, chunks=h5['rawdata'].chunks,
+                               compression=compression, shuffle=compression is not None)
+            out.attrs['filters'] = json.dumps(filters)
+    else:
+        migrate(master, tmp_path, compression, chunk_size, filtered=filtered)
+        with h5py.File(tmp_path, 'a') as out:
+            out.attrs['filters'] = json.dumps(filters)
+    os.replace(tmp_path, dst)
+
+
+def band(values):
+    """--acc-band LO HI / --acc-band none -> 滤波参数"""
+    if values == ['none']:
+        return None
+    if len(values) != 2:
+        raise argparse.ArgumentTypeError("需要两个截止频率 LO HI，或 none")
+    return float(values[0]), float(values[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute filtered channels with a content-addressed cache')
+    parser.add_argument('master', help='主数据文件，例如 aw10_data.h5 (只读)')
+    parser.add_argument('out', help='输出的合并布局 h5，例如 aw10_filtered.h5')
+    parser.add_argument('--acc-band', nargs='+', default=['0.1', '40'], metavar='HZ',
+                        help='acc 带通截止频率 LO HI，none 表示不滤波')
+    parser.add_argument('--gyro-band', nargs='+', default=['none'], metavar='HZ',
+                        help='gyro 带通截止频率 LO HI，默认不滤波 (与 main.ipynb 相同)')
+    parser.add_argument('--order', type=int, default=2)
+    parser.add_argument('--fs', type=float, default=100.0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='进程数')
+    parser.add_argument('--cache-dir', default=PREPROCESS_CACHE_DIR)
+    parser.add_argument('--compression', choices=['gzip', 'lzf', 'none'], default='gzip')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.master):
+        print(f"错误：找不到文件 {args.master}")
+        sys.exit(1)
+    if os.path.abspath(args.out) == os.path.abspath(args.master):
+        print("错误：输出文件不能与主文件相同")
+        sys.exit(1)
+
+    filters = {}
+    for name, values, scale in (('acc', args.acc_band, 1 / 9.81), ('gyro', args.gyro_band, 1.0)):
+        try:
+            cutoff = band(values)
+        except argparse.ArgumentTypeError as e:
+            print(f"错误：--{name}-band {e}")
+            sys.exit(1)
+        filters[name] = None if cutoff is None else {
+            'scale': scale, 'order': args.order, 'lo': cutoff[0], 'hi': cutoff[1], 'fs': args.fs, 'btype': 'bandpass'}
+
+    start = time.perf_counter()
+    filtered, stats = preprocess(args.master, filters, args.cache_dir, args.workers)
+    elapsed = time.perf_counter() - start
+    n = sum(len(v) for v in filtered.values())
+    print(f"{len(filtered)} 个场景, {n} 个样本: {stats['groups']} 组需要滤波, 缓存命中 {stats['hits']}, "
+          f"重新计算 {stats['computed']} 组 ({stats['segments_computed']} 个样本), "
+          f"耗时 {elapsed:.2f}s, workers={args.workers}")
+
+    start = time.perf_counter()
+    write_output(args.master, args.out, filtered, filters, None if args.compression == 'none' else args.compression)
+    print(f"已写入 {args.out}，耗时 {time.perf_counter() - start:.2f}s ({args.master} 未修改)")
+
+
+if __name__ == "__main__":
+    main()
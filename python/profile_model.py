@@ -0,0 +1,174 @@
+"""
+逐层统计模型的计算量、参数量、激活内存和CPU延迟
+
+每个叶子模块 (Conv1d / Linear / BatchNorm / 激活 / 池化 ...) 输出一行:
+    MACs        每个样本的乘加次数 (Conv1d 和 Linear；其余层记为0)
+    params      该层自身的参数个数
+    act (KB)    batch=1 时该层输出的 float32 激活大小
+    latency     batch=1 和 batch=N 时该层的平均耗时 (us)，用 forward hook 计时
+
+forward 中的函数式算子 (torch.relu / reshape / 残差相加) 不是模块，计入总耗时但不单独列出。
+--json 输出同样的内容，用于对比不同版本的模型 (GestureModel.version / tag 一并写入)。
+
+用法:
+    python profile_model.py --arch gesture
+    python profile_model.py valid_epoch=14_accuracy=0.960.pt --arch gesture --batch-size 256 --json profile_0.0.9.json
+    python profile_model.py --arch gesture --optimized          # 折叠BN后实际导出的结构
+    python profile_model.py --arch smooth_plot_show_demo:VanillaCNN --input-shape 6 60
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+
+import torch
+import torch.nn as nn
+
+from gesture_models import MODELS
+from optimize_model import layer_latency, optimize_model
+
+
+def resolve_model(arch, num_classes, input_shape=None):
+    """arch 为 MODELS 中的名字，或者 '模块名:类名' (类的构造参数为 num_classes)"""
+    if arch in MODELS:
+        model_class, default_shape = MODELS[arch]
+    elif ':' in arch:
+        module_name, class_name = arch.split(':', 1)
+        model_class, default_shape = getattr(importlib.import_module(module_name), class_name), None
+    else:
+        raise ValueError(f"未知的模型类型: {arch}，可选: {list(MODELS)} 或 '模块名:类名'")
+    input_shape = tuple(input_shape) if input_shape else default_shape
+    if input_shape is None:
+        raise ValueError(f"{arch} 需要用 --input-shape 指定单个样本的输入形状")
+    return model_class(num_classes), input_shape
+
+
+def count_macs(module, output):
+    """output 中所有元素的乘加次数"""
+    if isinstance(module, nn.Conv1d):
+        # 每个输出元素: (C_in / groups) * K 次乘加
+        return output.numel() * module.in_channels // module.groups * module.kernel_size[0]
+    if isinstance(module, nn.Linear):
+        return output.numel() * module.in_features
+    return 0
+
+
+def layer_stats(model, x):
+    """
+    用 forward hook 记录每个叶子模块的输出形状、MACs 和参数量
+    x 为 batch=1 的输入；GestureModel 前半部分把6个通道展开到batch维，所以按整个输出张量统计
+    """
+    stats = {}
+    handles = []
+    for name, module in model.named_modules():
+        if len(list(module.children())) == 0 and not isinstance(module, (nn.Dropout, nn.Identity)):
+            def hook(m, inputs, output, name=name):
+                if name in stats:
+                    # 同一个模块在 forward 中被调用多次 (例如共享的 SiLU)，累加到同一行
+                    stats[name]['calls'] += 1
+                    stats[name]['macs'] += int(count_macs(m, output))
+                    stats[name]['activation_bytes'] = max(stats[name]['activation_bytes'],
+                                                          output.numel() * output.element_size())
+                    return
+                stats[name] = {
+                    'name': name,
+                    'type': type(m).__name__,
+                    'output_shape': list(output.shape),
+                    'macs': int(count_macs(m, output)),
+                    'params': sum(p.numel() for p in m.parameters(recurse=False)),
+                    'activation_bytes': output.numel() * output.element_size(),
+                    'calls': 1,
+                }
+            handles.append(module.register_forward_hook(hook))
+    with torch.inference_mode():
+        model(x)
+    for h in handles:
+        h.remove()
+    return list(stats.values())
+
+
+def profile(model, input_shape, batch_sizes, repeat=50):
+    x = torch.rand(1, *input_shape)
+    layers = layer_stats(model, x)
+    totals = {
+        'macs': sum(l['macs'] for l in layers),
+        'params': sum(p.numel() for p in model.parameters()),
+        'param_bytes': sum(p.numel() * p.element_size() for p in model.parameters()),
+        'peak_activation_bytes': max(l['activation_bytes'] for l in layers),
+        'latency_us': {},
+    }
+    for batch_size in batch_sizes:
+        timings, total = layer_latency(model, torch.rand(batch_size, *input_shape), repeat)
+        for l in layers:
+            l.setdefault('latency_us', {})[str(batch_size)] = timings.get(l['name'], 0.0)
+        totals['latency_us'][str(batch_size)] = total
+    return layers, totals
+
+
+def print_table(layers, totals, batch_sizes):
+    latency_cols = ''.join(f"{f'bs={b} (us)':>12}" for b in batch_sizes)
+    print(f"{'layer':<28} {'type':<12} {'output':<18} {'MACs':>10} {'params':>8} {'act (KB)':>9}{latency_cols}")
+    for l in layers:
+        shape = 'x'.join(map(str, l['output_shape'])) + (f" (x{l['calls']})" if l['calls'] > 1 else '')
+        latency = ''.join(f"{l['latency_us'][str(b)]:>12.1f}" for b in batch_sizes)
+        print(f"{l['name']:<28} {l['type']:<12} {shape:<18} {l['macs']:>10,} {l['params']:>8,} "
+              f"{l['activation_bytes'] / 1024:>9.2f}{latency}")
+    latency = ''.join(f"{totals['latency_us'][str(b)]:>12.1f}" for b in batch_sizes)
+    print(f"{'total':<28} {'':<12} {'':<18} {totals['macs']:>10,} {totals['params']:>8,} "
+          f"{totals['peak_activation_bytes'] / 1024:>9.2f}{latency}")
+    print(f"\n参数 {totals['param_bytes'] / 1024:.1f} KB (float32)，单层最大激活 "
+          f"{totals['peak_activation_bytes'] / 1024:.2f} KB，total 行的延迟为整次前向的耗时")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-layer MACs / params / activation memory / latency profiler')
+    parser.add_argument('checkpoint', nargs='?', default=None, help='训练保存的 state_dict；不指定时使用随机权重')
+    parser.add_argument('--arch', default='gesture', help=f"{list(MODELS)} 或 '模块名:类名'")
+    parser.add_argument('--num-classes', type=int, default=9)
+    parser.add_argument('--input-shape', type=int, nargs='+', default=None, help='单个样本的输入形状，例如 6 1 100')
+    parser.add_argument('--batch-size', type=int, default=64, help='除 batch=1 外另测的 batch N')
+    parser.add_argument('--threads', type=int, default=1, help='intra-op 线程数，默认1线程接近手表上的情况')
+    parser.add_argument('--optimized', action='store_true', help='统计 optimize_model() 折叠BN后的结构')
+    parser.add_argument('--json', default=None, help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    try:
+        model, input_shape = resolve_model(args.arch, args.num_classes, args.input_shape)
+    except (ValueError, ImportError, AttributeError) as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+    if args.checkpoint:
+        if not os.path.exists(args.checkpoint):
+            print(f"错误：找不到 checkpoint {args.checkpoint}")
+            sys.exit(1)
+        model.load_state_dict(torch.load(args.checkpoint, map_location='cpu'))
+    model.eval()
+    # version / tag 是原模型的属性，优化后的模块没有
+    meta = {
+        'arch': args.arch,
+        'model_class': type(model).__name__,
+        'version': getattr(model, 'version', None),
+        'tag': getattr(model, 'tag', None),
+        'checkpoint': args.checkpoint,
+        'optimized': args.optimized,
+        'input_shape': list(input_shape),
+        'threads': args.threads,
+    }
+    if args.optimized:
+        model = optimize_model(model)
+
+    torch.set_num_threads(args.threads)
+    batch_sizes = sorted({1, args.batch_size})
+    layers, totals = profile(model, input_shape, batch_sizes)
+    print(f"{meta['model_class']} version={meta['version']} input={tuple(input_shape)} threads={args.threads}\n")
+    print_table(layers, totals, batch_sizes)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({**meta, 'totals': totals, 'layers': layers}, f, ensure_ascii=False, indent=2)
+        print(f"已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
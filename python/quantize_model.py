@@ -0,0 +1,196 @@
+"""
+训练后量化 (PTQ)，对比各量化方式的精度、模型大小和CPU延迟
+
+在 optimize_model() 折叠BN、合并1x1卷积后的模型上生成以下变体:
+    fp32            基准
+    fp16-weights    权重舍入到 float16 存储，推理时仍为 float32 (对应 CoreML 的 float16 权重)
+    int8-dynamic    Linear 层权重 int8，激活在运行时动态量化
+    int8-static     卷积和全连接全部 int8，激活的量化参数用 train.h5 中的样本校准
+
+每个变体都用 test.h5 和 calculate_advanced_metrics 评估，输出相对 fp32 的精度变化。
+CoreML 的 float16 / 调色板量化由 convert_to_coreml.py 生成，可以用 --mlpackages 一起对比（仅macOS）。
+
+用法:
+    python quantize_model.py valid_epoch=14_accuracy=0.960.pt
+    python quantize_model.py total_epoch=950_accuracy=0.989.pt --arch vanilla --calib-samples 1024
+    python quantize_model.py valid_epoch=14_accuracy=0.960.pt --out-dir exported \\
+        --mlpackages GestureModel_fp32.mlpackage GestureModel_1.mlpackage GestureModel_palettized_6bit.mlpackage
+"""
+import argparse
+import copy
+import io
+import os
+import platform
+import sys
+import warnings
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+from gesture_dataset import dataset_source, load_all_data
+from gesture_metrics import calculate_advanced_metrics
+from gesture_models import MODELS, example_input, load_model
+from inference_backend import TorchBackend, benchmark_backend, create_backend
+from optimize_model import optimize_model
+
+# torch.ao.quantization 在新版本中会提示迁移到 torchao，这里只用到稳定的 eager/FX 接口
+warnings.filterwarnings('ignore', category=DeprecationWarning, module=r'torch\.ao\.quantization')
+warnings.filterwarnings('ignore', category=UserWarning, module=r'torch\.ao\.quantization')
+
+
+def default_engine():
+    # 手机/手表和 Apple Silicon 是 ARM，对应 qnnpack；x86 服务器用 x86 (fbgemm)
+    machine = platform.machine().lower()
+    return 'qnnpack' if machine.startswith(('arm', 'aarch64')) else 'x86'
+
+
+def fp16_weights(model):
+    """权重舍入到 float16 再转回 float32，只模拟存储精度的损失"""
+    model = copy.deepcopy(model)
+    with torch.no_grad():
+        for p in model.parameters():
+            p.copy_(p.half().float())
+    return model
+
+
+def int8_dynamic(model):
+    return quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+
+
+def int8_static(model, arch, calib_x, engine, batch_size=256):
+    """FX graph mode 静态量化，calib_x 用于统计每层激活的取值范围"""
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(copy.deepcopy(model), get_default_qconfig_mapping(engine), (example_input(arch),))
+    with torch.inference_mode():
+        for i in range(0, len(calib_x), batch_size):
+            prepared(calib_x[i:i + batch_size])
+    return convert_fx(prepared)
+
+
+def quantize_variants(model, arch, calib_x, engine):
+    model = optimize_model(model)
+    return {
+        'fp32': model,
+        'fp16-weights': fp16_weights(model),
+        'int8-dynamic': int8_dynamic(model),
+        'int8-static': int8_static(model, arch, calib_x, engine),
+    }
+
+
+def model_size(model, half=False):
+    """序列化后的 state_dict 字节数；half=True 时按 float16 存储计算"""
+    state_dict = model.state_dict()
+    if half:
+        state_dict = {k: v.half() if v.is_floating_point() else v for k, v in state_dict.items()}
+    buffer = io.BytesIO()
+    torch.save(state_dict, buffer)
+    return len(buffer.getvalue())
+
+
+def mlpackage_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def evaluate(backend, test_x, test_true, batch_size=256):
+    """返回 (calculate_advanced_metrics 的结果, 预测类别)"""
+    test_prob = np.concatenate([backend.predict(test_x[i:i + batch_size])
+                                for i in range(0, len(test_x), batch_size)], axis=0)
+    test_pred = np.argmax(test_prob, axis=1)
+    n_classes = test_prob.shape[1]
+    cm = np.bincount(test_true * n_classes + test_pred, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+    metrics = calculate_advanced_metrics(cm, y_true=test_true, y_pred=test_pred)
+    return metrics, test_pred
+
+
+def load_h5(path):
+    x, y = load_all_data(path)
+    return x, np.argmax(y.numpy(), axis=1)
+
+
+def print_report(rows, batch_size):
+    print(f"\n{'variant':<28} {'accuracy':>9} {'Δacc':>8} {'macro F1':>9} {'agree':>7} {'size (KB)':>10} "
+          f"{'bs=1 (ms)':>10} {f'bs={batch_size} (ms)':>12}")
+    base = rows[0]
+    for r in rows:
+        print(f"{r['variant']:<28} {r['accuracy']:>9.4f} {r['accuracy'] - base['accuracy']:>+8.4f} "
+              f"{r['f1']:>9.4f} {r['agreement']:>7.3f} {r['size'] / 1024:>10.1f} "
+              f"{r['latency_1']:>10.3f} {r['latency_n']:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Post-training quantization with accuracy / size / latency report')
+    parser.add_argument('checkpoint', help='训练保存的 state_dict，例如 valid_epoch=14_accuracy=0.960.pt')
+    parser.add_argument('--arch', choices=list(MODELS), default='gesture')
+    parser.add_argument('--num-classes', type=int, default=9)
+    parser.add_argument('--train', default='train.h5', help="校准数据，h5 文件或 'splits/seed0.json:train'")
+    parser.add_argument('--test', default='test.h5', help="评估数据，h5 文件或 'splits/seed0.json:test'")
+    parser.add_argument('--calib-samples', type=int, default=512, help='从训练集随机抽取的校准样本数')
+    parser.add_argument('--engine', choices=torch.backends.quantized.supported_engines, default=default_engine())
+    parser.add_argument('--batch-size', type=int, default=64, help='除 batch=1 外另测一个batch的延迟')
+    parser.add_argument('--threads', type=int, default=1, help='intra-op 线程数，默认1线程接近手表上的情况')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out-dir', default=None, help='保存各量化变体的 TorchScript (<out_dir>/<checkpoint名>.<variant>.ts.pt)')
+    parser.add_argument('--mlpackages', nargs='*', default=[], help='convert_to_coreml.py 导出的 .mlpackage，一起评估（仅macOS）')
+    args = parser.parse_args()
+
+    for path in (args.checkpoint, dataset_source(args.train), dataset_source(args.test)):
+        if not os.path.exists(path):
+            print(f"错误：找不到文件 {path}")
+            sys.exit(1)
+    train_x, _ = load_h5(args.train)
+    test_x, test_true = load_h5(args.test)
+    input_shape = MODELS[args.arch][1]
+    if args.arch == 'vanilla':
+        # MHGDataSet 输出 (N, 6, 1, T)，VanillaCNN 的输入是 (N, 6, T)
+        train_x, test_x = train_x[:, :, 0], test_x[:, :, 0]
+    if tuple(test_x.shape[1:]) != input_shape:
+        print(f"错误：数据形状 {tuple(test_x.shape[1:])} 与 {args.arch} 的输入 {input_shape} 不一致")
+        sys.exit(1)
+    rng = np.random.default_rng(args.seed)
+    calib_idx = rng.choice(len(train_x), min(args.calib_samples, len(train_x)), replace=False)
+    print(f"校准样本: {len(calib_idx)} / {len(train_x)}, 测试样本: {len(test_x)}, 量化引擎: {args.engine}")
+
+    torch.set_num_threads(args.threads)
+    model = load_model(args.arch, args.checkpoint, args.num_classes)
+    variants = quantize_variants(model, args.arch, train_x[calib_idx], args.engine)
+    backends = [(name, TorchBackend(m), model_size(m, half=name == 'fp16-weights')) for name, m in variants.items()]
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(args.checkpoint))[0]
+        for name, m in variants.items():
+            path = os.path.join(args.out_dir, f'{stem}.{name}.ts.pt')
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', torch.jit.TracerWarning)
+                torch.jit.trace(m, example_input(args.arch)).save(path)
+            print(f"导出 {name}: {path}")
+
+    for path in args.mlpackages:
+        try:
+            backends.append((os.path.basename(path.rstrip('/')), create_backend('coreml', path), mlpackage_size(path)))
+        except ImportError as e:
+            print(f"跳过 {path}: {e}")
+
+    test_x = test_x.numpy()
+    rows = []
+    reference = None
+    for name, backend, size in backends:
+        metrics, pred = evaluate(backend, test_x, test_true)
+        reference = pred if reference is None else reference
+        rows.append({
+            'variant': name,
+            'accuracy': metrics['basic_metrics']['accuracy'],
+            'f1': metrics['basic_metrics']['f1_score']['macro_avg'],
+            'agreement': float(np.mean(pred == reference)),  # 与 fp32 预测一致的比例
+            'size': size,
+            'latency_1': benchmark_backend(backend, test_x, 1)['latency_ms'],
+            'latency_n': benchmark_backend(backend, test_x, args.batch_size)['latency_ms'],
+        })
+    print_report(rows, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
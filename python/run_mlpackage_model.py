@@ -1,69 +1,26 @@
 import numpy as np
-import coremltools as ct
+import argparse
 import os
 import sys
+import time
 from scipy.signal import butter
+from inference_backend import BACKENDS, create_backend
+from sensor_io import load_imu
+from timestamp_align import align_nearest, align_streams, describe_unmatched
 
 # Make sure the path to butterworth_filter is correct
 try:
     sys.path.append('../pybind_libs/detrend_iir')
-    from butterworth_filter import ButterworthFilter
+    from butterworth_filter import ButterworthFilterBank
 except ImportError:
-    print("Error: Could not import ButterworthFilter.")
+    print("Error: Could not import ButterworthFilterBank.")
     print("Please ensure '../pybind_libs/detrend_iir' is in the Python path and the module exists.")
     sys.exit(1)
 
-
-class MLPackageInference:
-    def __init__(self, model_path):
-        """
-        初始化MLPackage推理类
-        Args:
-            model_path: mlpackage文件的路径
-        """
-        try:
-            self.model = ct.models.MLModel(model_path)
-            self.input_desc = self.model.input_description
-            self.output_desc = self.model.output_description
-            # 打印模型输入输出信息
-            print("\n模型信息:")
-            print(f"模型路径: {model_path}")
-            print(f"输入描述: {self.input_desc}")
-            print(f"输出描述: {self.output_desc}\n")
-        except Exception as e:
-            print(f"加载模型失败: {model_path}")
-            print(f"错误: {e}")
-            sys.exit(1)
-
-    def preprocess(self, input_data):
-        """
-        预处理输入数据
-        """
-        # 确保数据类型正确
-        input_data = np.asarray(input_data).astype(np.float32)
-        # print(f"输入数据形状: {input_data.shape}")
-        # print(f"输入数据类型: {input_data.dtype}")
-        return input_data
-
-    def predict(self, input_data):
-        """
-        使用模型进行推理
-        """
-        processed_data = self.preprocess(input_data)
-        # 直接使用已知的输入特征名称 "input"
-        input_key = "input"
-        input_dict = {input_key: processed_data}
-
-        try:
-            predictions = self.model.predict(input_dict)
-            # print(f"预测结果类型: {type(predictions)}")
-            # if isinstance(predictions, dict):
-            #     print(f"预测结果键: {predictions.keys()}")
-            return predictions
-        except Exception as e:
-            print(f"模型推理出错: {e}")
-            # 返回None或引发异常，取决于错误处理策略
-            return None
+# result.txt 的峰值时间戳取自 acc 的采样时间戳，应完全一致 (单位 ns)
+PEAK_TOLERANCE_NS = 10
+# acc 与 gyro 配对时允许的偏差：半个采样周期 (100Hz)
+STREAM_TOLERANCE_NS = 5_000_000
 
 
 def load_config():
@@ -81,14 +38,17 @@ def load_config():
         'wayne': {
             'half_window_size': 30,
             'model_path': '/Users/wayne/Documents/work/code/project/ffalcon/micro-hand-gesture/MicroHandGestureCollectorIWatch/MicroHandGestureCollectorIWatch Watch App/GestureClassifier.mlpackage',
-            'shape': (1, 6, 60) # (batch, channels, sequence_length)
+            'shape': (1, 6, 60), # (batch, channels, sequence_length)
+            'arch': 'vanilla'
         },
         'haili': {
             'half_window_size': 50,
             'model_path': '/Users/wayne/Documents/work/code/project/ffalcon/micro-hand-gesture/MicroHandGestureCollectorIWatch/MicroHandGestureCollectorIWatch Watch App/GestureModel_1.mlpackage',
             # haili模型的shape需要确认，原始代码是 (1, 6, 4, 100)
             # 如果模型输入是 (batch, channels, frequency_bands, time_steps)
-            'shape': (1, 6, 4, 100)
+            'shape': (1, 6, 4, 100),
+            # 4个频带的输入没有对应的 PyTorch 结构 (GestureModel 的输入是 (N, 6, 1, 100))，只能用 coreml 后端
+            'arch': None
         }
     }
     return params, gesture_map
@@ -105,174 +65,138 @@ def load_sensor_data(root_dir):
         sys.exit(1)
 
     try:
-        acc_data = np.loadtxt(acc_path, skiprows=1, delimiter=',')
-        gyro_data = np.loadtxt(gyro_path, skiprows=1, delimiter=',')
+        # 第一次读取后缓存为 .npy 副本，之后直接内存映射；时间戳按 int64 精确读取
+        acc_ts, acc = load_imu(acc_path)
+        gyro_ts, gyro = load_imu(gyro_path)
         with open(result_path, encoding='utf-8', mode='r') as f:
             lines = f.readlines()[1:]
-            result_timestamps = [int(line.strip().split(',')[0]) for line in lines]
-
-        # 查找时间戳对应的索引
-        # 使用 searchsorted 提高效率，假设时间戳是大致排序的
-        acc_timestamps = acc_data[:, 0]
-        acc_peak_indices = np.searchsorted(acc_timestamps, result_timestamps)
-        # 验证找到的索引对应的时间戳是否足够接近
-        valid_indices = []
-        for i, target_ts in enumerate(result_timestamps):
-             actual_ts = acc_timestamps[acc_peak_indices[i]]
-             # 可以设置一个小的容差，例如 10ms (假设采样率100Hz)
-             if abs(actual_ts - target_ts) <= 10:
-                 valid_indices.append(acc_peak_indices[i])
-             else:
-                 # 如果找不到精确匹配，可以尝试查找最近的索引
-                 closest_idx = np.argmin(np.abs(acc_timestamps - target_ts))
-                 if abs(acc_timestamps[closest_idx] - target_ts) <= 10:
-                     valid_indices.append(closest_idx)
-                 else:
-                      print(f"警告：无法为时间戳 {target_ts} 找到足够接近的索引。最近的是 {acc_timestamps[closest_idx]}")
+            result_timestamps = np.array([int(line.strip().split(',')[0]) for line in lines if line.strip()],
+                                         dtype=np.int64)
+
+        # acc 和 gyro 逐行同时写出，时间戳不一致 (丢帧) 时只保留能配对的行，保证同一行号是同一时刻
+        acc_rows, gyro_rows = align_streams(acc_ts, gyro_ts, STREAM_TOLERANCE_NS)
+        if len(acc_rows) < max(len(acc_ts), len(gyro_ts)):
+            print(f"警告：acc 与 gyro 时间戳不一致，丢弃 acc {len(acc_ts) - len(acc_rows)} 行、"
+                  f"gyro {len(gyro_ts) - len(gyro_rows)} 行")
+        acc_data = np.column_stack([acc_ts[acc_rows], acc[acc_rows]])
+        gyro_data = np.column_stack([gyro_ts[gyro_rows], gyro[gyro_rows]])
+
+        # 一次比较 searchsorted 两侧的邻居，找出每个峰值时间戳最近的 acc 行
+        acc_peak_indices, offsets = align_nearest(acc_ts[acc_rows], result_timestamps, PEAK_TOLERANCE_NS)
+        message = describe_unmatched(result_timestamps, acc_peak_indices, offsets)
+        if message:
+            print(f"警告：{message}")
 
         # 确保索引不会导致切片越界
         min_idx = params[whose_model]['half_window_size']
         max_idx = len(acc_data) - params[whose_model]['half_window_size']
-        valid_indices = [idx for idx in valid_indices if min_idx <= idx < max_idx]
+        valid_indices = acc_peak_indices[(acc_peak_indices >= min_idx) & (acc_peak_indices < max_idx)]
 
-        if not valid_indices:
+        if len(valid_indices) == 0:
              print("错误：未能根据 result.txt 中的时间戳找到任何有效的峰值索引。")
              sys.exit(1)
 
 
-        return acc_data, gyro_data, np.array(valid_indices)
+        return acc_data, gyro_data, valid_indices
 
     except Exception as e:
         print(f"加载或处理数据时出错: {e}")
         sys.exit(1)
 
 
-def create_butterworth_filters(fs=100.0):
-    """创建巴特沃斯滤波器"""
+def create_butterworth_filter_bank(fs=100.0):
+    """创建巴特沃斯滤波器组（原始信号 + 低频 + 中频 + 高频）"""
     nyquist = fs / 2.0
     try:
         b_low, a_low = butter(N=2, Wn=[0.25 / nyquist, 8.0 / nyquist], btype='bandpass')
         b_mid, a_mid = butter(N=2, Wn=[8.0 / nyquist, 32.0 / nyquist], btype='bandpass')
-        b_high, a_high = butter(N=2, Wn=[32.0 / nyquist], btype='highpass')
+        b_high, a_high = butter(N=2, Wn=32.0 / nyquist, btype='highpass')
 
-        bwf_low = ButterworthFilter(b_low, a_low)
-        bwf_mid = ButterworthFilter(b_mid, a_mid)
-        bwf_high = ButterworthFilter(b_high, a_high)
-        return bwf_low, bwf_mid, bwf_high
+        return ButterworthFilterBank([b_low, b_mid, b_high], [a_low, a_mid, a_high], include_raw=True)
     except Exception as e:
         print(f"创建滤波器时出错: {e}")
         sys.exit(1)
 
 
-def extract_and_process_segment(idx, acc_data, gyro_data, params, whose_model, bwf_low, bwf_mid, bwf_high):
-    """提取、滤波并组合单个数据段"""
+def extract_and_process_segments(indices, acc_data, gyro_data, params, whose_model, filter_bank):
+    """
+    一次提取、滤波并组合所有峰值处的数据段
+    Returns:
+        haili: (N, channels, bands, time_steps) = (N, 6, 4, 100)
+        wayne: (N, channels, time_steps) = (N, 6, 60)
+    """
     half_window = params[whose_model]['half_window_size']
-    start, end = idx - half_window, idx + half_window
-
-    acc_segment = acc_data[start:end, 1:] # 取 X, Y, Z 列
-    gyro_segment = gyro_data[start:end, 1:] # 取 X, Y, Z 列
+    # (N, time_steps) 的行索引，用花式索引一次取出所有窗口
+    rows = np.asarray(indices)[:, None] + np.arange(-half_window, half_window)
 
-    # 应用滤波器
-    acc_low = np.apply_along_axis(lambda x: bwf_low.filter(x.tolist()), 0, acc_segment)
-    gyro_low = np.apply_along_axis(lambda x: bwf_low.filter(x.tolist()), 0, gyro_segment)
-    acc_mid = np.apply_along_axis(lambda x: bwf_mid.filter(x.tolist()), 0, acc_segment)
-    gyro_mid = np.apply_along_axis(lambda x: bwf_mid.filter(x.tolist()), 0, gyro_segment)
-    acc_high = np.apply_along_axis(lambda x: bwf_high.filter(x.tolist()), 0, acc_segment)
-    gyro_high = np.apply_along_axis(lambda x: bwf_high.filter(x.tolist()), 0, gyro_segment)
+    # 取 X, Y, Z 列；滤波是线性的，先把加速度换算成g再滤波，与先滤波再换算等价
+    # Shape: (N, time_steps, channels)
+    segments = np.concatenate([acc_data[rows, 1:] / 9.81, gyro_data[rows, 1:]], axis=2)
 
     # 组合特征 - 注意根据模型输入调整组合方式
-    # Haili 模型需要 (batch, channels, bands, time_steps) = (1, 6, 4, 100)
     if whose_model == 'haili':
         # 原始信号 (Acc+Gyro), 低频, 中频, 高频
-        # Stack along a new 'band' dimension (axis=0 before transpose)
-        processed_data = np.stack([
-            np.c_[acc_segment / 9.81, gyro_segment], # Band 0: Raw
-            np.c_[acc_low / 9.81, gyro_low],         # Band 1: Low Freq
-            np.c_[acc_mid / 9.81, gyro_mid],         # Band 2: Mid Freq
-            np.c_[acc_high / 9.81, gyro_high]        # Band 3: High Freq
-        ], axis=0) # Shape: (bands, time_steps, channels) = (4, 100, 6)
-
-        # Transpose to (channels, bands, time_steps) = (6, 4, 100)
-        processed_data = np.transpose(processed_data, (2, 0, 1))
-
-        # Add batch dimension: (1, 6, 4, 100)
-        processed_data = processed_data[None, ...]
-
-
+        # 一次原生调用完成所有数据段、所有通道、所有频带的滤波
+        processed_data = filter_bank.filter(segments)
     elif whose_model == 'wayne':
-         # Wayne 模型需要 (batch, channels, time_steps) = (1, 6, 60)
-         # 假设 Wayne 模型只使用原始信号
-         processed_data = np.c_[acc_segment / 9.81, gyro_segment] # Shape: (time_steps, channels) = (60, 6)
-         # Transpose to (channels, time_steps) = (6, 60)
-         processed_data = processed_data.T
-         # Add batch dimension: (1, 6, 60)
-         processed_data = processed_data[None, ...]
+        # 假设 Wayne 模型只使用原始信号
+        processed_data = segments.transpose(0, 2, 1)
     else:
         raise ValueError(f"未知的模型类型: {whose_model}")
 
-
     # 验证形状是否匹配
-    expected_shape = params[whose_model]['shape']
-    if processed_data.shape != expected_shape:
-        print(f"警告：处理后的数据形状 {processed_data.shape} 与预期形状 {expected_shape} 不符。")
+    expected_shape = params[whose_model]['shape'][1:]
+    if processed_data.shape[1:] != expected_shape:
+        print(f"警告：处理后的数据形状 {processed_data.shape[1:]} 与预期形状 {expected_shape} 不符。")
         # 可能需要根据具体模型调整处理逻辑
 
     return processed_data
 
 
-def run_inference(inferencer, data_segment, gesture_map, whose_model):
-    """执行推理并打印结果"""
-    try:
-        result = inferencer.predict(data_segment)
-        if result is None:
-            print("推理失败，跳过此段。")
-            return
-
-        # 直接使用已知的输出特征名称 "output"
-        output_key = "output"
-        if output_key not in result:
-            print(f"错误：预测结果中找不到预期的输出键 '{output_key}'。可用键: {result.keys()}")
-            # 尝试使用字典中的第一个键作为后备
-            if result:
-                 output_key = list(result.keys())[0]
-                 print(f"将尝试使用键: '{output_key}'")
-            else:
-                 print("预测结果字典为空。")
-                 return
-
-
-        probabilities = result[output_key]
-
-        # 处理可能的嵌套或批处理维度
-        if probabilities.ndim > 1:
-             probabilities = probabilities.squeeze() # 移除批次或不必要的维度
+def extract_and_process_segment(idx, acc_data, gyro_data, params, whose_model, filter_bank):
+    """提取、滤波并组合单个数据段，返回带batch维的 (1, ...) 数组"""
+    return extract_and_process_segments([idx], acc_data, gyro_data, params, whose_model, filter_bank)
 
 
-        if probabilities.ndim != 1:
-             print(f"错误：处理后的概率向量维度不为1 (shape: {probabilities.shape})。原始结果: {result}")
-             return
+def run_inference(inferencer, segments, batch_size=64):
+    """按 batch_size 分批推理，返回 (N, num_classes)"""
+    outputs = [inferencer.predict(segments[i:i + batch_size]) for i in range(0, len(segments), batch_size)]
+    return np.concatenate(outputs, axis=0)
 
 
-        predicted_index = np.argmax(probabilities)
-        gesture_labels = gesture_map.get(whose_model)
+def print_predictions(probabilities, indices, gesture_map, whose_model, verbose=False):
+    """打印预测结果：verbose 时逐个峰值打印，否则只打印各手势的数量"""
+    gesture_labels = gesture_map.get(whose_model)
+    predicted_indices = np.argmax(probabilities, axis=1)
 
-        if gesture_labels and 0 <= predicted_index < len(gesture_labels):
-            predicted_gesture = gesture_labels[predicted_index]
-            confidence = probabilities[predicted_index]
-            print(f"预测手势: {predicted_gesture} (索引: {predicted_index}, 置信度: {confidence:.4f})")
-            # print(f"完整概率: {probabilities}") # 可选：打印完整概率向量
-        else:
-            print(f"错误：预测索引 {predicted_index} 超出标签范围 {len(gesture_labels) if gesture_labels else 'N/A'} 或未找到 '{whose_model}' 的手势标签。")
-            print(f"原始概率: {probabilities}")
+    if verbose:
+        for i, (idx, predicted_index) in enumerate(zip(indices, predicted_indices)):
+            confidence = probabilities[i, predicted_index]
+            if gesture_labels and 0 <= predicted_index < len(gesture_labels):
+                print(f"峰值 {i+1}/{len(indices)} (原始索引: {idx}) 预测手势: {gesture_labels[predicted_index]} "
+                      f"(索引: {predicted_index}, 置信度: {confidence:.4f})")
+            else:
+                print(f"错误：预测索引 {predicted_index} 超出标签范围 {len(gesture_labels) if gesture_labels else 'N/A'} 或未找到 '{whose_model}' 的手势标签。")
+                print(f"原始概率: {probabilities[i]}")
 
-
-    except Exception as e:
-        print(f"执行推理或解析结果时出错: {e}")
-        import traceback
-        traceback.print_exc()
+    print("\n预测结果统计:")
+    counts = np.bincount(predicted_indices, minlength=len(gesture_labels) if gesture_labels else 0)
+    for predicted_index, count in enumerate(counts):
+        if count == 0:
+            continue
+        label = gesture_labels[predicted_index] if gesture_labels and predicted_index < len(gesture_labels) else predicted_index
+        print(f"{label}: {count}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run gesture recognition on the peaks of a recorded session')
+    parser.add_argument('--backend', choices=BACKENDS, default='coreml',
+                        help='推理后端，coreml 只能在 macOS 上运行，Linux 上使用 torch/torchscript/onnx')
+    parser.add_argument('--model', default=None, help='模型文件，默认使用配置中的 mlpackage 路径')
+    parser.add_argument('--batch-size', type=int, default=64, help='每次推理的峰值数量')
+    parser.add_argument('-v', '--verbose', action='store_true', help='逐个峰值打印预测结果')
+    args = parser.parse_args()
+
     # --- 配置 ---
     whose_model = 'haili'  # 或者 'wayne'
     # 数据根目录，根据需要修改
@@ -280,29 +204,32 @@ if __name__ == "__main__":
 
     # --- 加载配置和数据 ---
     params, gesture_map = load_config()
+    if params[whose_model]['arch'] is None and args.backend != 'coreml':
+        print(f"错误：{whose_model} 模型的输入为 {params[whose_model]['shape'][1:]}，"
+              f"gesture_models 中没有对应的结构，只能使用 --backend coreml")
+        sys.exit(1)
     acc_data, gyro_data, acc_peak_indices = load_sensor_data(root)
-    bwf_low, bwf_mid, bwf_high = create_butterworth_filters()
+    filter_bank = create_butterworth_filter_bank()
 
     # --- 初始化模型 ---
-    model_path = params[whose_model]['model_path']
-    inferencer = MLPackageInference(model_path)
+    model_path = args.model or params[whose_model]['model_path']
+    inferencer = create_backend(args.backend, model_path, arch=params[whose_model]['arch'])
+    print(f"\n模型路径: {model_path} (后端: {inferencer.name})")
 
     print(f"\n开始处理 {len(acc_peak_indices)} 个峰值...")
-    # --- 循环处理每个峰值 ---
-    for i, idx in enumerate(acc_peak_indices):
-        print(f"\n--- 处理峰值 {i+1}/{len(acc_peak_indices)} (原始索引: {idx}) ---")
-        try:
-            # 提取和处理数据段
-            data_segment = extract_and_process_segment(
-                idx, acc_data, gyro_data, params, whose_model, bwf_low, bwf_mid, bwf_high
-            )
-
-            # 执行推理并打印结果
-            run_inference(inferencer, data_segment, gesture_map, whose_model)
-
-        except Exception as e:
-            print(f"处理索引 {idx} 时发生意外错误: {e}")
-            import traceback
-            traceback.print_exc() # 打印详细错误信息
-
+    start = time.perf_counter()
+    # --- 一次提取和滤波所有峰值 ---
+    segments = extract_and_process_segments(
+        acc_peak_indices, acc_data, gyro_data, params, whose_model, filter_bank
+    )
+    preprocess_time = time.perf_counter() - start
+
+    # --- 分批推理 ---
+    start = time.perf_counter()
+    probabilities = run_inference(inferencer, segments, args.batch_size)
+    inference_time = time.perf_counter() - start
+
+    print_predictions(probabilities, acc_peak_indices, gesture_map, whose_model, args.verbose)
+    print(f"\n预处理 {preprocess_time * 1e3:.1f} ms, 推理 {inference_time * 1e3:.1f} ms "
+          f"({len(segments) / max(inference_time, 1e-9):.0f} 个峰值/s, batch_size={args.batch_size})")
     print("\n处理完成。")
@@ -1,6 +1,7 @@
 import torch
 import torch.nn as nn
 import numpy as np
+from sensor_io import load_numeric_csv
 
 class VanillaCNN(nn.Module):
     def __init__(self, num_classes):
@@ -90,11 +91,9 @@ def main():
     inferencer = PyTorchInference(MODEL_PATH)
     
     # 准备示例输入数据
-    sample_input = np.loadtxt(
+    sample_input = load_numeric_csv(
         '/Users/wayne/Downloads/2025_01_03_11_18_10_王也_左手_单击[正]_轻_静坐/gesture_model_data_2.txt',
-        skiprows=2,
-        delimiter=',',
-        encoding='utf-8'
+        skiprows=2
     )[:, 7:].reshape(1, 6, 60)
     print(f"输入数据形状: {sample_input.shape}")
     
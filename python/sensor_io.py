@@ -0,0 +1,162 @@
+"""
+手表数据文本文件 (acc.txt / gyro.txt 等逗号分隔的数值表) 的快速读取
+
+numpy < 1.23 的 np.loadtxt 逐行逐字段在 Python 中解析，一小时的数据 (36 万行) 要好几秒，这时把整个文件
+读成一个字符串、换行替换为逗号后由 np.fromstring 一次解析，遇到无法解析的内容时退回 np.loadtxt。
+numpy >= 1.23 的 np.loadtxt 已经是 C 实现，直接用它按结构化类型一次读出 int64 时间戳和 float64 数值。
+
+第一次读取后在原文件旁边写一个隐藏的 .npy 副本，文件名中带有原文件的大小和修改时间:
+    .acc.txt.imu.<size>_<mtime_ns>.npy
+之后原文件未变化时直接 np.load(mmap_mode='r') 映射，不再解析；原文件变化后旧副本自动删除。
+目录不可写时只是不缓存。
+
+用法:
+    python sensor_io.py ~/Downloads/2025_04_07_14_52_02_Howie_左手_混合_轻_静坐/acc.txt
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+IMU_DTYPE = np.dtype([('timestamp_ns', '<i8'), ('values', '<f8', (3,))])
+NATIVE_LOADTXT = tuple(int(v) for v in np.__version__.split('.')[:2]) >= (1, 23)
+
+
+def read_numeric_csv(path, skiprows=1):
+    """
+    不用缓存解析逗号分隔的数值文件
+    Returns:
+        (N, C) float64，与 np.loadtxt(path, skiprows=skiprows, delimiter=',') 相同
+    """
+    if NATIVE_LOADTXT:
+        return np.loadtxt(path, skiprows=skiprows, delimiter=',', ndmin=2, encoding='utf-8')
+    with open(path, encoding='utf-8') as f:
+        for _ in range(skiprows):
+            f.readline()
+        text = f.read().strip()
+    if not text:
+        return np.empty((0, 0))
+    n_cols = text[:text.find('\n') if '\n' in text else len(text)].count(',') + 1
+    n_rows = text.count('\n') + 1
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        try:
+            values = np.fromstring(text.replace('\n', ','), sep=',')
+        except (DeprecationWarning, ValueError):
+            values = None
+    if values is None or values.size != n_rows * n_cols:
+        # 有空行、缺列或非数值内容时按 np.loadtxt 的规则解析，出错信息也与原来一致
+        return np.loadtxt(path, skiprows=skiprows, delimiter=',', ndmin=2, encoding='utf-8')
+    return values.reshape(n_rows, n_cols)
+
+
+def read_imu(path):
+    """
+    不用缓存解析 acc.txt / gyro.txt (timestamp_ns,x,y,z)
+    Returns:
+        (N,) IMU_DTYPE 结构数组，timestamp_ns 为精确的 int64
+    """
+    if NATIVE_LOADTXT:
+        return np.loadtxt(path, skiprows=1, delimiter=',', dtype=IMU_DTYPE, ndmin=1, encoding='utf-8')
+    data = read_numeric_csv(path)
+    if data.shape[1] != 4:
+        raise ValueError(f"{path} 应有4列 (timestamp_ns,x,y,z)，实际为 {data.shape[1]} 列")
+    out = np.empty(len(data), dtype=IMU_DTYPE)
+    out['values'] = data[:, 1:]
+    if len(data) and np.abs(data[:, 0]).max() < 2 ** 53:
+        # float64 能精确表示 2^53 以内的整数，纳秒时间戳约 104 天以内都没有误差
+        out['timestamp_ns'] = data[:, 0]
+    else:
+        with open(path, encoding='utf-8') as f:
+            f.readline()
+            out['timestamp_ns'] = [int(line.partition(',')[0]) for line in f if line.strip()]
+    return out
+
+
+def sidecar_path(path, kind):
+    stat = os.stat(path)
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, f'.{name}.{kind}.{stat.st_size}_{stat.st_mtime_ns}.npy')
+
+
+def cached(path, kind, parse, cache=True):
+    """parse(path) 的结果经过 .npy 副本缓存，命中时返回只读内存映射"""
+    if not cache:
+        return parse(path)
+    sidecar = sidecar_path(path, kind)
+    if os.path.exists(sidecar):
+        return np.load(sidecar, mmap_mode='r')
+    data = parse(path)
+    folder, name = os.path.split(sidecar)
+    try:
+        for stale in glob.glob(os.path.join(folder, glob.escape(name.rsplit('.', 2)[0]) + '.*.npy')):
+            os.remove(stale)
+        # 先写临时文件再改名，多个进程同时读取同一个文件时不会读到写了一半的副本
+        tmp_path = f'{sidecar[:-4]}.{os.getpid()}.tmp.npy'
+        np.save(tmp_path, data)
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        pass
+    return data
+
+
+def load_imu(path, cache=True):
+    """
+    读取 acc.txt / gyro.txt
+    Returns:
+        timestamps: (N,) int64, values: (N, 3) float64
+    """
+    data = cached(path, 'imu', read_imu, cache)
+    return data['timestamp_ns'], data['values']
+
+
+def load_numeric_csv(path, skiprows=1, cache=True):
+    """与 np.loadtxt(path, skiprows=skiprows, delimiter=',') 相同的 (N, C) float64，经过 .npy 副本缓存"""
+    return cached(path, f'csv{skiprows}', lambda p: read_numeric_csv(p, skiprows), cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark IMU text parsing: np.loadtxt vs fast parser vs .npy sidecar')
+    parser.add_argument('path', help='acc.txt 或 gyro.txt')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"错误：找不到文件 {args.path}")
+        sys.exit(1)
+
+    for stale in glob.glob(os.path.join(os.path.dirname(os.path.abspath(args.path)),
+                                        glob.escape(f'.{os.path.basename(args.path)}.imu.') + '*.npy')):
+        os.remove(stale)
+
+    results = {}
+    for name, load in (
+        ('np.loadtxt', lambda: np.loadtxt(args.path, skiprows=1, delimiter=',')),
+        ('read_imu', lambda: read_imu(args.path)),
+        ('load_imu cold', lambda: load_imu(args.path)),
+        ('load_imu warm', lambda: load_imu(args.path)),
+    ):
+        start = time.perf_counter()
+        results[name] = load()
+        results[name + ' seconds'] = time.perf_counter() - start
+
+    reference = results['np.loadtxt']
+    fast = results['read_imu']
+    assert np.array_equal(reference[:, 1:], fast['values']) and np.array_equal(reference[:, 0], fast['timestamp_ns'])
+    for name in ('load_imu cold', 'load_imu warm'):
+        timestamps, values = results[name]
+        assert np.array_equal(timestamps, fast['timestamp_ns']) and np.array_equal(values, fast['values'])
+
+    print(f"{args.path}: {len(reference)} 行, {os.path.getsize(args.path) / 1e6:.1f} MB")
+    print(f"{'loader':<16} {'ms':>9} {'speedup':>8}")
+    base = results['np.loadtxt seconds']
+    for name in ('np.loadtxt', 'read_imu', 'load_imu cold', 'load_imu warm'):
+        seconds = results[name + ' seconds']
+        print(f"{name:<16} {seconds * 1e3:>9.1f} {base / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
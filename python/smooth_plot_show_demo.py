@@ -10,7 +10,10 @@ import queue
 from scipy import interpolate
 import torch
 import torch.nn as nn
-from pywayne.dsp import butter_bandpass_filter
+from streaming_filter import StreamingSOSFilter
+from inference_backend import TorchBackend
+from inference_worker import InferenceWorker
+from cascade_gate import CascadeGate
 
 # 在文件开头添加OneEuroFilter类定义
 class OneEuroFilter:
@@ -105,6 +108,13 @@ class MotionDataVisualizer:
         self.acc_filter = OneEuroFilter(te=self.SAMPLE_TIME, mincutoff=10.0, beta=0.001, dcutoff=1.0)
         self.gyro_filter = OneEuroFilter(te=self.SAMPLE_TIME, mincutoff=10.0, beta=0.001, dcutoff=1.0)
 
+        # 加速度带通滤波器（流式，每个数据块到达时滤波一次）
+        self.ZERO_PHASE_WINDOW = True  # 对手势窗口做匹配的零相位后处理
+        self.acc_stream_filter = StreamingSOSFilter(
+            order=2, lo=0.1, hi=40, fs=1.0 / self.SAMPLE_TIME, btype='bandpass',
+            n_channels=3
+        )
+
         # 数据缓冲
         self.data_buffer = queue.Queue()
 
@@ -134,6 +144,20 @@ class MotionDataVisualizer:
         self.model.load_state_dict(checkpoint)
         self.model.eval()
 
+        # 后台推理：成簇到达的峰值在 INFERENCE_DEADLINE 内合成一个batch，不阻塞绘图和数据接收
+        self.INFERENCE_DEADLINE = 0.02  # 秒
+        self.CLASS_NAMES = ['单击', '双击', '握拳', '左滑', '右滑', '鼓掌', '抖腕', '拍打', '日常']
+        self.inference_worker = InferenceWorker(
+            TorchBackend(self.model), deadline=self.INFERENCE_DEADLINE, max_batch_size=16
+        )
+        # 级联门控：cascade_gate.py train 生成的 .npz，明显不是手势的峰值直接判为 '日常'，不送入模型；
+        # 特征与窗口长度有关，门控需要用与模型输入相同的 60 点窗口训练
+        self.GATE_PATH = None
+        self.gate = CascadeGate.load(self.GATE_PATH) if self.GATE_PATH else None
+        if self.gate is not None:
+            self.gate.check_window_length(60)
+        self.gate_skipped = 0
+
         # 添加原始数据的队列
         self.acc_x = deque(maxlen=self.WINDOW_SIZE)
         self.acc_y = deque(maxlen=self.WINDOW_SIZE)
@@ -141,6 +165,8 @@ class MotionDataVisualizer:
         self.gyro_x = deque(maxlen=self.WINDOW_SIZE)
         self.gyro_y = deque(maxlen=self.WINDOW_SIZE)
         self.gyro_z = deque(maxlen=self.WINDOW_SIZE)
+        # 滤波后的加速度（单位g），与timestamps一一对应
+        self.acc_filtered = deque(maxlen=self.WINDOW_SIZE)
 
     def setup_plot(self):
         plt.style.use('dark_background')
@@ -182,12 +208,20 @@ class MotionDataVisualizer:
     def update_plot_data(self):
         points_to_add = min(self.PLOT_INTERVAL, self.data_buffer.qsize())
         last_timestamp = None
-        
+
+        points = []
         for _ in range(points_to_add):
             if self.data_buffer.empty():
                 break
-                
-            point = self.data_buffer.get()
+            points.append(self.data_buffer.get())
+        if not points:
+            return
+
+        # 整块数据只做一次流式滤波
+        acc_block = np.array([[p['acc_x'], p['acc_y'], p['acc_z']] for p in points]) / 9.81
+        acc_filtered_block = self.acc_stream_filter.process(acc_block)
+
+        for point, acc_filtered in zip(points, acc_filtered_block):
             current_timestamp = point['timestamp']
             
             if self.first_timestamp is None:
@@ -199,6 +233,7 @@ class MotionDataVisualizer:
             last_timestamp = current_timestamp
             
             # 处理数据...（与原update_plot_data函数相同，但使用self.属性）
+            self.acc_filtered.append(acc_filtered)
             self._process_point(point, rel_time, te)
 
     def _process_point(self, point, rel_time, te):
@@ -331,10 +366,8 @@ class MotionDataVisualizer:
         # 获取索引
         indices = np.where(mask)[0]
         
-        # 批量填充原始数据
-        acc_data[:, 0] = [self.acc_x[i] for i in indices]
-        acc_data[:, 1] = [self.acc_y[i] for i in indices]
-        acc_data[:, 2] = [self.acc_z[i] for i in indices]
+        # 批量填充数据，加速度直接取已滤波的历史
+        acc_data[:] = [self.acc_filtered[i] for i in indices]
         
         gyro_data[:, 0] = [self.gyro_x[i] for i in indices]
         gyro_data[:, 1] = [self.gyro_y[i] for i in indices]
@@ -364,22 +397,15 @@ class MotionDataVisualizer:
         print(f"Peak at {peak_time:.3f}s, data shape: {data.shape}")
         
         # 数据预处理
-        # 分离加速度和陀螺仪数据
-        acc_data = data[:, :3]  # 前3列是加速度数据
-        gyro_data = data[:, 3:]  # 后3列是陀螺仪数据
-
-        # np.savetxt('data.txt', np.c_[acc_data, gyro_data], delimiter=',')
-        
-        # 对加速度数据进行滤波处理
-        acc_filtered = butter_bandpass_filter(
-            acc_data / 9.81,  # 转换为g
-            order=2,
-            lo=0.1,
-            hi=40,
-            fs=100.0,
-            btype='bandpass',
-            realtime=False
-        )
+        # 分离加速度和陀螺仪数据，加速度已在数据到达时完成流式滤波（单位g）
+        acc_filtered = data[:, :3]
+        gyro_data = data[:, 3:]
+
+        # np.savetxt('data.txt', np.c_[acc_filtered, gyro_data], delimiter=',')
+        
+        # 匹配的零相位后处理，消除前向滤波的相位延迟
+        if self.ZERO_PHASE_WINDOW:
+            acc_filtered = self.acc_stream_filter.zero_phase(acc_filtered)
         
         # 陀螺仪数据保持不变
         gyro_filtered = gyro_data
@@ -387,22 +413,24 @@ class MotionDataVisualizer:
         # 组合处理后的数据
         processed_data = np.concatenate([acc_filtered, gyro_filtered], axis=1)
         
-        # 转换为torch tensor并调整维度
-        x = torch.from_numpy(processed_data.T).float().unsqueeze(0)  # [1, 6, 60]
-        x = x.to(self.device)
-        
-        # 模型预测
-        with torch.no_grad():
-            output = self.model(x)
-            probabilities = torch.nn.functional.softmax(output, dim=1)
-            predicted_class = torch.argmax(output, dim=1).item()
-            confidence = probabilities[0][predicted_class].item()
-        
-        # 获取预测结果
-        class_names = ['单击', '双击', '握拳', '左滑', '右滑', '鼓掌', '抖腕', '拍打', '日常']
-        predicted_label = class_names[predicted_class]
-        
-        print(f"Predicted gesture: {predicted_label} (confidence: {confidence:.3f})")
+        if self.gate is not None and not self.gate.accept(processed_data.T[None])[0]:
+            self.gate_skipped += 1
+            print(f"Peak at {peak_time:.3f}s predicted gesture: {self.CLASS_NAMES[-1]} (gate)")
+            return
+
+        # 提交给后台推理线程，结果在 animate 中取出
+        self.inference_worker.submit(processed_data.T, peak_time)  # [6, 60]
+
+    def _handle_predictions(self):
+        """输出后台推理线程已完成的预测结果"""
+        for result in self.inference_worker.get_results():
+            if result['error'] is not None:
+                print(f"Peak at {result['timestamp']:.3f}s prediction failed: {result['error']}")
+                continue
+            predicted_label = self.CLASS_NAMES[result['predicted_class']]
+            print(f"Peak at {result['timestamp']:.3f}s predicted gesture: {predicted_label} "
+                  f"(confidence: {result['confidence']:.3f}, batch: {result['batch_size']}, "
+                  f"wait: {result['queue_wait'] * 1e3:.1f} ms, model: {result['model_latency'] * 1e3:.1f} ms)")
 
     def _online_peak_detection(self, value, timestamp, lookformax, mn, mx, mn_time, mx_time, delta):
         peak = None
@@ -454,6 +482,7 @@ class MotionDataVisualizer:
 
     def animate(self, frame):
         self.update_plot_data()
+        self._handle_predictions()
         
         if not self.timestamps:
             return self.lines_acc + self.lines_gyro
@@ -530,6 +559,7 @@ class MotionDataVisualizer:
         receiver_thread = threading.Thread(target=self.data_receiver, args=(server_socket,))
         receiver_thread.daemon = True
         receiver_thread.start()
+        self.inference_worker.start()
         
         ani = animation.FuncAnimation(
             self.fig, self.animate, init_func=self.init_plot,
@@ -539,6 +569,10 @@ class MotionDataVisualizer:
         
         plt.tight_layout()
         plt.show()
+        self.inference_worker.stop()
+        self.inference_worker.print_stats()
+        if self.gate is not None:
+            print(f"门控跳过的峰值: {self.gate_skipped}")
 
     @staticmethod
     def setup_socket():
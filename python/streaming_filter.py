@@ -0,0 +1,74 @@
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+
+class StreamingSOSFilter:
+    """
+    有状态的流式巴特沃斯滤波器（二阶节SOS形式）
+    每个通道单独维护滤波状态，每个数据块到达时只滤波一次，
+    调用方保存滤波后的结果 (与时间戳放在同一个缓冲中)，特征窗口直接从中切片，
+    不再对每个手势窗口重新设计滤波器并从头做filtfilt
+    """
+
+    def __init__(self, order=2, lo=0.1, hi=40.0, fs=100.0, btype='bandpass',
+                 n_channels=3):
+        """
+        Args:
+            order: 滤波器阶数
+            lo: 低截止频率 (Hz)，highpass/bandpass时使用
+            hi: 高截止频率 (Hz)，lowpass/bandpass时使用
+            fs: 采样率 (Hz)
+            btype: 'bandpass' / 'lowpass' / 'highpass'
+            n_channels: 通道数
+        """
+        if btype == 'bandpass':
+            wn = [lo, hi]
+        elif btype == 'lowpass':
+            wn = hi
+        elif btype == 'highpass':
+            wn = lo
+        else:
+            raise ValueError(f"未知的滤波器类型: {btype}")
+        self.sos = butter(order, wn, btype=btype, fs=fs, output='sos')
+        self.n_channels = n_channels
+        # 单位输入下的稳态初始条件，形状 (n_sections, 2)，使用时扩展到 (n_sections, 2, n_channels)
+        self._zi_unit = sosfilt_zi(self.sos)
+        self._zi = None
+
+    def reset(self):
+        """清空滤波状态"""
+        self._zi = None
+
+    def process(self, block):
+        """
+        对新到达的数据块进行因果滤波
+        Args:
+            block: 形状为 (n, n_channels) 的新数据
+        Returns:
+            滤波后的数据块，形状 (n, n_channels)
+        """
+        block = np.asarray(block, dtype=float).reshape(-1, self.n_channels)
+        if len(block) == 0:
+            return block
+        if self._zi is None:
+            # 用第一个样本初始化稳态，避免阶跃引起的启动瞬态
+            self._zi = self._zi_unit[:, :, None] * block[0][None, None, :]
+        filtered, self._zi = sosfilt(self.sos, block, axis=0, zi=self._zi)
+        return filtered
+
+    def zero_phase(self, window):
+        """
+        匹配的零相位后处理：对已经过因果前向滤波的窗口再做一次反向滤波，
+        整体等价于 filtfilt 的前向-反向结构，消除窗口内的相位延迟
+        Args:
+            window: 形状为 (n, n_channels) 的前向滤波结果（process 的输出中最近的 n 个样本）
+        Returns:
+            零相位滤波后的窗口，形状 (n, n_channels)
+        """
+        window = np.asarray(window, dtype=float)
+        if len(window) == 0:
+            return window
+        rev = window[::-1]
+        zi = self._zi_unit[:, :, None] * rev[0][None, None, :]
+        out, _ = sosfilt(self.sos, rev, axis=0, zi=zi)
+        return out[::-1]
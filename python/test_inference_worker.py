@@ -0,0 +1,62 @@
+"""
+InferenceWorker 的测试：后端出错的 batch 返回错误结果，线程继续处理后面的请求
+
+用法:
+    python test_inference_worker.py
+    python -m pytest test_inference_worker.py
+"""
+import time
+
+import numpy as np
+
+from inference_worker import InferenceWorker
+
+
+class FlakyBackend:
+    """第一次 predict 抛出异常，之后返回固定的 logits"""
+
+    def __init__(self, num_classes=9):
+        self.num_classes = num_classes
+        self.calls = 0
+
+    def predict(self, batch):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("backend failure")
+        logits = np.zeros((len(batch), self.num_classes), dtype=np.float32)
+        logits[:, 2] = 5.0
+        return logits
+
+
+def wait_for_results(worker, count, timeout=5.0):
+    results = []
+    end_time = time.perf_counter() + timeout
+    while len(results) < count and time.perf_counter() < end_time:
+        results.extend(worker.get_results())
+        time.sleep(0.01)
+    return results
+
+
+def test_backend_error_does_not_stop_worker():
+    worker = InferenceWorker(FlakyBackend(), deadline=0.05, max_batch_size=4, stats_interval=0)
+    worker.start()
+    try:
+        for i in range(3):
+            worker.submit(np.zeros((6, 60)), timestamp=i)
+        failed = wait_for_results(worker, 3)
+        assert [r['timestamp'] for r in failed] == [0, 1, 2]
+        assert all(r['error'] is not None and r['predicted_class'] is None for r in failed)
+
+        for i in range(3, 6):
+            worker.submit(np.zeros((6, 60)), timestamp=i)
+        results = wait_for_results(worker, 3)
+        assert [r['timestamp'] for r in results] == [3, 4, 5]
+        assert all(r['error'] is None and r['predicted_class'] == 2 for r in results)
+        assert worker.stats()['num_errors'] == 3
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    test_backend_error_does_not_stop_worker()
+    print("全部通过")
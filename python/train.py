@@ -0,0 +1,166 @@
+"""
+命令行训练 GestureModel / VanillaCNN (CPU，无需 notebook)
+
+与 main.ipynb 的训练循环相同的设置 (Adam, lr=1e-3, CrossEntropy, batch_size=32)，区别在于:
+    - 训练集和验证集一次性读入内存 (load_all_data 的 .npy 缓存)，每个 epoch 只打乱下标，按下标切 batch，
+      不经过 DataLoader 和 MHGDataSet.__getitem__
+    - 验证按 batch (--eval-batch-size) 在 inference_mode 中计算，不逐个样本
+    - 梯度开关只在训练/验证切换时设置一次
+    - --threads 控制 intra-op 线程数，--compile 使用 torch.compile，--augment 使用 augment.BatchAugment
+每个 epoch 输出训练耗时、samples/s 和各数据集的准确率；某个数据集的准确率创新高时保存
+'{数据集}_epoch={epoch}_accuracy={accuracy:.3f}.pt' (与 notebook 相同的命名，可直接用 gesture_models.load_model 读取)。
+
+用法:
+    python train.py --train train.h5 --valid valid.h5 --epochs 200
+    python train.py --train splits/seed0.json:train --valid splits/seed0.json:valid --threads 4 --compile
+    python train.py --arch vanilla --train train60.h5 --valid valid60.h5 --augment --out-dir checkpoints
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from augment import BatchAugment
+from gesture_dataset import dataset_source, load_all_data
+from gesture_models import MODELS
+
+
+def load_tensors(spec, arch):
+    """(x, 类别下标)，x 复制到内存中 (不保留对缓存文件的映射)"""
+    x, y = load_all_data(spec)
+    if arch == 'vanilla':
+        # MHGDataSet 输出 (N, 6, 1, T)，VanillaCNN 的输入是 (N, 6, T)
+        x = x[:, :, 0]
+    return x.contiguous().clone(), y.argmax(dim=1)
+
+
+@torch.inference_mode()
+def evaluate(model, x, y, criterion, batch_size):
+    """返回 (loss, accuracy, macro F1)"""
+    model.eval()
+    logits = torch.cat([model(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+    loss = criterion(logits, y).item()
+    pred = logits.argmax(dim=1)
+    n_classes = logits.shape[1]
+    cm = torch.bincount(y * n_classes + pred, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+    tp = cm.diag().double()
+    precision = tp / cm.sum(dim=0).clamp_min(1)
+    recall = tp / cm.sum(dim=1).clamp_min(1)
+    f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall), torch.zeros_like(tp))
+    return loss, (tp.sum() / len(y)).item(), f1.mean().item()
+
+
+def train_epoch(model, optimizer, criterion, x, y, batch_size, generator, augment=None):
+    """一个 epoch，返回平均训练 loss"""
+    model.train()
+    order = torch.randperm(len(x), generator=generator)
+    total, n = 0.0, 0
+    for start in range(0, len(x), batch_size):
+        index = order[start:start + batch_size]
+        xb, yb = x.index_select(0, index), y.index_select(0, index)
+        if augment is not None:
+            xb = augment(xb)
+        loss = criterion(model(xb), yb)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+        total += loss.item() * len(index)
+        n += len(index)
+    return total / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless CPU training runner for GestureModel / VanillaCNN')
+    parser.add_argument('--arch', choices=list(MODELS), default='gesture')
+    parser.add_argument('--num-classes', type=int, default=9)
+    parser.add_argument('--train', default='train.h5', help="h5 文件或 'splits/seed0.json:train'")
+    parser.add_argument('--valid', default='valid.h5', help="h5 文件或 'splits/seed0.json:valid'")
+    parser.add_argument('--total', default=None, help="每 --total-every 个 epoch 额外评估一次的数据集，例如 aw10_data.h5")
+    parser.add_argument('--total-every', type=int, default=50)
+    parser.add_argument('--epochs', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--eval-batch-size', type=int, default=64,
+                        help='验证时每次前向的样本数 (CPU 上过大的 batch 超出缓存反而更慢，可按机器调整)')
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--threads', type=int, default=None, help='intra-op 线程数，默认使用 torch 的设置')
+    parser.add_argument('--compile', action='store_true', help='使用 torch.compile (失败时退回 eager)')
+    parser.add_argument('--augment', action='store_true', help='训练 batch 使用 augment.BatchAugment')
+    parser.add_argument('--seed', type=int, default=1, help='与 main.ipynb 的 RANDOM_SEED 相同')
+    parser.add_argument('--out-dir', default='.', help='checkpoint 保存目录')
+    parser.add_argument('--no-eval-train', action='store_true', help='不在每个 epoch 评估训练集')
+    args = parser.parse_args()
+
+    specs = [args.train, args.valid] + ([args.total] if args.total else [])
+    for spec in specs:
+        if not os.path.exists(dataset_source(spec)):
+            print(f"错误：找不到文件 {dataset_source(spec)}")
+            sys.exit(1)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    np.random.seed(args.seed)
+
+    start = time.perf_counter()
+    data = {'train': load_tensors(args.train, args.arch), 'valid': load_tensors(args.valid, args.arch)}
+    if args.total:
+        data['total'] = load_tensors(args.total, args.arch)
+    input_shape = MODELS[args.arch][1]
+    for name, (x, _) in data.items():
+        if tuple(x.shape[1:]) != input_shape:
+            print(f"错误：{name} 的数据形状 {tuple(x.shape[1:])} 与 {args.arch} 的输入 {input_shape} 不一致")
+            sys.exit(1)
+    print(f"读取数据 {time.perf_counter() - start:.2f}s: " +
+          ', '.join(f"{name} {len(x)}" for name, (x, _) in data.items()) +
+          f", threads={torch.get_num_threads()}")
+
+    model = MODELS[args.arch][0](args.num_classes)
+    forward = model
+    if args.compile:
+        try:
+            forward = torch.compile(model)
+            forward(data['train'][0][:args.batch_size])  # 触发编译；最后一个不完整的 batch 和验证时的形状仍会在第一个 epoch 中重新编译
+        except Exception as e:
+            print(f"torch.compile 失败，使用 eager 模式: {e}")
+            forward = model
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    criterion = nn.CrossEntropyLoss()
+    generator = torch.Generator().manual_seed(args.seed)
+    augment = BatchAugment(seed=args.seed) if args.augment else None
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    train_x, train_y = data['train']
+    best = {}
+    print(f"\n{'epoch':>6} {'loss':>8} {'train s':>8} {'samples/s':>10} {'eval s':>7}  accuracy")
+    for epoch in range(args.epochs):
+        start = time.perf_counter()
+        train_loss = train_epoch(forward, optimizer, criterion, train_x, train_y, args.batch_size, generator, augment)
+        train_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        names = ['valid'] if args.no_eval_train else ['train', 'valid']
+        if args.total and epoch % args.total_every == 0:
+            names.append('total')
+        results = {name: evaluate(forward, *data[name], criterion, args.eval_batch_size) for name in names}
+        eval_time = time.perf_counter() - start
+
+        saved = []
+        for name, (_, accuracy, _) in results.items():
+            if accuracy > best.get(name, 0.0):
+                best[name] = accuracy
+                path = os.path.join(args.out_dir, f'{name}_epoch={epoch}_accuracy={accuracy:.3f}.pt')
+                torch.save(model.state_dict(), path)
+                saved.append(os.path.basename(path))
+        print(f"{epoch + 1:>6} {train_loss:>8.4f} {train_time:>8.2f} {len(train_x) / train_time:>10.0f} {eval_time:>7.2f}  " +
+              ' '.join(f"{name}={acc:.3f}(F1 {f1:.3f})" for name, (_, acc, f1) in results.items()) +
+              (f"  -> {', '.join(saved)}" if saved else ''))
+
+    print("\n最佳准确率: " + ', '.join(f"{name}={acc:.3f}" for name, acc in best.items()))
+
+
+if __name__ == "__main__":
+    main()